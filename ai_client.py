@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+
+import metrics
+from metrics import LatencyHistogram
+
+DEFAULT_MODEL_NAME = 'gemini-2.5-flash'
+
+# Limits shared by every Gemini call in the process
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "4"))
+AI_REQUESTS_PER_MINUTE = float(os.environ.get("AI_REQUESTS_PER_MINUTE", "60"))  # 0 = no rate limit
+AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT", "60"))  # seconds per attempt
+AI_MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", "4"))
+
+# HTTP status codes worth retrying (rate limit and transient server errors)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class AIClientError(Exception):
+    """Raised when a Gemini request still fails after all retries."""
+
+
+class _TokenBucket:
+    """Token-bucket rate limiter; only used from the client's event loop. A rate of 0 means unlimited."""
+
+    def __init__(self, rate_per_second, capacity):
+        if rate_per_second < 0:
+            raise ValueError(f"Rate must be >= 0 (0 = unlimited), got {rate_per_second}")
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+_environment_loaded = False
+_configured = False
+_configure_lock = threading.Lock()
+
+def load_environment():
+    """Loads .env into os.environ once per process (on first use, not at import)."""
+    global _environment_loaded
+    with _configure_lock:
+        if not _environment_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _environment_loaded = True
+
+
+def _default_model_factory(model_name):
+    # google.generativeai takes about a second to import, so it is only
+    # loaded when the first Gemini request is made
+    import google.generativeai as genai
+
+    global _configured
+    load_environment()
+    with _configure_lock:
+        if not _configured:
+            try:
+                genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+            except Exception as e:
+                print(f"Error configuring Google API: {e}. Make sure GOOGLE_API_KEY is set.")
+            _configured = True
+    return genai.GenerativeModel(model_name)
+
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    if callable(code):  # grpc-style errors expose code() instead of an int
+        code = None
+    return code if isinstance(code, int) else None
+
+
+def _request_key(model_name, contents):
+    """Hash of a request, used to merge identical requests that are in flight together."""
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    for part in contents if isinstance(contents, (list, tuple)) else [contents]:
+        if isinstance(part, str):
+            digest.update(b"s" + part.encode("utf-8"))
+        elif hasattr(part, "tobytes"):  # PIL images
+            digest.update(f"i{getattr(part, 'size', '')}{getattr(part, 'mode', '')}".encode("utf-8"))
+            digest.update(part.tobytes())
+        else:
+            digest.update(f"o{id(part)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AIClient:
+    """
+    Shared Gemini client.
+
+    All requests run on one background event loop, which enforces a
+    concurrency cap and a token-bucket rate limit, retries 429/5xx errors
+    and timeouts with exponential backoff, and merges identical requests
+    that are in flight at the same time. Use generate() from normal code
+    and generate_async() from asyncio code.
+
+    model_factory(model_name) must return an object with
+    generate_content(contents, request_options=...) -> response with .text;
+    pass a fake one in tests.
+    """
+
+    def __init__(self, model_factory=None, max_concurrency=AI_MAX_CONCURRENCY,
+                 requests_per_minute=AI_REQUESTS_PER_MINUTE, max_retries=AI_MAX_RETRIES,
+                 timeout=AI_TIMEOUT, backoff_base=1.0, backoff_max=30.0):
+        if requests_per_minute < 0:
+            raise ValueError(f"requests_per_minute must be >= 0 (0 = unlimited), got {requests_per_minute}")
+        self.model_factory = model_factory or _default_model_factory
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._models = {}
+        self._inflight = {}
+        self._stats_lock = threading.Lock()
+        self._latency = {}
+        self._counters = {"requests": 0, "coalesced": 0, "retries": 0, "failures": 0}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ai-client", daemon=True)
+        self._thread.start()
+        self._semaphore = None
+        self._bucket = None
+        asyncio.run_coroutine_threadsafe(
+            self._setup(max_concurrency, requests_per_minute), self._loop
+        ).result()
+
+    async def _setup(self, max_concurrency, requests_per_minute):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        rate = requests_per_minute / 60.0
+        self._bucket = _TokenBucket(rate, capacity=max(1.0, min(float(max_concurrency), requests_per_minute)))
+
+    def _model(self, model_name):
+        if model_name not in self._models:
+            self._models[model_name] = self.model_factory(model_name)
+        return self._models[model_name]
+
+    def _observe(self, name, seconds):
+        with self._stats_lock:
+            self._latency.setdefault(name, LatencyHistogram(LATENCY_BUCKETS)).observe(seconds)
+        metrics.observe("gemini_request_seconds", seconds, request=name)
+
+    def _count(self, counter):
+        with self._stats_lock:
+            self._counters[counter] += 1
+        metrics.increment(f"gemini_{counter}")
+
+    async def _call_with_retries(self, model_name, contents, name):
+        model = self._model(model_name)
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await self._bucket.acquire()
+                started = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        asyncio.to_thread(
+                            model.generate_content, contents, request_options={"timeout": self.timeout}
+                        ),
+                        timeout=self.timeout,
+                    )
+                    self._observe(name, time.perf_counter() - started)
+                    return response.text
+                except Exception as e:
+                    self._observe(name, time.perf_counter() - started)
+                    retryable = isinstance(e, asyncio.TimeoutError) or _status_code(e) in RETRYABLE_STATUS_CODES
+                    if not retryable or attempt >= self.max_retries:
+                        self._count("failures")
+                        raise AIClientError(f"Gemini request failed after {attempt + 1} attempt(s): {e}") from e
+                    last_error = e
+            delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            attempt += 1
+            self._count("retries")
+            print(f"Gemini request failed ({last_error!r}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _generate(self, contents, model_name, name, key):
+        self._count("requests")
+        key = key or _request_key(model_name, contents)
+        future = self._inflight.get(key)
+        if future is not None:
+            self._count("coalesced")
+            return await asyncio.shield(future)
+
+        future = self._loop.create_future()
+        self._inflight[key] = future
+        try:
+            text = await self._call_with_retries(model_name, contents, name)
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def generate_async(self, contents, model_name=DEFAULT_MODEL_NAME, name="generate", key=None):
+        """Async version of generate(); safe to await from any event loop."""
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self._generate(contents, model_name, name, key), self._loop)
+        )
+
+    def generate(self, contents, model_name=DEFAULT_MODEL_NAME, name="generate", key=None):
+        """
+        Sends contents (a prompt string or a list of strings/PIL images) to
+        Gemini and returns the response text. `name` labels the latency
+        histogram; `key` overrides the request hash used for coalescing.
+        Raises AIClientError if the request fails after all retries.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._generate(contents, model_name, name, key), self._loop
+        ).result()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                **self._counters,
+                "in_flight": len(self._inflight),
+                "latency": {name: hist.snapshot() for name, hist in self._latency.items()},
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_ai_client():
+    """The process-wide AIClient shared by ai_processing and logika_styling."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AIClient()
+        return _client
+
+def set_ai_client(client):
+    """Replaces the shared client (e.g. with one built on a fake model)."""
+    global _client
+    with _client_lock:
+        _client = client
@@ -1,14 +1,55 @@
 import os
-import google.generativeai as genai
-from PIL import Image
+from PIL import Image, ImageOps
 import io
-from rembg import remove
 import json
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 
-try:
-    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
-except Exception as e:
-    print(f"Error configuring Google API: {e}. Make sure GOOGLE_API_KEY is set.")
+from ai_client import DEFAULT_MODEL_NAME, get_ai_client
+from metrics import increment, span, timed
+from persistent_cache import PersistentCache
+
+CLASSIFY_MODEL_NAME = DEFAULT_MODEL_NAME
+
+CLASSIFY_PROMPT = (
+    "Classify the clothing item in this image. "
+    "Provide the response ONLY in the following JSON format. "
+    "IMPORTANT: All keys and values in the JSON must be in English:"
+    "{'type': '...', 'color': '...', 'style': '...'}."
+    "The 'type' must be one of: Top, Bottom, Outerwear, Dress, Shoes, Accessory. "
+    "The 'style' must describe the model or material (e.g., 'Plain Shirt', 'Slim Fit Jeans')."
+)
+
+
+# Size of the canonical thumbnail used to fingerprint an image.
+FINGERPRINT_SIZE = 256
+
+# Classification only needs a few hundred pixels: uploads to Gemini are
+# downscaled to this longest edge and re-encoded as metadata-free JPEG.
+CLASSIFY_MAX_EDGE = int(os.environ.get("CLASSIFY_MAX_EDGE", "768"))
+CLASSIFY_UPLOAD_QUALITY = 80
+
+# rembg model used for background removal, and how many worker processes run it
+REMBG_MODEL_NAME = os.environ.get("REMBG_MODEL", "u2net")
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", "2"))
+# Finished jobs nobody collects (abandoned uploads) are forgotten after this many seconds
+BACKGROUND_JOB_TTL = float(os.environ.get("BACKGROUND_JOB_TTL", "600"))
+
+_rembg_session = None
+_rembg_session_lock = threading.Lock()
+
+_background_pool = None
+_background_pool_lock = threading.Lock()
+_background_jobs = {}
+_background_finished_at = {}
+
+_classification_cache = PersistentCache(
+    "classify",
+    max_entries=int(os.environ.get("CLASSIFY_CACHE_MAX_ENTRIES", "5000")),
+)
 
 def clean_json_response(response_text):
     """
@@ -24,57 +65,259 @@ def clean_json_response(response_text):
     else:
         return response_text
 
-def remove_background(image_path):
+class PreparedImage:
+    """
+    An uploaded image decoded once (with EXIF orientation applied) and
+    shared by every stage: the classification cache key, the Gemini
+    upload and background removal.
+    """
+
+    def __init__(self, image, max_edge=CLASSIFY_MAX_EDGE, source_path=None):
+        self.image = image
+        self.max_edge = max_edge
+        self.source_path = source_path
+        self._fingerprint = None
+        self._upload_bytes = None
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = image_fingerprint(self.image)
+        return self._fingerprint
+
+    @property
+    def upload_bytes(self):
+        """Downscaled JPEG without metadata, encoded on first use."""
+        if self._upload_bytes is None:
+            upload = self.image
+            if upload.mode in ("RGBA", "LA", "P"):
+                upload = upload.convert("RGBA")
+                background = Image.new("RGB", upload.size, (255, 255, 255))
+                background.paste(upload, mask=upload.getchannel("A"))
+                upload = background
+            else:
+                upload = upload.convert("RGB")
+            upload.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+            buffer = io.BytesIO()
+            upload.save(buffer, "JPEG", quality=CLASSIFY_UPLOAD_QUALITY, optimize=True)
+            self._upload_bytes = buffer.getvalue()
+        return self._upload_bytes
+
+    @property
+    def upload_part(self):
+        """The image as a Gemini content part."""
+        return {"mime_type": "image/jpeg", "data": self.upload_bytes}
+
+def prepare_image(source, max_edge=CLASSIFY_MAX_EDGE):
+    """
+    Decodes an image once for all processing stages.
+    `source` can be a file path, raw bytes, a file-like object or an
+    existing PreparedImage (returned unchanged).
+    """
+    if isinstance(source, PreparedImage):
+        return source
+    source_path = source if isinstance(source, (str, os.PathLike)) else None
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with Image.open(source) as raw:
+        # exif_transpose returns a rotated copy without the orientation tag
+        image = ImageOps.exif_transpose(raw)
+        image.load()
+    return PreparedImage(image, max_edge=max_edge, source_path=source_path)
+
+def get_rembg_session():
+    """
+    Returns the long-lived rembg session of this process, creating it on
+    first use. Loading the ONNX model is the slow part, so it happens once.
+    """
+    global _rembg_session
+    if _rembg_session is None:
+        with _rembg_session_lock:
+            if _rembg_session is None:
+                # rembg pulls in onnxruntime, scipy and numba; import it only when needed
+                from rembg import new_session
+
+                _rembg_session = new_session(REMBG_MODEL_NAME)
+    return _rembg_session
+
+@timed()
+def remove_background(image):
     """
     Removes the background from an image and returns it
     as a PIL.Image object.
+    `image` is a file path, encoded image bytes or a PreparedImage
+    (reused without decoding again).
     """
-    print(f"Starting background removal for: {image_path}")
+    print(f"Starting background removal for: {getattr(image, 'source_path', None) or image}")
     try:
-        with open(image_path, "rb") as f:
-            input_bytes = f.read()
-        
-        output_bytes = remove(input_bytes)
-        
-        processed_image = Image.open(io.BytesIO(output_bytes))
+        prepared = prepare_image(image)
+
+        from rembg import remove
+
+        processed_image = remove(prepared.image, session=get_rembg_session())
         print("Background removed successfully.")
         return processed_image
     
     except Exception as e:
         print(f"Error during background removal: {e}")
-        return Image.open(image_path)
+        if isinstance(image, PreparedImage):
+            return image.image
+        if isinstance(image, (bytes, bytearray)):
+            return Image.open(io.BytesIO(image))
+        return Image.open(image)
 
-def classify_item(image_path):
-    """Sends an image to the Google Gemini Vision API for classification."""
+def _background_worker_init():
+    """Preloads the rembg session when a worker process starts."""
+    get_rembg_session()
+
+def _background_worker_job(source, output_path):
+    # `source` is a path or encoded bytes (see _pool_source); decoded here, in the worker
+    processed_image = remove_background(source)
+    processed_image.save(output_path, "PNG")
+    return output_path
+
+def _get_background_pool():
+    global _background_pool
+    with _background_pool_lock:
+        if _background_pool is None:
+            _background_pool = ProcessPoolExecutor(
+                max_workers=BACKGROUND_WORKERS,
+                initializer=_background_worker_init,
+            )
+        return _background_pool
+
+def _pool_source(image):
+    """
+    What is sent to a worker process for `image`: its file path when there
+    is one, otherwise the image encoded as PNG. A decoded image would be
+    pickled pixel by pixel (tens of MB for a phone photo).
+    """
+    if isinstance(image, PreparedImage):
+        if image.source_path:
+            return image.source_path
+        buffer = io.BytesIO()
+        image.image.save(buffer, "PNG")
+        return buffer.getvalue()
+    return image
+
+def _forget_abandoned_jobs():
+    """Drops jobs that finished more than BACKGROUND_JOB_TTL seconds ago without being collected."""
+    cutoff = time.monotonic() - BACKGROUND_JOB_TTL
+    for job_id, finished_at in list(_background_finished_at.items()):
+        if finished_at < cutoff:
+            _background_jobs.pop(job_id, None)
+            _background_finished_at.pop(job_id, None)
+
+def _pop_background_job(job_id):
+    _background_finished_at.pop(job_id, None)
+    return _background_jobs.pop(job_id, None)
+
+def submit_background_removal(image, output_path):
+    """
+    Queues background removal on the worker pool and returns a job ID
+    right away. `image` is a file path, encoded image bytes or a
+    PreparedImage; the worker decodes it again itself.
+    The result is written as a PNG to output_path.
+    """
+    _forget_abandoned_jobs()
+    job_id = uuid.uuid4().hex
+    future = _get_background_pool().submit(_background_worker_job, _pool_source(image), output_path)
+    _background_jobs[job_id] = future
+    future.add_done_callback(lambda _: _background_finished_at.__setitem__(job_id, time.monotonic()))
+    return job_id
+
+def get_background_removal_status(job_id):
+    """
+    Polls a background-removal job.
+    Returns {'status': 'unknown' | 'pending' | 'done' | 'error', ...}.
+    A finished job is reported once and then forgotten.
+    """
+    future = _background_jobs.get(job_id)
+    if future is None:
+        return {"status": "unknown"}
+    if not future.done():
+        return {"status": "pending"}
+    _pop_background_job(job_id)
+    error = future.exception()
+    if error is not None:
+        return {"status": "error", "error": str(error)}
+    return {"status": "done", "output_path": future.result()}
+
+def wait_for_background_removal(job_id, timeout=None):
+    """Blocks until the job finishes, then forgets it and returns the output path."""
+    output_path = _background_jobs[job_id].result(timeout=timeout)
+    _pop_background_job(job_id)
+    return output_path
+
+def image_fingerprint(img):
+    """
+    Content hash of an image, based on a downscaled canonical RGB encoding.
+    Byte-identical uploads (and the same photo saved under another name)
+    get the same fingerprint.
+    """
+    canonical = ImageOps.exif_transpose(img).convert("RGB")
+    canonical.thumbnail((FINGERPRINT_SIZE, FINGERPRINT_SIZE))
+    digest = hashlib.sha256()
+    digest.update(f"{canonical.size[0]}x{canonical.size[1]}".encode("ascii"))
+    digest.update(canonical.tobytes())
+    return digest.hexdigest()
+
+def classify_cache_version(model_name=None, prompt=None):
+    """
+    Version part of the classification cache key. Changing the prompt or the
+    model produces a new version, so old cached classifications are simply
+    never hit again (and age out via LRU).
+    """
+    model_name = model_name or CLASSIFY_MODEL_NAME
+    prompt = prompt or CLASSIFY_PROMPT
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()[:16]
+
+def get_classification_cache_stats():
+    """Hit/miss counters and size of the classification cache."""
+    return _classification_cache.stats()
+
+def clear_classification_cache():
+    """Drops every cached classification."""
+    _classification_cache.clear()
+
+@timed()
+def classify_item(image):
+    """
+    Sends an image to the Google Gemini Vision API for classification.
+    `image` is a file path or a PreparedImage. Only a downscaled,
+    metadata-free copy is uploaded. Results are cached by image content,
+    so re-uploading the same photo returns immediately without a network call.
+    """
     try:
-        img = Image.open(image_path)
+        prepared = prepare_image(image)
 
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        cache_key = f"{classify_cache_version()}:{prepared.fingerprint}"
+        cached = _classification_cache.get(cache_key)
+        if cached is not None:
+            increment("classify_cache_hits")
+            print(f"Classification cache hit for: {prepared.source_path or 'uploaded image'}")
+            return cached
+        increment("classify_cache_misses")
 
-        prompt = (
-            "Classify the clothing item in this image. "
-            "Provide the response ONLY in the following JSON format. "
-            "IMPORTANT: All keys and values in the JSON must be in English:"
-            "{'type': '...', 'color': '...', 'style': '...'}."
-            "The 'type' must be one of: Top, Bottom, Outerwear, Dress, Shoes, Accessory. "
-            "The 'style' must describe the model or material (e.g., 'Plain Shirt', 'Slim Fit Jeans')."
+        # Shared client: rate limited, retried, and identical in-flight uploads are merged
+        response_text = get_ai_client().generate(
+            [CLASSIFY_PROMPT, prepared.upload_part], model_name=CLASSIFY_MODEL_NAME,
+            name="classify_item", key=cache_key,
         )
-
-        response = model.generate_content([prompt, img])
-        ai_output = clean_json_response(response.text)
-        
-        parsed_json = json.loads(ai_output)
+        with span("classify_item.parse"):
+            ai_output = clean_json_response(response_text)
+            parsed_json = json.loads(ai_output)
         
         required_keys = {"type", "color", "style"}
         if not required_keys.issubset(parsed_json.keys()):
             raise ValueError("AI Vision response is missing the expected English JSON format.")
 
+        _classification_cache.set(cache_key, parsed_json)
         return parsed_json
 
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON from AI Vision: {e}")
-        ai_output = response.text
-        print(f"Raw output from AI Vision: {ai_output}")
+        print(f"Raw output from AI Vision: {response_text}")
         return None
     except Exception as e:
         print(f"Error during AI Vision classification (Gemini): {e}")
@@ -1,26 +1,43 @@
 import streamlit as st
-from PIL import Image
-from rembg import remove
 import os
-import shutil  # Kita perlu ini untuk menyalin file
 import base64  # Diperlukan untuk memuat CSS
+import time
 
 
 # Impor fungsi dari file rekan satu tim kamu
 # Pastikan semua file (.py) ada di folder yang sama
 try:
-    from ai_processing import classify_item, remove_background
+    from ingest_queue import UploadRejected, get_ingest_queue
     # IMPORT FUNGSI BARU (delete_item_from_wardrobe) DARI data_management
-    from data_management import load_wardrobe, save_item_to_wardrobe, delete_item_from_wardrobe
+    from data_management import load_wardrobe, delete_item_from_wardrobe
+    from data_management import DEFAULT_CLOSET, list_closets, set_current_closet, validate_closet_id
+    from data_management import query_wardrobe, get_wardrobe_facets, get_wardrobe_facet_counts, count_wardrobe_items, get_items
+    from data_management import ItemVersionConflict, relabel_items, update_item
+    from thumbnails import get_thumbnail_path
+    from image_store import missing_image_placeholder, start_background_gc
     # (Ganti nama 'logika_styling' jika berbeda)
-    from logika_styling import get_ootd_feedback, get_weather_data
+    from logika_styling import get_quick_ootd_feedback, get_weather_data
+    from metrics import start_trace, finish_trace, span, get_registry, start_metrics_server
+    # Modul berat (numpy, rembg, Gemini) diimpor saat dipakai; lihat startup.py
+    from startup import is_loaded, start_warmup
 except ImportError:
-    st.error("Failed to load module files (ai_processing, data_management, logika_styling). Make sure all files are in the same folder.")
+    st.error("Failed to load module files (ingest_queue, data_management, logika_styling). Make sure all files are in the same folder.")
     st.stop()
 
 # --- Konfigurasi Halaman ---
 st.set_page_config(page_title="Smart Wardrobe", page_icon="👗", layout="wide")
 
+# --- Diagnostik: setiap rerun dicatat sebagai satu trace ---
+rerun_trace = start_trace("rerun")
+# Endpoint /metrics (Prometheus) dan /metrics.json, hanya kalau METRICS_PORT di-set
+start_metrics_server()
+# Tab diagnostik tersembunyi: buka dengan ?diagnostics=1 atau WARDROBE_DIAGNOSTICS=1
+SHOW_DIAGNOSTICS = (
+    st.query_params.get("diagnostics") == "1" or os.environ.get("WARDROBE_DIAGNOSTICS") == "1"
+)
+# Jumlah rerun terakhir yang ditampilkan di tab diagnostik
+DIAGNOSTICS_HISTORY = 10
+
 # --- FUNGSI DESAIN BARU: Memuat CSS Kustom ---
 def load_css(file_name):
     """Fungsi untuk memuat file CSS kustom dari lokal."""
@@ -33,184 +50,363 @@ def load_css(file_name):
 # Panggil fungsi CSS di sini
 load_css("style.css")
 
-# --- Inisialisasi Direktori ---
-TEMP_DIR = "temp_uploads"
-if not os.path.exists(TEMP_DIR):
-    os.makedirs(TEMP_DIR)
+# --- Lemari aktif ---
+# Setiap pengguna bisa punya lemari sendiri (database + folder gambar terpisah).
+# Lemari dipilih lewat URL (?closet=nama), jadi bisa di-bookmark.
+closet_id = st.query_params.get("closet", DEFAULT_CLOSET)
+try:
+    set_current_closet(closet_id)
+except ValueError:
+    st.error(f"Invalid closet name '{closet_id}'. Showing the default closet instead.")
+    closet_id = DEFAULT_CLOSET
+    set_current_closet(closet_id)
+
+# Pilihan/tampilan yang berisi ID item tidak boleh terbawa ke lemari lain
+if st.session_state.get('active_closet') != closet_id:
+    st.session_state.active_closet = closet_id
+    st.session_state.selected_item_ids = []
+    st.session_state.pop('similar_to', None)
 
-PERMANENT_DIR = "wardrobe_images"
-if not os.path.exists(PERMANENT_DIR):
-    os.makedirs(PERMANENT_DIR)
+with st.sidebar:
+    st.subheader("👤 Your Closet")
+    closet_input = st.text_input(
+        "Closet name", value=closet_id,
+        help="Each closet has its own items and photos. Type a new name to create one.",
+    ).strip().lower()
+    st.caption("Existing closets: " + ", ".join(list_closets()))
+    if closet_input and closet_input != closet_id:
+        try:
+            validate_closet_id(closet_input)
+            st.query_params["closet"] = closet_input
+            st.rerun()
+        except ValueError:
+            st.error("Use only lowercase letters, numbers, '-' and '_'.")
 
 # --- Fungsi Bantuan ---
-def save_uploaded_file(uploaded_file):
-    """Menyimpan file yang di-upload ke lokasi sementara."""
-    try:
-        img_path = os.path.join(TEMP_DIR, uploaded_file.name)
-        with open(img_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return img_path
-    except Exception as e:
-        st.error(f"Error saving file: {e}")
-        return None
-
-def get_new_item_id(wardrobe_list):
-    """Membuat ID unik baru berdasarkan jumlah item saat ini."""
-    return f"CLO{len(wardrobe_list) + 1:03d}"
+# Seberapa sering (detik) panel antrean analisis di Tab 1 diperbarui selama ada job berjalan
+INGEST_REFRESH_SECONDS = 2
+
+# Jumlah kartu per halaman grid (hanya halaman aktif yang dirender)
+PAGE_SIZE = 20
+
+def page_selector(key, total_items):
+    """Pilihan halaman untuk grid. Mengembalikan offset item pertama di halaman aktif."""
+    num_pages = max(1, -(-total_items // PAGE_SIZE))
+    if num_pages == 1:
+        return 0
+    page = st.selectbox(
+        "Page", range(1, num_pages + 1), key=key,
+        format_func=lambda p: f"Page {p} of {num_pages}",
+    )
+    return (page - 1) * PAGE_SIZE
 
 # --- Tampilan Utama Aplikasi ---
 st.title("Smart Wardrobe 👗")
 st.caption("Your Personal Fashion Assistant. No more 'I have nothing to wear' moments.")
 
 # --- Gunakan TABS untuk memisahkan fungsionalitas ---
-tab1, tab2, tab3 = st.tabs([
+tab_labels = [
     "👕 1. Add Item to Closet",
     "🧐 2. View Digital Closet",
     "✨ 3. Mix & Match OOTD"
-])
+]
+if SHOW_DIAGNOSTICS:
+    tab_labels.append("🩺 Diagnostics")
+tab1, tab2, tab3, *tab_diagnostics = st.tabs(tab_labels)
 
 # =======================================================================
 # --- TAB 1: Katalogisasi / Tambah Baju ---
 # =======================================================================
 with tab1:
     st.header("Upload Your Clothing")
-    st.write("Upload a photo of a single clothing item (top, bottom, etc.) to save it to your digital closet.")
-   
-    uploaded_image = st.file_uploader("Choose a clothing image...", type=["jpg", "jpeg", "png"], key="uploader")
-   
-    col1, col2 = st.columns(2)
-   
-    with col1:
-        if uploaded_image:
-            st.image(uploaded_image, caption="Uploaded Image", use_container_width=True)
-           
-            if st.button("Analyze This Item", key="analyze_btn", use_container_width=True):
-                with st.spinner("AI is analyzing your image..."):
-                    temp_path = save_uploaded_file(uploaded_image)
-                   
-                    if temp_path:
-                        classification_result = classify_item(temp_path)
-                       
-                        if classification_result:
-                            st.success("Analysis Complete!")
-                            st.session_state.current_item = classification_result
-                            st.session_state.temp_image_path = temp_path
+    st.write("Upload photos of single clothing items (top, bottom, etc.). They are analyzed in the background, "
+             "so you can keep browsing your closet while the AI works.")
+
+    # Key uploader diganti setelah antre, supaya daftar file kosong lagi
+    if 'uploader_key' not in st.session_state:
+        st.session_state.uploader_key = 0
+    uploaded_images = st.file_uploader(
+        "Choose clothing images...", type=["jpg", "jpeg", "png"], accept_multiple_files=True,
+        key=f"uploader_{st.session_state.uploader_key}",
+    )
+    auto_save = st.checkbox(
+        "Save automatically after analysis (skip review)", key="auto_save",
+        help="Useful when adding many items at once. You can still edit or delete them in Tab 2.",
+    )
+
+    if uploaded_images and st.button(f"Analyze {len(uploaded_images)} Item(s)", key="analyze_btn",
+                                     type="primary", use_container_width=True):
+        queue = get_ingest_queue()
+        queued, rejected = 0, []
+        for uploaded_image in uploaded_images:
+            # File diteruskan apa adanya (dibaca per potongan), tidak disalin utuh ke memori
+            try:
+                queue.enqueue(uploaded_image, uploaded_image.name, auto_save=auto_save)
+                queued += 1
+            except UploadRejected as e:
+                rejected.append(f"{uploaded_image.name}: {e}")
+        st.session_state.uploader_key += 1
+        if queued:
+            st.toast(f"{queued} item(s) added to the analysis queue.")
+        if rejected:
+            st.session_state.rejected_uploads = rejected
+        st.rerun()
+
+    # Ditampilkan setelah rerun di atas, lalu dihapus
+    for message in st.session_state.pop('rejected_uploads', []):
+        st.error(f"Skipped {message}")
+
+    # Worker antrean baru dijalankan setelah halaman pertama tampil (lihat bagian akhir)
+    ingest_queue = get_ingest_queue(start_workers=False)
+    has_active_jobs = any(ingest_queue.counts().get(status) for status in ('queued', 'running'))
+
+    # Hanya bagian antrean yang di-refresh berkala (bukan seluruh halaman) selama ada job berjalan
+    @st.fragment(run_every=INGEST_REFRESH_SECONDS if has_active_jobs else None)
+    def ingest_queue_panel():
+        # Rerun fragment berjalan terpisah, jadi lemari aktif di-set ulang
+        set_current_closet(closet_id)
+        queue = get_ingest_queue(start_workers=False)
+        jobs = queue.list_jobs(statuses=('queued', 'running', 'ready', 'failed'))
+        recent_done = queue.list_jobs(statuses=('done',), limit=5)
+        if not jobs and not recent_done:
+            return
+
+        st.subheader("Analysis Queue")
+        for job in jobs:
+            name = job['original_name'] or job['id'][:8]
+            if job['status'] in ('queued', 'running'):
+                label = "Saving" if job['stage'] == 'save' else "Analyzing"
+                st.caption(f"⏳ {label} **{name}**..." + (f" (retrying: {job['error']})" if job['error'] else ""))
+                continue
+
+            with st.container(border=True):
+                col1, col2 = st.columns(2)
+                with col1:
+                    preview = job['nobg_path'] if job['nobg_path'] and os.path.exists(job['nobg_path']) else job['source_path']
+                    if os.path.exists(preview):
+                        st.image(preview, caption=name, use_container_width=True)
+                with col2:
+                    if job['status'] == 'ready':
+                        st.subheader("AI Analysis Result")
+                        st.json(job['result'])
+                        st.info("If the analysis is correct, save it to your closet.")
+                        if st.button("Save to Digital Closet", key=f"save_{job['id']}", type="primary",
+                                     use_container_width=True):
+                            queue.confirm(job['id'])
                             st.rerun()
-                        else:
-                            st.error("Failed to analyze image. Please try again.")
-   
-    with col2:
-        if 'current_item' in st.session_state:
-            st.subheader("AI Analysis Result")
-            st.json(st.session_state.current_item)
-            st.info("If the analysis is correct, save it to your closet.")
-
-
-            if st.button("Save to Digital Closet", key="save_btn", type="primary", use_container_width=True):
-               
-                item_data = st.session_state.current_item
-                temp_path = st.session_state.temp_image_path
-               
-                with st.spinner("Removing background and saving..."):
-                    current_wardrobe = load_wardrobe()
-                    new_id = get_new_item_id(current_wardrobe)
-                    processed_pil_image = remove_background(temp_path)
-                    permanent_path = os.path.join(PERMANENT_DIR, f"{new_id}.png")
-                   
-                    try:
-                        processed_pil_image.save(permanent_path, "PNG")
-                        os.remove(temp_path)
-                        item_data['id'] = new_id
-                        item_data['image_path'] = permanent_path
-                        save_item_to_wardrobe(item_data)
-                        st.success(f"Item {new_id} saved successfully (without background)!")
-                        st.balloons()
-                       
-                        del st.session_state.current_item
-                        del st.session_state.temp_image_path
+                    else:
+                        st.error(f"Failed to analyze {name}: {job['error']}")
+                        if st.button("Retry", key=f"retry_{job['id']}", use_container_width=True):
+                            queue.retry(job['id'])
+                            st.rerun()
+                    if st.button("Discard", key=f"discard_{job['id']}", use_container_width=True):
+                        queue.cancel(job['id'])
                         st.rerun()
-                       
-                    except Exception as e:
-                        st.error(f"Failed to save processed image: {e}")
+
+        for job in recent_done:
+            duplicates = (job['result'] or {}).get('duplicates')
+            if duplicates:
+                st.warning(f"Item {job['item_id']} looks almost identical to {', '.join(duplicates)} "
+                           "already in your closet. Delete it in Tab 2 if it's a duplicate.")
+            else:
+                st.caption(f"✅ {job['original_name'] or 'Item'} saved as {job['item_id']}.")
+
+    ingest_queue_panel()
 
 # =======================================================================
-# --- TAB 2: Lihat Lemari Digital (Update Desain + Delete) ---
+# --- TAB 2: Lihat Lemari Digital (Update Desain + Edit + Delete) ---
 # =======================================================================
 with tab2:
     st.header("Your Digital Closet")
-    st.write("View, search, and delete all the items you have saved.")
+    st.write("View, search, edit, and delete all the items you have saved.")
 
-    wardrobe = load_wardrobe()
+    total_items = count_wardrobe_items()
 
-    if not wardrobe:
+    if not total_items:
         st.warning("Your digital closet is empty. Please add items in Tab 1 first.")
     else:
         # --- Opsi Filter ---
         st.subheader("Filter Closet")
-        # --- PERUBAHAN DI SINI ---
-        # Menggunakan kunci 'type' dan 'color'
-        all_jenis = sorted(list(set(item['type'] for item in wardrobe)))
-        all_warna = sorted(list(set(item['color'] for item in wardrobe)))
+        # Pilihan 'type' dan 'color' beserta jumlahnya, dihitung dari snapshot kolom (NumPy).
+        # Selama numpy belum dimuat (render pertama, sebelum warm-up selesai) jumlahnya
+        # dihitung lewat indeks SQLite, supaya halaman pertama tidak ikut memuat numpy.
+        facets = get_wardrobe_facet_counts() if is_loaded("numpy") else get_wardrobe_facets()
+        all_jenis = list(facets['type'])
+        all_warna = list(facets['color'])
 
 
         col_f1, col_f2, col_f3 = st.columns(3)
         with col_f1:
             # Label diubah ke 'Type'
-            filter_jenis = st.multiselect("Filter by Type:", all_jenis)
+            filter_jenis = st.multiselect("Filter by Type:", all_jenis,
+                                          format_func=lambda value: f"{value} ({facets['type'][value]})")
         with col_f2:
-            filter_warna = st.multiselect("Filter by Color:", all_warna)
+            filter_warna = st.multiselect("Filter by Color:", all_warna,
+                                          format_func=lambda value: f"{value} ({facets['color'][value]})")
         with col_f3:
             filter_gaya = st.text_input("Search by Style (e.g., 'Shirt', 'Jeans'):")
 
+        # --- Ganti nama warna/jenis di semua item sekaligus (satu UPDATE di database) ---
+        with st.expander("Rename a color or type across all items"):
+            from color_palette import PALETTE_NAMES
+            relabel_field = st.radio("Field", ("color_name", "type"), horizontal=True,
+                                     format_func={"color_name": "Color", "type": "Type"}.get)
+            col_r1, col_r2 = st.columns(2)
+            with col_r1:
+                relabel_from = st.selectbox("Rename", list(facets['color' if relabel_field == 'color_name' else 'type']),
+                                            key=f"relabel_from_{relabel_field}")
+            with col_r2:
+                if relabel_field == 'color_name':
+                    relabel_to = st.selectbox("To", PALETTE_NAMES, index=None, placeholder="Choose a color",
+                                              key="relabel_to_color")
+                else:
+                    relabel_to = st.text_input("To", key="relabel_to_type").strip()
+            relabel = (relabel_field, relabel_from, relabel_to)
+            if st.button("Rename All", key="relabel_btn",
+                         disabled=not relabel_from or not relabel_to or relabel_from == relabel_to):
+                st.session_state.relabel_pending = relabel
+            # Konfirmasi dulu (dengan jumlah item yang kena) sebelum UPDATE massal
+            if st.session_state.get('relabel_pending') == relabel:
+                if relabel_field == 'color_name':
+                    affected = count_wardrobe_items(colors=[relabel_from])
+                else:
+                    affected = count_wardrobe_items(types=[relabel_from])
+                st.warning(f"This will change **{affected}** item(s) from **{relabel_from}** to **{relabel_to}**.")
+                col_c1, col_c2 = st.columns(2)
+                if col_c1.button("Confirm Rename", key="relabel_confirm", type="primary"):
+                    del st.session_state.relabel_pending
+                    changed = relabel_items(relabel_field, relabel_from, relabel_to)
+                    st.toast(f"{changed} item(s) changed from {relabel_from} to {relabel_to}.")
+                    st.rerun()
+                if col_c2.button("Cancel", key="relabel_cancel"):
+                    del st.session_state.relabel_pending
+                    st.rerun()
 
-        # --- Logika Filter ---
-        filtered_wardrobe = wardrobe
-        if filter_jenis:
-            # Menggunakan kunci 'type'
-            filtered_wardrobe = [item for item in filtered_wardrobe if item['type'] in filter_jenis]
-        if filter_warna:
-            # Menggunakan kunci 'color'
-            filtered_wardrobe = [item for item in filtered_wardrobe if item['color'] in filter_warna]
-        if filter_gaya:
-            # Menggunakan kunci 'style'
-            filtered_wardrobe = [item for item in filtered_wardrobe if filter_gaya.lower() in item['style'].lower()]
+
+        # --- Logika Filter (jumlah lewat indeks, lalu hanya 1 halaman yang diambil dari database) ---
+        total_filtered = count_wardrobe_items(filter_jenis, filter_warna, filter_gaya)
 
         st.divider()
-        st.write(f"Showing **{len(filtered_wardrobe)}** of **{len(wardrobe)}** total items.")
+        st.write(f"Showing **{total_filtered}** of **{total_items}** total items.")
+        offset = page_selector("closet_page", total_filtered)
+        filtered_wardrobe, _ = query_wardrobe(
+            filter_jenis, filter_warna, filter_gaya, offset=offset, limit=PAGE_SIZE
+        )
 
-        # --- Tampilan Grid Visual (DENGAN CSS CARD) ---
         num_cols = 5
+
+        # --- "More like this": item yang mirip dengan item pilihan ---
+        similar_to = st.session_state.get('similar_to')
+        if similar_to:
+            from embeddings import find_similar_items
+            similar_items = get_items(item_id for item_id, _ in find_similar_items(similar_to, k=num_cols))
+            st.subheader(f"More like {similar_to}")
+            similar_cols = st.columns(num_cols)
+            with span("render.similar_items"):
+                for col, item in zip(similar_cols, similar_items):
+                    with col:
+                        thumb_path = get_thumbnail_path(item)
+                        if thumb_path:
+                            st.image(thumb_path, use_container_width=True)
+                        st.caption(f"({item['id']}) {item['style']}")
+            if st.button("Close", key="close_similar"):
+                del st.session_state.similar_to
+                st.rerun()
+            st.divider()
+
+        # --- Edit item: perbaiki hasil klasifikasi tanpa hapus dan upload ulang ---
+        editing = st.session_state.get('editing_item')
+        edit_item = get_items([editing['id']]) if editing else []
+        if edit_item:
+            edit_item = edit_item[0]
+            from color_palette import PALETTE_NAMES
+            if st.session_state.get('edit_conflict'):
+                st.error(st.session_state.pop('edit_conflict'))
+            # Kunci widget memuat versi item, jadi setelah konflik form diisi ulang dengan data terbaru
+            form_key = f"{editing['id']}_{editing['version']}"
+            with st.form(f"edit_item_{form_key}"):
+                st.subheader(f"Edit {editing['id']}")
+                col_e1, col_e2 = st.columns(2)
+                with col_e1:
+                    new_type = st.text_input("Type", value=edit_item.get('type') or "", key=f"edit_type_{form_key}")
+                    new_style = st.text_input("Style", value=edit_item.get('style') or "", key=f"edit_style_{form_key}")
+                with col_e2:
+                    new_color = st.text_input("Color", value=edit_item.get('color') or "", key=f"edit_color_{form_key}")
+                    # Nilai lama di luar palet tetap jadi pilihan (dan default), supaya
+                    # menyimpan field lain tidak diam-diam mengganti grup warnanya
+                    current_color_name = edit_item.get('color_name')
+                    color_options = list(PALETTE_NAMES)
+                    if current_color_name and current_color_name not in color_options:
+                        color_options.append(current_color_name)
+                    new_color_name = st.selectbox(
+                        "Color group (filter)", color_options,
+                        index=color_options.index(current_color_name) if current_color_name else None,
+                        placeholder="(none)", key=f"edit_color_name_{form_key}",
+                    )
+                col_save, col_cancel = st.columns(2)
+                save_clicked = col_save.form_submit_button("Save Changes", type="primary", use_container_width=True)
+                cancel_clicked = col_cancel.form_submit_button("Cancel", use_container_width=True)
+            if save_clicked:
+                edited = {"type": new_type.strip(), "style": new_style.strip(),
+                          "color": new_color.strip(), "color_name": new_color_name}
+                changes = {field: value for field, value in edited.items() if value != edit_item.get(field)}
+                try:
+                    update_item(editing['id'], expected_version=editing['version'], **changes)
+                    del st.session_state.editing_item
+                    st.toast(f"Item {editing['id']} has been updated.")
+                except ItemVersionConflict as e:
+                    st.session_state.edit_conflict = (
+                        f"Item {editing['id']} was changed in another session. "
+                        "The form now shows the latest version; please apply your changes again."
+                    )
+                    st.session_state.editing_item = {"id": editing['id'], "version": e.current_version}
+                st.rerun()
+            if cancel_clicked:
+                del st.session_state.editing_item
+                st.rerun()
+            st.divider()
+        elif editing:
+            del st.session_state.editing_item  # item sudah dihapus
+
+        # --- Tampilan Grid Visual (DENGAN CSS CARD) ---
         cols = st.columns(num_cols)
        
-        for i, item in enumerate(filtered_wardrobe):
-            with cols[i % num_cols]:
-                # PERBAIKAN: Bungkus setiap kartu dengan st.container()
-                # CSS akan secara otomatis menargetkan container ini
-                with st.container():
-                    img_path = item.get('image_path', '')
+        with span("render.closet_grid"):
+            for i, item in enumerate(filtered_wardrobe):
+                with cols[i % num_cols]:
+                    # PERBAIKAN: Bungkus setiap kartu dengan st.container()
+                    # CSS akan secara otomatis menargetkan container ini
+                    with st.container():
+                        thumb_path = get_thumbnail_path(item)
                    
-                    if os.path.exists(img_path):
-                        st.image(img_path, use_container_width=True)
-                    else:
-                        st.image("https://placehold.co/200x200/eee/aaa?text=No+Image", use_container_width=True)
+                        if thumb_path:
+                            st.image(thumb_path, use_container_width=True)
+                        else:
+                            st.image(missing_image_placeholder(), caption="Image missing", use_container_width=True)
                    
-                    # Tampilkan detail
-                    # Menggunakan kunci 'style', 'type', 'color'
-                    st.markdown(f"<h6>{item['style']}</h6>", unsafe_allow_html=True)
-                    st.markdown(f"**Type:** {item['type']}")
-                    st.markdown(f"**Color:** {item['color']}")
-                    st.caption(f"ID: {item['id']}")
+                        # Tampilkan detail
+                        # Menggunakan kunci 'style', 'type', 'color'
+                        st.markdown(f"<h6>{item['style']}</h6>", unsafe_allow_html=True)
+                        st.markdown(f"**Type:** {item['type']}")
+                        st.markdown(f"**Color:** {item.get('color_name') or item['color']}")
+                        st.caption(f"ID: {item['id']}")
                    
-                    # FITUR BARU: Tombol Hapus
-                    st.markdown("---") # Pemisah kecil
-                    if st.button("Delete", key=f"delete_{item['id']}", use_container_width=True):
-                        try:
-                            # Panggil fungsi delete dari data_management.py
-                            delete_item_from_wardrobe(item['id'])
-                            st.toast(f"Item {item['id']} has been deleted.")
-                            st.rerun() # Refresh halaman untuk update galeri
-                        except Exception as e:
-                            st.error(f"Failed to delete item: {e}")
+                        # FITUR BARU: Tombol Hapus
+                        st.markdown("---") # Pemisah kecil
+                        if st.button("More like this", key=f"similar_{item['id']}", use_container_width=True):
+                            st.session_state.similar_to = item['id']
+                            st.rerun()
+                        if st.button("Edit", key=f"edit_{item['id']}", use_container_width=True):
+                            st.session_state.editing_item = {"id": item['id'], "version": item.get('version', 1)}
+                            st.rerun()
+                        if st.button("Delete", key=f"delete_{item['id']}", use_container_width=True):
+                            try:
+                                # Panggil fungsi delete dari data_management.py
+                                delete_item_from_wardrobe(item['id'])
+                                st.toast(f"Item {item['id']} has been deleted.")
+                                st.rerun() # Refresh halaman untuk update galeri
+                            except Exception as e:
+                                st.error(f"Failed to delete item: {e}")
 
 # =======================================================================
 # --- TAB 3: Mix & Match (OOTD Generator) (Update Desain) ---
@@ -219,35 +415,52 @@ with tab3:
     st.header("Check OOTD Compatibility")
     st.write("Select 2 or 3 items from your digital closet to be rated by the AI Stylist.")
 
-    wardrobe = load_wardrobe()
+    total_items = count_wardrobe_items()
    
-    if not wardrobe:
+    if not total_items:
         st.warning("Your digital closet is empty. Please add items in Tab 1 first.")
     else:
         st.subheader("**Select Items:**")
 
+        # Pilihan disimpan di session_state supaya tidak hilang saat pindah halaman
+        if 'selected_item_ids' not in st.session_state:
+            st.session_state.selected_item_ids = []
+        selected_ids = st.session_state.selected_item_ids
+
+        offset = page_selector("ootd_page", total_items)
+        page_items, _ = query_wardrobe(offset=offset, limit=PAGE_SIZE)
+
         # --- Tampilan Grid Visual dengan Checkbox (DENGAN CSS CARD) ---
         num_cols = 5
         cols = st.columns(num_cols)
        
-        selected_items_data = []
-       
-        for i, item in enumerate(wardrobe):
-            with cols[i % num_cols]:
-                # PERBAIKAN: Bungkus setiap kartu dengan st.container()
-                with st.container():
-                    img_path = item.get('image_path', '')
+        with span("render.ootd_grid"):
+            for i, item in enumerate(page_items):
+                with cols[i % num_cols]:
+                    # PERBAIKAN: Bungkus setiap kartu dengan st.container()
+                    with st.container():
+                        thumb_path = get_thumbnail_path(item)
                    
-                    if os.path.exists(img_path):
-                        st.image(img_path, use_container_width=True)
-                    else:
-                        st.image("https://placehold.co/200x200/eee/aaa?text=No+Image", use_container_width=True)
+                        if thumb_path:
+                            st.image(thumb_path, use_container_width=True)
+                        else:
+                            st.image(missing_image_placeholder(), caption="Image missing", use_container_width=True)
                    
-                    # Menggunakan kunci 'style'
-                    item_label = f"({item['id']}) {item['style']}"
+                        # Menggunakan kunci 'style'
+                        item_label = f"({item['id']}) {item['style']}"
                    
-                    if st.checkbox(item_label, key=f"select_{item['id']}"):
-                        selected_items_data.append(item)
+                        is_selected = st.checkbox(
+                            item_label, value=item['id'] in selected_ids, key=f"select_{item['id']}"
+                        )
+                        if is_selected and item['id'] not in selected_ids:
+                            selected_ids.append(item['id'])
+                        elif not is_selected and item['id'] in selected_ids:
+                            selected_ids.remove(item['id'])
+
+        # Item terpilih (termasuk dari halaman lain); item yang sudah dihapus otomatis hilang
+        selected_items_data = get_items(selected_ids)
+        if selected_items_data:
+            st.caption("Selected: " + ", ".join(f"{item['id']} ({item['style']})" for item in selected_items_data))
 
         st.divider()
 
@@ -256,6 +469,12 @@ with tab3:
        
         city = st.text_input("Enter your city (e.g., Jakarta, New York):", "Jakarta")
        
+        use_ai_stylist = st.checkbox(
+            "Ask the AI Stylist (Gemini) for a detailed opinion",
+            help="By default the outfit is rated instantly by local styling rules. "
+                 "The AI is also used automatically when the local rating is unsure.",
+        )
+
         is_ready_to_check = (len(selected_items_data) >= 2)
        
         if st.button("Get Feedback, Oracle!", disabled=(not is_ready_to_check), type="primary", use_container_width=True):
@@ -268,13 +487,20 @@ with tab3:
                 with st.spinner(f"Checking weather in {city} and mixing matches..."):
                    
                     current_weather_info = get_weather_data(city)
-                    feedback_result = get_ootd_feedback(selected_items_data, current_weather_info)
+                    feedback_result = get_quick_ootd_feedback(
+                        selected_items_data, current_weather_info, use_ai=use_ai_stylist
+                    )
                    
                     if feedback_result:
                         st.subheader("The OOTD Oracle says:")
                         rating_val = feedback_result.get('rating', 0)
                         st.metric(label="Compatibility Rating", value=f"{rating_val}/10")
                         st.caption(f"Rating based on weather: {current_weather_info}")
+                        if feedback_result.get('low_confidence'):
+                            st.caption("⚠️ The AI Stylist is unavailable right now; this rough rating "
+                                       "comes from the local styling rules.")
+                        elif feedback_result.get('source') == 'local':
+                            st.caption("⚡ Rated instantly by local styling rules.")
                         st.info(f"**Feedback:** {feedback_result.get('feedback', 'N/A')}")
                         st.success(f"**Suggestion:** {feedback_result.get('saran', 'N/A')}")
                     else:
@@ -282,3 +508,78 @@ with tab3:
         elif not is_ready_to_check:
             st.caption("Select at least 2 items to get a rating.")
 
+        # --- Auto-Suggest: susun outfit terbaik dari seluruh isi lemari ---
+        st.divider()
+        st.subheader("Auto-Suggest Outfits")
+        st.write("Let the app build the best outfits from your whole closet for the weather in your city.")
+
+        explain_with_ai = st.checkbox("Let the AI Stylist explain the top 3 suggestions", key="explain_suggestions")
+
+        if st.button("Suggest Outfits", key="suggest_btn", use_container_width=True):
+            if not city:
+                st.error("Please enter a city name to check the weather!")
+            else:
+                with st.spinner(f"Checking weather in {city} and building outfits..."):
+                    from outfit_generator import suggest_outfits, explain_outfits
+                    current_weather_info = get_weather_data(city)
+                    suggestions = suggest_outfits(load_wardrobe(), current_weather_info, top_k=5)
+                    if suggestions and explain_with_ai:
+                        explain_outfits(suggestions, current_weather_info)
+
+                if not suggestions:
+                    st.warning("Add at least one top and one bottom (or a dress) to get suggestions.")
+                else:
+                    st.caption(f"Suggestions based on weather: {current_weather_info}")
+
+                with span("render.suggestions"):
+                    for rank, suggestion in enumerate(suggestions, start=1):
+                        st.markdown(f"**#{rank} · {suggestion['rating']}/10** — {suggestion['feedback']}")
+                        outfit_cols = st.columns(num_cols)
+                        for col, item in zip(outfit_cols, suggestion['items']):
+                            with col:
+                                thumb_path = get_thumbnail_path(item)
+                                if thumb_path:
+                                    st.image(thumb_path, use_container_width=True)
+                                st.caption(f"({item['id']}) {item['style']}")
+                        st.caption(f"**Suggestion:** {suggestion['saran']}")
+                        if 'ai_feedback' in suggestion:
+                            st.info(f"**AI Stylist:** {suggestion['ai_feedback'].get('feedback', 'N/A')} "
+                                    f"{suggestion['ai_feedback'].get('saran', '')}")
+
+# =======================================================================
+# --- TAB DIAGNOSTIK (tersembunyi) ---
+# =======================================================================
+# Diisi paling akhir supaya rerun ini sudah tercatat lengkap
+finish_trace(rerun_trace)
+# Halaman pertama sudah tampil: impor modul berat di background (WARMUP=0 untuk mematikan),
+# lalu jalankan worker antrean upload dan pembersihan file gambar yatim (IMAGE_GC_INTERVAL=0 untuk mematikan)
+start_warmup()
+get_ingest_queue()
+start_background_gc()
+if 'rerun_traces' not in st.session_state:
+    st.session_state.rerun_traces = []
+st.session_state.rerun_traces = (st.session_state.rerun_traces + [rerun_trace])[-DIAGNOSTICS_HISTORY:]
+
+if tab_diagnostics:
+    with tab_diagnostics[0]:
+        st.header("Diagnostics")
+        st.write(f"This rerun took **{rerun_trace.duration * 1000:.0f} ms**. Where the time went:")
+        st.dataframe(rerun_trace.breakdown(), use_container_width=True)
+        with st.expander("Span timeline (this rerun)"):
+            st.dataframe(rerun_trace.spans, use_container_width=True)
+
+        st.subheader("Recent reruns")
+        st.dataframe([
+            {
+                "started": time.strftime("%H:%M:%S", time.localtime(trace.started_at)),
+                "total_ms": round(trace.duration * 1000, 1),
+                **{entry["name"]: entry["total_ms"] for entry in trace.breakdown()},
+            }
+            for trace in reversed(st.session_state.rerun_traces)
+        ], use_container_width=True)
+
+        st.subheader("Process metrics")
+        registry = get_registry()
+        st.json(registry.snapshot(), expanded=False)
+        st.download_button("Download Prometheus metrics", registry.to_prometheus(),
+                           file_name="wardrobe_metrics.prom", mime="text/plain")
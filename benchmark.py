@@ -0,0 +1,670 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Benchmarks run inside a throwaway workspace directory, so the real
+# wardrobe.db, ai_cache.db, images and embedding index are never touched.
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_IMAGES = [os.path.join(REPO_DIR, name) for name in ("Atasan.jpg", "Bawahan.jpg")]
+
+DEFAULT_SIZES = (10, 1000, 100000)
+# suggest_outfits scores every top x bottom pair at once, so it is measured on at most this many items
+OUTFIT_GENERATOR_MAX_ITEMS = 5000
+
+_TYPES = ("Top", "Top", "Bottom", "Bottom", "Dress", "Outerwear", "Shoes", "Accessory")
+_COLORS = ("White", "black", "Light Blue", "sky blue", "Navy", "denim", "Beige", "olive green",
+           "Red", "burgundy", "mustard yellow", "Pink", "lavender", "Grey", "brown", "teal")
+_STYLES = ("Casual", "Formal", "Linen shirt", "Wool sweater", "Denim jeans", "Tank top",
+           "Leather jacket", "Chiffon dress", "Knit cardigan", "Sneakers", "Ankle boots")
+_WEATHERS = (
+    "Temperature: 33°C, Condition: Clear sky. It's very hot and sunny.",
+    "Temperature: 24°C, Condition: Scattered clouds.",
+    "Temperature: 18°C, Condition: Light rain.",
+    "Temperature: 8°C, Condition: Overcast clouds. It's cold. Layering is needed.",
+)
+
+
+# --- Helpers -------------------------------------------------------------
+
+def _measure(fn, repeat=5):
+    """Calls fn `repeat` times and summarizes the wall-clock times in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {
+        "runs": repeat,
+        "min_ms": round(times[0], 3),
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+    }
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silences the per-item progress prints of the storage functions while timing."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def synthetic_wardrobe(count, seed=0, start=1):
+    """Deterministic fake closet items (no image files) shaped like saved items."""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"CLO{number:03d}",
+            "type": rng.choice(_TYPES),
+            "color": rng.choice(_COLORS),
+            "style": rng.choice(_STYLES),
+            "image_path": None,
+        }
+        for number in range(start, start + count)
+    ]
+
+
+def synthetic_images(directory, count, size=(1200, 1600), seed=0):
+    """Writes `count` distinct garment-like RGBA PNGs (transparent background) and returns their paths."""
+    import numpy as np
+    from PIL import Image
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        pixels = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+        top, left = size[1] // 8, size[0] // 6
+        base = rng.integers(0, 232, 3)
+        noise = rng.integers(0, 24, (size[1] - 2 * top, size[0] - 2 * left, 3))
+        pixels[top:-top, left:-left, :3] = base + noise
+        pixels[top:-top, left:-left, 3] = 255
+        path = os.path.join(directory, f"synthetic_{seed}_{i}.png")
+        Image.fromarray(pixels, "RGBA").save(path)
+        paths.append(path)
+    return paths
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel: fixed JSON answer after an optional delay."""
+
+    def __init__(self, model_name, latency=0.0):
+        self.model_name = model_name
+        self.latency = latency
+
+    def generate_content(self, contents, request_options=None):
+        if self.latency:
+            time.sleep(self.latency)
+        text = json.dumps({"type": "Top", "color": "Light Blue", "style": "Casual linen shirt"})
+        return type("FakeResponse", (), {"text": text})()
+
+
+class FakeWeatherSession:
+    """Stands in for the requests.Session used by get_weather_data."""
+
+    def get(self, url, params=None, timeout=None):
+        payload = {"main": {"temp": 27.5}, "weather": [{"description": "scattered clouds"}]}
+        return type("FakeResponse", (), {"raise_for_status": lambda self: None, "json": lambda self: payload})()
+
+
+@contextlib.contextmanager
+def isolated_wardrobe(directory):
+    """Points data_management (database, images) and the embedding index at `directory`."""
+    import data_management
+    import embeddings
+
+    os.makedirs(directory, exist_ok=True)
+    previous_dir = os.getcwd()
+    previous = (data_management.WARDROBE_DB, data_management.WARDROBE_FILE, dict(embeddings._indexes))
+    os.chdir(directory)
+    data_management.WARDROBE_DB = os.path.abspath("wardrobe.db")
+    data_management.WARDROBE_FILE = os.path.abspath("wardrobe_data.json")
+    embeddings._indexes.clear()
+    try:
+        with data_management.use_closet(data_management.DEFAULT_CLOSET):
+            yield
+    finally:
+        data_management.WARDROBE_DB, data_management.WARDROBE_FILE, indexes = previous
+        embeddings._indexes.clear()
+        embeddings._indexes.update(indexes)
+        os.chdir(previous_dir)
+
+
+# --- Benchmarks that do not depend on the wardrobe size -----------------
+
+def bench_rembg(image_path=SAMPLE_IMAGES[0], warm_calls=5):
+    """
+    Background removal: cold start (model/session load + first call)
+    versus warm calls that reuse the preloaded rembg session.
+    Needs the rembg model on disk (~/.u2net) when run offline.
+    """
+    import ai_processing
+
+    started = time.perf_counter()
+    ai_processing.get_rembg_session()
+    session_load = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ai_processing.remove_background(image_path)
+    first_call = time.perf_counter() - started
+
+    warm = []
+    for _ in range(warm_calls):
+        started = time.perf_counter()
+        ai_processing.remove_background(image_path)
+        warm.append(time.perf_counter() - started)
+
+    return {
+        "image": os.path.basename(image_path),
+        "session_load_seconds": round(session_load, 3),
+        "cold_call_seconds": round(session_load + first_call, 3),
+        "warm_call_seconds_avg": round(sum(warm) / len(warm), 3),
+        "warm_call_seconds_min": round(min(warm), 3),
+        "warm_images_per_second": round(len(warm) / sum(warm), 3),
+    }
+
+
+def bench_classify_payload(image_path=SAMPLE_IMAGES[0]):
+    """
+    Gemini Vision upload: payload bytes of the raw file (what was sent
+    before) versus the downscaled, re-encoded image. With GOOGLE_API_KEY
+    set it also times one live request of each.
+    """
+    import ai_processing
+    from ai_client import get_ai_client
+
+    with open(image_path, "rb") as f:
+        raw_bytes = f.read()
+
+    started = time.perf_counter()
+    prepared = ai_processing.prepare_image(image_path)
+    prepared.upload_bytes
+    prepare_seconds = time.perf_counter() - started
+
+    result = {
+        "image": os.path.basename(image_path),
+        "raw_payload_bytes": len(raw_bytes),
+        "prepared_payload_bytes": len(prepared.upload_bytes),
+        "payload_reduction": round(len(raw_bytes) / len(prepared.upload_bytes), 2),
+        "prepare_seconds": round(prepare_seconds, 4),
+    }
+
+    if os.environ.get("GOOGLE_API_KEY"):
+        client = get_ai_client()
+        raw_part = {"mime_type": "image/jpeg", "data": raw_bytes}
+        for label, part in (("raw", raw_part), ("prepared", prepared.upload_part)):
+            started = time.perf_counter()
+            client.generate([ai_processing.CLASSIFY_PROMPT, part], name=f"bench_{label}", key=f"bench-{label}-{started}")
+            result[f"{label}_latency_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def bench_classify_fake(repeat=20, latency=0.0):
+    """
+    classify_item end to end against a fake Gemini model: image
+    preparation, cache lookup, the shared AI client and JSON parsing,
+    with the classification cache cold (cleared) and warm.
+    """
+    import ai_processing
+    from ai_client import AIClient, get_ai_client, set_ai_client
+
+    previous = get_ai_client()
+    set_ai_client(AIClient(model_factory=lambda name: FakeModel(name, latency), requests_per_minute=1e9))
+    try:
+        with _quiet():
+            def cold():
+                ai_processing.clear_classification_cache()
+                ai_processing.classify_item(SAMPLE_IMAGES[0])
+            result = {"cold": _measure(cold, repeat)}
+            result["warm"] = _measure(lambda: ai_processing.classify_item(SAMPLE_IMAGES[0]), repeat)
+        result["client_stats"] = {
+            key: value for key, value in get_ai_client().stats().items() if key != "latency"
+        }
+    finally:
+        set_ai_client(previous)
+    return result
+
+
+def bench_thumbnails(count=20):
+    """Thumbnail generation for new images (encode) versus already thumbnailed content (reuse)."""
+    import thumbnails
+
+    with tempfile.TemporaryDirectory() as directory:
+        previous = thumbnails.THUMBNAIL_DIR
+        thumbnails.THUMBNAIL_DIR = os.path.join(directory, "thumbs")
+        try:
+            paths = synthetic_images(os.path.join(directory, "images"), count)
+            started = time.perf_counter()
+            for path in paths:
+                thumbnails.create_thumbnail(path)
+            cold = time.perf_counter() - started
+            started = time.perf_counter()
+            for path in paths:
+                thumbnails.create_thumbnail(path)
+            warm = time.perf_counter() - started
+        finally:
+            thumbnails.THUMBNAIL_DIR = previous
+    return {
+        "images": count,
+        "new_images_per_second": round(count / cold, 2),
+        "existing_images_per_second": round(count / warm, 2),
+    }
+
+
+def bench_weather(repeat=200):
+    """get_weather_data against a fake OpenWeatherMap backend: cache misses versus cache hits."""
+    import logika_styling
+
+    previous = (logika_styling.OPENWEATHER_API_KEY, logika_styling._http_session)
+    logika_styling.OPENWEATHER_API_KEY = "benchmark"
+    logika_styling._http_session = FakeWeatherSession()
+    try:
+        def miss():
+            logika_styling.clear_weather_cache()
+            logika_styling.get_weather_data("Jakarta")
+        result = {"miss": _measure(miss, repeat)}
+        result["hit"] = _measure(lambda: logika_styling.get_weather_data("Jakarta"), repeat)
+    finally:
+        logika_styling.OPENWEATHER_API_KEY, logika_styling._http_session = previous
+        logika_styling.clear_weather_cache()
+    return result
+
+
+_STARTUP_SCRIPT = """
+import json, os, sys, time
+from streamlit.testing.v1 import AppTest
+
+app = AppTest.from_file(os.path.join(sys.argv[1], "app.py"), default_timeout=300)
+print("--- first render ---", file=sys.stderr, flush=True)
+started = time.perf_counter()
+app.run()
+seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "errors": [str(e.value) for e in app.exception]}), flush=True)
+os._exit(0)  # skip interpreter shutdown, which waits on Streamlit's helper threads
+"""
+
+
+def _import_report(stderr, top=10):
+    """Self time per top-level package from `python -X importtime` output (first render only)."""
+    totals = {}
+    lines = stderr.split("--- first render ---", 1)[-1].splitlines()
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    ranked = sorted(totals.items(), key=lambda pair: -pair[1])[:top]
+    return [{"package": package, "seconds": round(us / 1e6, 3)} for package, us in ranked]
+
+
+def bench_startup(app_dir=REPO_DIR, runs=3):
+    """
+    Time to first render of app.py: one full script run in a fresh Python
+    process (modules not imported yet), through Streamlit's AppTest.
+    The import report lists the packages whose import cost the most
+    during that first run. Pass app_dir to measure another checkout,
+    e.g. an older commit, for a before/after comparison.
+    """
+    times, report, errors = [], [], []
+    with tempfile.TemporaryDirectory() as workspace:
+        shutil.copy(os.path.join(app_dir, "style.css"), workspace)
+        env = dict(os.environ, PYTHONPATH=app_dir, WARMUP="0")
+        for run in range(runs):
+            process = subprocess.run(
+                [sys.executable, *(["-X", "importtime"] if run == 0 else []), "-c", _STARTUP_SCRIPT, app_dir],
+                cwd=workspace, env=env, capture_output=True, text=True, check=True,
+            )
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            times.append(result["seconds"])
+            errors.extend(result["errors"])
+            if run == 0:
+                report = _import_report(process.stderr)
+    return {
+        "runs": runs,
+        # the first run is traced with -X importtime, which slows it down a little
+        "first_render_seconds_median": round(statistics.median(times[1:] or times), 3),
+        "first_render_seconds_min": round(min(times), 3),
+        "slowest_imports": report,
+        "errors": errors,
+    }
+
+
+# --- Benchmarks run once per synthetic wardrobe size --------------------
+
+def bench_storage(size, repeat=20):
+    """
+    Wardrobe storage on a fresh database with `size` synthetic items:
+    bulk insert, load_wardrobe (cold = first read after a write, warm =
+    cached), single save/update/delete latency, bulk relabel, filtered
+    queries and facets.
+    """
+    import data_management as dm
+
+    with tempfile.TemporaryDirectory() as directory, isolated_wardrobe(directory):
+        items = synthetic_wardrobe(size)
+        with _quiet():
+            started = time.perf_counter()
+            dm.save_items_to_wardrobe(items)
+            insert_seconds = time.perf_counter() - started
+
+            result = {
+                "bulk_insert_items_per_second": round(size / insert_seconds, 1),
+                "load_wardrobe_cold": _measure(dm.load_wardrobe, 1),
+                "load_wardrobe_warm": _measure(dm.load_wardrobe, repeat),
+            }
+
+            new_items = iter(synthetic_wardrobe(repeat, seed=1, start=size + 1))
+            result["save_item"] = _measure(lambda: dm.save_item_to_wardrobe(next(new_items)), repeat)
+            new_ids = iter(f"CLO{number:03d}" for number in range(size + 1, size + 1 + repeat))
+            result["delete_item"] = _measure(lambda: dm.delete_item_from_wardrobe(next(new_ids)), repeat)
+
+            edit_ids = iter(f"CLO{number:03d}" for number in range(1, repeat + 1))
+            result["update_item"] = _measure(lambda: dm.update_item(next(edit_ids), style="Edited"), repeat)
+            colors = iter(["Navy", "Black"] * repeat)
+            result["relabel_color"] = _measure(lambda: dm.relabel_items("color_name", next(colors), "Teal"), 2)
+
+            result["load_wardrobe_after_write"] = _measure(dm.load_wardrobe, 1)
+            result["get_item"] = _measure(lambda: dm.get_item(f"CLO{max(1, size // 2):03d}"), repeat)
+            result["query_by_type"] = _measure(lambda: dm.query_wardrobe(types=["Top"], limit=20), repeat)
+            result["query_by_type_and_color"] = _measure(
+                lambda: dm.query_wardrobe(types=["Top", "Bottom"], colors=["Light Blue", "Navy"], limit=20), repeat
+            )
+            result["query_style_contains"] = _measure(
+                lambda: dm.query_wardrobe(style_contains="linen", sort_by="color", limit=20), repeat
+            )
+            result["query_last_page"] = _measure(
+                lambda: dm.query_wardrobe(offset=max(0, size - 20), limit=20), repeat
+            )
+            result["facets"] = _measure(dm.get_wardrobe_facets, repeat)
+    return result
+
+
+def _cold_call(fn, reset):
+    """
+    Calls reset() then fn() twice: once timed, once under tracemalloc
+    (which slows allocations down). Returns (result, seconds, bytes
+    still allocated by Python for the result).
+    """
+    reset()
+    started = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - started
+    reset()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, allocated
+
+
+def bench_columns(size, repeat=20):
+    """
+    Whole-closet representations with `size` synthetic items: the list of
+    dicts from load_wardrobe versus the dictionary-encoded NumPy columns
+    (built from the database, or mapped from the on-disk snapshot).
+    Memory is what Python allocated for the result (tracemalloc; the
+    mapped snapshot is file-backed and shows up as snapshot_bytes).
+    Facets and filtered counts are timed on both representations.
+    """
+    from collections import Counter
+
+    import data_management as dm
+
+    with tempfile.TemporaryDirectory() as directory, isolated_wardrobe(directory):
+        with _quiet():
+            dm.save_items_to_wardrobe(synthetic_wardrobe(size))
+        store = dm._get_store()
+
+        def forget_items():
+            store._cache_items = None
+
+        def forget_columns(snapshot=True):
+            store._cache_columns = None
+            if not snapshot and os.path.exists(store.columns_path):
+                os.remove(store.columns_path)
+
+        items, dict_seconds, dict_bytes = _cold_call(dm.load_wardrobe, forget_items)
+        columns, build_seconds, build_bytes = _cold_call(
+            dm.load_wardrobe_columns, lambda: forget_columns(snapshot=False)
+        )
+        mapped, mmap_seconds, mmap_bytes = _cold_call(dm.load_wardrobe_columns, forget_columns)
+        assert mapped.source == columns.source and len(mapped) == len(items)
+
+        def dict_facets():
+            return {field: Counter(item.get(field) for item in items) for field in ("type", "color_name")}
+
+        def dict_count():
+            return sum(1 for item in items if item.get("type") in ("Top", "Bottom")
+                       and item.get("color_name") in ("Light Blue", "Navy")
+                       and "linen" in (item.get("style") or "").lower())
+
+        return {
+            "load_wardrobe_dicts_ms": round(dict_seconds * 1000, 3),
+            "load_wardrobe_dicts_bytes": dict_bytes,
+            "columns_build_ms": round(build_seconds * 1000, 3),
+            "columns_build_bytes": build_bytes,
+            "columns_mmap_ms": round(mmap_seconds * 1000, 3),
+            "columns_mmap_bytes": mmap_bytes,
+            "columns_array_bytes": mapped.nbytes,
+            "snapshot_bytes": os.path.getsize(store.columns_path),
+            "facets_dicts": _measure(dict_facets, repeat),
+            "facets_columns": _measure(lambda: (mapped.facet_counts("type"), mapped.facet_counts("color")), repeat),
+            "filtered_count_dicts": _measure(dict_count, repeat),
+            "filtered_count_columns": _measure(
+                lambda: mapped.count(["Top", "Bottom"], ["Light Blue", "Navy"], "linen"), repeat
+            ),
+        }
+
+
+def bench_change_feed(size, repeat=20):
+    """
+    Refreshing load_wardrobe() and load_wardrobe_columns() after one item
+    changed: applying the change feed to the cached copies (incremental)
+    versus reading the whole closet again (full).
+    """
+    import data_management as dm
+
+    with tempfile.TemporaryDirectory() as directory, isolated_wardrobe(directory):
+        with _quiet():
+            dm.save_items_to_wardrobe(synthetic_wardrobe(size))
+        store = dm._get_store()
+        rng = random.Random(3)
+
+        def change_one():
+            item = dm.get_item(f"CLO{rng.randrange(1, size + 1):03d}")
+            item["color_name"] = rng.choice(("Navy", "Black", "Olive", "Burgundy"))
+            with _quiet():
+                dm.save_items_to_wardrobe([item])
+
+        def timed_refresh(load, forget):
+            seconds = []
+            for _ in range(repeat):
+                change_one()
+                forget()
+                started = time.perf_counter()
+                load()
+                seconds.append(time.perf_counter() - started)
+            return {"median_ms": round(statistics.median(seconds) * 1000, 3)}
+
+        def forget_columns():
+            store._cache_columns = None
+            if os.path.exists(store.columns_path):
+                os.remove(store.columns_path)
+
+        dm.load_wardrobe(), dm.load_wardrobe_columns()
+        return {
+            "load_wardrobe_incremental": timed_refresh(dm.load_wardrobe, lambda: None),
+            "load_wardrobe_full": timed_refresh(dm.load_wardrobe, lambda: setattr(store, "_cache_items", None)),
+            "columns_incremental": timed_refresh(dm.load_wardrobe_columns, lambda: None),
+            "columns_full": timed_refresh(dm.load_wardrobe_columns, forget_columns),
+        }
+
+
+def bench_outfit_scoring(size, repeat=5):
+    """Local outfit rating (score_outfit) and the whole-closet generator (suggest_outfits)."""
+    from outfit_generator import suggest_outfits
+    from outfit_scoring import score_outfit
+
+    wardrobe = synthetic_wardrobe(size)
+    by_type = {}
+    for item in wardrobe:
+        by_type.setdefault(item["type"], []).append(item)
+    rng = random.Random(2)
+    outfits = [
+        [rng.choice(by_type[slot]) for slot in ("Top", "Bottom", "Shoes") if by_type.get(slot)]
+        for _ in range(1000)
+    ]
+
+    started = time.perf_counter()
+    for i, outfit in enumerate(outfits):
+        score_outfit(outfit, _WEATHERS[i % len(_WEATHERS)])
+    score_seconds = time.perf_counter() - started
+
+    generator_items = wardrobe[:OUTFIT_GENERATOR_MAX_ITEMS]
+    return {
+        "score_outfit_per_second": round(len(outfits) / score_seconds, 1),
+        "suggest_outfits_items": len(generator_items),
+        "suggest_outfits": _measure(lambda: suggest_outfits(generator_items, _WEATHERS[1], top_k=5), repeat),
+    }
+
+
+BENCHMARKS = {
+    "rembg": bench_rembg,
+    "classify_payload": bench_classify_payload,
+    "classify_fake": bench_classify_fake,
+    "thumbnails": bench_thumbnails,
+    "weather": bench_weather,
+    "startup": bench_startup,
+}
+
+SIZED_BENCHMARKS = {
+    "storage": bench_storage,
+    "columns": bench_columns,
+    "change_feed": bench_change_feed,
+    "outfit_scoring": bench_outfit_scoring,
+}
+
+
+def _run_metadata(sizes):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "sizes": list(sizes),
+    }
+
+
+def _flatten(results, prefix=""):
+    """{'storage': {'10': {'facets': {'median_ms': 1}}}} -> {'storage.10.facets.median_ms': 1}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_results(old, new, threshold=0.10):
+    """
+    Lines describing metrics that changed by more than `threshold` between
+    two result files. *_ms and *_seconds are better when lower, rates
+    (*_per_second) when higher.
+    """
+    old_flat, new_flat = _flatten(old["results"]), _flatten(new["results"])
+    lines = []
+    for name in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[name], new_flat[name]
+        is_time = name.endswith(("_ms", "_seconds", "_avg", "_min"))
+        is_rate = name.endswith("_per_second")
+        if not (is_time or is_rate) or not before:
+            continue
+        change = (after - before) / before
+        if abs(change) < threshold:
+            continue
+        worse = change > 0 if is_time else change < 0
+        lines.append(f"{'REGRESSION' if worse else 'improved  '} {name}: {before} -> {after} ({change:+.0%})")
+    return lines
+
+
+def run_benchmarks(names, sizes):
+    # Caches and generated files go to a scratch directory instead of the repo
+    workspace = tempfile.mkdtemp(prefix="wardrobe_bench_")
+    os.environ.setdefault("AI_CACHE_DB", os.path.join(workspace, "ai_cache.db"))
+    os.chdir(workspace)
+
+    results = {}
+    for name in names:
+        if name in SIZED_BENCHMARKS:
+            results[name] = {}
+            for size in sizes:
+                print(f"Running benchmark: {name} ({size} items)", file=sys.stderr)
+                results[name][str(size)] = SIZED_BENCHMARKS[name](size)
+            continue
+        print(f"Running benchmark: {name}", file=sys.stderr)
+        try:
+            results[name] = BENCHMARKS[name]()
+        except Exception as e:
+            # e.g. the rembg model is not downloaded on an offline machine
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return {"meta": _run_metadata(sizes), "results": results}
+
+
+if __name__ == "__main__":
+    all_names = list(SIZED_BENCHMARKS) + list(BENCHMARKS)
+    parser = argparse.ArgumentParser(description="Smart Wardrobe performance benchmarks.")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run (default: all): {', '.join(all_names)}")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES),
+                        help="Synthetic wardrobe sizes for the storage/outfit benchmarks")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--app-dir", help="Checkout whose app.py the startup benchmark runs (default: this one)")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in all_names]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    if args.app_dir:
+        app_dir = os.path.abspath(args.app_dir)
+        BENCHMARKS["startup"] = lambda: bench_startup(app_dir)
+
+    report = run_benchmarks(args.names or all_names, args.sizes)
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if baseline:
+        with open(baseline) as f:
+            previous_report = json.load(f)
+        print(f"\nCompared with {previous_report['meta'].get('commit')}:", file=sys.stderr)
+        for line in compare_results(previous_report, report) or ["no changes above 10%"]:
+            print(line, file=sys.stderr)
@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from ai_processing import _background_worker_init, _background_worker_job, classify_item
+from data_management import (
+    DEFAULT_CLOSET, current_closet, get_image_dir, get_items, get_next_item_ids, save_items_to_wardrobe,
+    use_closet,
+)
+from image_store import store_image
+
+# Working folder for staged images and the resume manifest of each import
+STATE_DIR = ".bulk_import"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def collect_images(source, work_dir):
+    """Lists the images in a folder (recursively) or extracts them from a zip."""
+    if zipfile.is_zipfile(source):
+        extract_dir = os.path.join(work_dir, "extracted")
+        os.makedirs(extract_dir, exist_ok=True)
+        with zipfile.ZipFile(source) as archive:
+            for member in archive.namelist():
+                if member.lower().endswith(IMAGE_EXTENSIONS) and not member.endswith("/"):
+                    archive.extract(member, extract_dir)
+        source = extract_dir
+
+    images = []
+    for root, _, files in os.walk(source):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append(os.path.join(root, name))
+    return sorted(images)
+
+
+class _Manifest:
+    """Per-import progress file, rewritten atomically so a crash never corrupts it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+
+    def update(self, key, **fields):
+        self.entries.setdefault(key, {}).update(fields)
+        self.flush()
+
+    def flush(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class _StageTimer:
+    def __init__(self):
+        self.started = None
+        self.finished = None
+        self.count = 0
+
+    def tick(self):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        self.finished = now
+        self.count += 1
+
+    def summary(self, started_at):
+        elapsed = (self.finished - started_at) if self.finished else 0.0
+        return {
+            "items": self.count,
+            "seconds": round(elapsed, 3),
+            "items_per_second": round(self.count / elapsed, 2) if elapsed > 0 else None,
+        }
+
+
+def import_closet(source, workers=None, classify_concurrency=4, progress_callback=None, state_dir=STATE_DIR,
+                  closet=None):
+    """
+    Catalogs every image in a folder or zip file into the digital closet.
+
+    Background removal runs on a process pool and classification on a
+    bounded thread pool, both at the same time. Finished items are saved
+    with a single batched commit at the end. Progress is recorded in a
+    manifest, so running the same import again after a crash only redoes
+    the unfinished images.
+
+    progress_callback(stage, done, total) is called after every finished step.
+    Items go into `closet` (default: the current closet).
+    Returns a summary dict with counts and per-stage throughput.
+    """
+    with use_closet(closet or current_closet()):
+        return _import_closet(source, workers, classify_concurrency, progress_callback, state_dir)
+
+
+def _import_closet(source, workers, classify_concurrency, progress_callback, state_dir):
+    source = os.path.abspath(source)
+    closet = current_closet()
+    run_key = source if closet == DEFAULT_CLOSET else f"{closet}:{source}"
+    work_dir = os.path.join(state_dir, hashlib.sha256(run_key.encode("utf-8")).hexdigest()[:16])
+    processed_dir = os.path.join(work_dir, "processed")
+    image_dir = get_image_dir()
+    os.makedirs(processed_dir, exist_ok=True)
+    os.makedirs(image_dir, exist_ok=True)
+
+    manifest = _Manifest(os.path.join(work_dir, "manifest.json"))
+    images = collect_images(source, work_dir)
+    total = len(images)
+
+    def report(stage, done):
+        if progress_callback:
+            progress_callback(stage, done, total)
+
+    # An import that crashed during its commit: items saved under their reserved ID are done
+    interrupted = {
+        key: entry["assigned_id"] for key, entry in manifest.entries.items()
+        if entry.get("assigned_id") and not entry.get("item_id")
+    }
+    saved_ids = {item["id"] for item in get_items(interrupted.values())}
+    for key, item_id in interrupted.items():
+        if item_id in saved_ids:
+            manifest.entries[key]["item_id"] = item_id
+
+    # Identify images by content so renamed/duplicate files are handled once
+    pending = {}
+    for path in images:
+        key = _file_hash(path)
+        entry = manifest.entries.get(key, {})
+        if entry.get("item_id"):
+            # Left over when the previous run stopped right after its commit
+            if entry.get("processed_path") and os.path.exists(entry["processed_path"]):
+                os.remove(entry["processed_path"])
+            continue
+        pending.setdefault(key, path)
+        manifest.entries.setdefault(key, {})["source"] = path
+    manifest.flush()
+
+    started_at = time.perf_counter()
+    timers = {"background_removal": _StageTimer(), "classification": _StageTimer()}
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_background_worker_init) as process_pool, \
+            ThreadPoolExecutor(max_workers=classify_concurrency) as thread_pool:
+        futures = {}
+        for key, path in pending.items():
+            entry = manifest.entries[key]
+            if not entry.get("processed_path") or not os.path.exists(entry["processed_path"]):
+                output_path = os.path.join(processed_dir, f"{key}.png")
+                futures[process_pool.submit(_background_worker_job, path, output_path)] = ("background_removal", key)
+            if not entry.get("classification"):
+                futures[thread_pool.submit(classify_item, path)] = ("classification", key)
+
+        for future in as_completed(futures):
+            stage, key = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error in {stage} for {manifest.entries[key]['source']}: {e}")
+                failed += 1
+                continue
+            if stage == "background_removal":
+                manifest.update(key, processed_path=result)
+            elif result:
+                manifest.update(key, classification=result)
+            else:
+                failed += 1
+            timers[stage].tick()
+            report(stage, timers[stage].count)
+
+    # Single batched commit of every item that finished both stages
+    ready = [
+        key for key in pending
+        if manifest.entries[key].get("classification") and manifest.entries[key].get("processed_path")
+    ]
+    commit_started = time.perf_counter()
+    # IDs are recorded before anything is written, so a crash below is retried under the same
+    # IDs; saving is an upsert on the ID, so an item is never stored twice
+    unassigned = [key for key in ready if not manifest.entries[key].get("assigned_id")]
+    if unassigned:
+        for key, item_id in zip(unassigned, get_next_item_ids(len(unassigned))):
+            manifest.entries[key]["assigned_id"] = item_id
+        manifest.flush()
+    items = []
+    for key in ready:
+        entry = manifest.entries[key]
+        item_data = dict(entry["classification"])
+        item_data["id"] = entry["assigned_id"]
+        item_data["image_path"] = store_image(entry["processed_path"], item_data["id"], image_dir)
+        items.append(item_data)
+    if items:
+        save_items_to_wardrobe(items)
+    for key in ready:
+        manifest.entries[key]["item_id"] = manifest.entries[key]["assigned_id"]
+    manifest.flush()
+    # The staged images are only needed until the items are committed
+    for key in ready:
+        os.remove(manifest.entries[key]["processed_path"])
+    commit_seconds = time.perf_counter() - commit_started
+    report("commit", len(items))
+
+    return {
+        "total_images": total,
+        "imported": len(items),
+        "skipped_already_imported": total - len(pending),
+        "failed": failed,
+        "stages": {
+            **{stage: timer.summary(started_at) for stage, timer in timers.items()},
+            "commit": {"items": len(items), "seconds": round(commit_seconds, 3)},
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import a folder or zip of clothing photos into the digital closet.")
+    parser.add_argument("source", help="Folder or .zip file containing jpg/jpeg/png images")
+    parser.add_argument("--workers", type=int, default=None, help="Background-removal processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel classification requests")
+    parser.add_argument("--closet", default=DEFAULT_CLOSET, help="Closet to import into (default: %(default)s)")
+    args = parser.parse_args()
+
+    def print_progress(stage, done, total):
+        print(f"[{stage}] {done}/{total}")
+
+    summary = import_closet(args.source, workers=args.workers, classify_concurrency=args.concurrency,
+                            progress_callback=print_progress, closet=args.closet)
+    print(json.dumps(summary, indent=2))
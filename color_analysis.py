@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+# Palette and text matching live in color_palette (no NumPy); re-exported here
+from color_palette import PALETTE, PALETTE_NAMES, canonical_color_from_text  # noqa: F401
+
+# Pixels sampled per image and k-means settings
+SAMPLE_SIZE = 64
+KMEANS_CLUSTERS = 3
+KMEANS_ITERATIONS = 12
+
+
+def rgb_to_lab(rgb):
+    """Converts sRGB values (..., 3) in 0..255 to CIE LAB (D65), vectorized."""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    matrix = np.array([
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ])
+    xyz = linear @ matrix.T / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def _hex_to_rgb(hex_color):
+    return [int(hex_color[i:i + 2], 16) for i in (1, 3, 5)]
+
+
+PALETTE_LAB = rgb_to_lab([_hex_to_rgb(hex_color) for _, hex_color in PALETTE])
+
+
+def nearest_palette_color(lab):
+    """Palette name closest to a LAB value (Euclidean distance, i.e. Delta E 1976)."""
+    distances = np.linalg.norm(PALETTE_LAB - np.asarray(lab, dtype=np.float64), axis=1)
+    return PALETTE_NAMES[int(np.argmin(distances))]
+
+
+def _kmeans(points, k, iterations=KMEANS_ITERATIONS):
+    """Plain NumPy k-means; centers start at evenly spaced lightness quantiles (deterministic)."""
+    order = np.argsort(points[:, 0])
+    centers = points[order[np.linspace(0, len(points) - 1, k).astype(int)]].copy()
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        new_centers = np.array([
+            points[labels == c].mean(axis=0) if np.any(labels == c) else centers[c] for c in range(k)
+        ])
+        if np.allclose(new_centers, centers, atol=0.5):
+            break
+        centers = new_centers
+    counts = np.bincount(labels, minlength=k)
+    return centers, counts
+
+
+def extract_dominant_colors(image, k=KMEANS_CLUSTERS):
+    """
+    Dominant colors of the garment, ignoring transparent (background) pixels.
+    `image` is a path or PIL image. Returns [(lab, share), ...], largest first.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        with Image.open(image) as opened:
+            return extract_dominant_colors(opened, k)
+    img = image.convert("RGBA")
+    img.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE))
+    pixels = np.asarray(img, dtype=np.float64).reshape(-1, 4)
+    opaque = pixels[pixels[:, 3] > 127, :3]
+    if len(opaque) == 0:
+        opaque = pixels[:, :3]
+
+    lab = rgb_to_lab(opaque)
+    k = min(k, len(lab))
+    centers, counts = _kmeans(lab, k)
+    order = np.argsort(-counts)
+    total = counts.sum()
+    return [(centers[c], counts[c] / total) for c in order if counts[c]]
+
+
+def analyze_item_colors(image):
+    """
+    Color attributes stored on each item:
+    'color_name' (palette name of the dominant color) and
+    'color_lab' ([L, a, b] of the dominant color, one decimal).
+    """
+    dominant_lab, _ = extract_dominant_colors(image)[0]
+    return {
+        "color_name": nearest_palette_color(dominant_lab),
+        "color_lab": [round(float(value), 1) for value in dominant_lab],
+    }
+
+
+def backfill_colors(wardrobe):
+    """
+    Adds color_name/color_lab to items saved before color extraction existed.
+    Returns the updated items (save them with save_items_to_wardrobe).
+    """
+    updated = []
+    for item in wardrobe:
+        image_path = item.get("image_path")
+        if item.get("color_lab") or not image_path or not os.path.exists(image_path):
+            continue
+        try:
+            item.update(analyze_item_colors(image_path))
+        except Exception as e:
+            print(f"Error extracting colors from {image_path}: {e}")
+            continue
+        updated.append(item)
+    return updated
+
+
+if __name__ == "__main__":
+    from data_management import load_wardrobe, save_items_to_wardrobe
+
+    items = backfill_colors(load_wardrobe())
+    if items:
+        save_items_to_wardrobe(items)
+    print(f"Extracted colors for {len(items)} items.")
@@ -0,0 +1,46 @@
+import re
+
+# Closet color palette and free-text color matching. Kept free of NumPy so
+# the app can list and match palette colors without loading color_analysis.
+
+# Fixed color palette used for the closet's color facet: (name, sRGB hex).
+# Every name is understood by outfit_scoring.color_family().
+PALETTE = (
+    ("White", "#F4F4F2"), ("Black", "#1B1B1B"), ("Grey", "#8A8A8A"), ("Beige", "#D9C9A8"),
+    ("Brown", "#6B4423"), ("Khaki", "#B3A576"), ("Navy", "#1F2A44"), ("Denim Blue", "#4A6A8C"),
+    ("Blue", "#2F5DB8"), ("Light Blue", "#9EC3E6"), ("Teal", "#23837F"), ("Green", "#3C8D40"),
+    ("Olive", "#6B6B2E"), ("Yellow", "#F1D138"), ("Mustard", "#C9A227"), ("Orange", "#E8772E"),
+    ("Red", "#C62828"), ("Maroon", "#6D1A24"), ("Pink", "#F2A0B8"), ("Purple", "#6A3D9A"),
+    ("Lavender", "#B9A5D9"),
+)
+
+PALETTE_NAMES = [name for name, _ in PALETTE]
+
+# Free-text words (as returned by Gemini) -> palette name; longest phrases are checked first
+_TEXT_SYNONYMS = {
+    "light blue": "Light Blue", "sky blue": "Light Blue", "baby blue": "Light Blue",
+    "navy": "Navy", "denim": "Denim Blue", "jeans": "Denim Blue", "teal": "Teal",
+    "turquoise": "Teal", "blue": "Blue", "white": "White", "ivory": "White",
+    "off-white": "White", "cream": "Beige", "beige": "Beige", "tan": "Beige", "camel": "Brown",
+    "brown": "Brown", "chocolate": "Brown", "khaki": "Khaki", "black": "Black",
+    "charcoal": "Grey", "grey": "Grey", "gray": "Grey", "silver": "Grey",
+    "olive": "Olive", "mint": "Green", "green": "Green", "mustard": "Mustard",
+    "gold": "Mustard", "yellow": "Yellow", "coral": "Orange", "orange": "Orange",
+    "burgundy": "Maroon", "maroon": "Maroon", "wine": "Maroon", "red": "Red",
+    "magenta": "Pink", "pink": "Pink", "lavender": "Lavender", "lilac": "Lavender",
+    "violet": "Purple", "purple": "Purple",
+}
+# Whole words only, so 'tan' does not match 'tangerine' nor 'red' 'shredded'
+_SYNONYM_PATTERNS = [
+    (re.compile(rf"\b{re.escape(phrase)}\b"), name)
+    for phrase, name in sorted(_TEXT_SYNONYMS.items(), key=lambda pair: -len(pair[0]))
+]
+
+
+def canonical_color_from_text(color_text):
+    """Maps free text like 'sky blue' or 'Light blue' to a palette name, or None if no color word matches."""
+    text = (color_text or "").strip().lower()
+    for pattern, name in _SYNONYM_PATTERNS:
+        if pattern.search(text):
+            return name
+    return None
@@ -1,55 +1,992 @@
+import contextvars
 import json
 import os # Penting: Diperlukan untuk cek file
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 
-# Nama file database sederhana kita
+from metrics import span, timed
+
+# Nama file database lama (JSON). Sekarang hanya dipakai untuk migrasi sekali jalan.
 WARDROBE_FILE = "wardrobe_data.json"
+# Database SQLite (mode WAL) yang menggantikan file JSON
+WARDROBE_DB = "wardrobe.db"
 # Folder tempat gambar disimpan (harus sama dengan di app.py)
 IMAGE_DIR = "wardrobe_images"
 
-def load_wardrobe():
-    """Memuat data lemari dari file JSON."""
-    if not os.path.exists(WARDROBE_FILE):
-        return [] 
+# --- Multi-lemari (tenant) ---
+# Lemari 'default' memakai file di atas (kompatibel dengan data lama).
+# Lemari lain punya shard sendiri: closets/<nama>/wardrobe.db dan closets/<nama>/images
+DEFAULT_CLOSET = "default"
+CLOSETS_DIR = os.environ.get("CLOSETS_DIR", "closets")
+# Jumlah maksimum store (koneksi + cache) yang disimpan di memori sekaligus
+STORE_POOL_SIZE = int(os.environ.get("STORE_POOL_SIZE", "32"))
+_CLOSET_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# Kolom yang punya kolom/indeks sendiri di tabel items.
+# Field lain tetap disimpan utuh di kolom 'data' (JSON).
+_INDEXED_FIELDS = ("id", "type", "color", "style", "image_path", "color_name", "version")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE,
+    type TEXT,
+    color TEXT,
+    style TEXT,
+    image_path TEXT,
+    color_name TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_type ON items(type);
+CREATE INDEX IF NOT EXISTS idx_items_color ON items(color);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('db_id', random() & 281474976710655);
+CREATE TABLE IF NOT EXISTS pending_images (
+    path TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    item_id TEXT,
+    item TEXT,
+    item_seq INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_thumbnail ON items(json_extract(data, '$.thumbnail_path'));
+"""
+
+# Nomor urut ID item berikutnya disimpan di meta dengan key ini
+_SEQUENCE_KEY = "next_item_number"
+
+# --- Change feed ---
+# Setiap penulisan item dicatat di tabel 'changes' sebagai event 'add', 'update'
+# atau 'delete' (plus 'reset' kalau seluruh isi lemari diganti), dengan nomor
+# urut (seq) yang selalu naik. Hanya CHANGES_RETENTION event terakhir disimpan.
+CHANGES_RETENTION = int(os.environ.get("CHANGES_RETENTION", "100000"))
+# Snapshot kolom di disk ditulis ulang setelah sekian perubahan
+COLUMNS_SNAPSHOT_EVERY = int(os.environ.get("COLUMNS_SNAPSHOT_EVERY", "1000"))
+CHANGE_OPS = ("add", "update", "delete", "reset")
+
+
+class _WardrobeStore:
+    """
+    Penyimpanan lemari berbasis SQLite (mode WAL).
+    Setiap thread punya koneksi sendiri; semua penulisan berjalan
+    di dalam transaksi sehingga atomik dan aman dipakai banyak sesi.
+
+    Setiap perubahan item dicatat di tabel 'changes' (change feed) dalam
+    transaksi yang sama. Hasil load_wardrobe() dan load_wardrobe_columns()
+    di-cache per proses dan diperbarui dari feed itu (hanya item yang
+    berubah), termasuk perubahan dari proses lain.
+    """
+
+    def __init__(self, db_path, json_path=None, closet_id=DEFAULT_CLOSET):
+        self.db_path = db_path
+        self.json_path = json_path
+        self.closet_id = closet_id
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._cache_items = None
+        self._cache_positions = None  # id -> posisi di _cache_items
+        self._cache_seq = None
+        self._cache_columns = None
+        # Snapshot kolom (lihat wardrobe_columns.py) disimpan di samping database
+        self.columns_path = db_path + ".columns"
+        self._snapshot_seq = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_incremental = 0
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transaksi kita atur sendiri lewat BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            _migrate_schema(conn)
+            self._local.conn = conn
+            if self.json_path:
+                self.migrate_from_json(self.json_path)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Transaksi tulis: commit kalau sukses, rollback kalau ada error.
+        Setelah commit, perubahan yang tercatat dikirim ke subscriber (lihat subscribe()).
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = _last_change_seq(conn)
+            yield conn
+            after = _last_change_seq(conn)
+            if after > before:
+                # Feed dibatasi CHANGES_RETENTION baris; pembaca yang tertinggal dapat event 'reset'
+                conn.execute("DELETE FROM changes WHERE seq <= ?", (after - CHANGES_RETENTION,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            conn.execute("COMMIT")
+        if after > before:
+            _notify_subscribers(self.changes(before, until_seq=after))
+
+    def generation(self):
+        """Nomor versi data saat ini (naik setiap ada penulisan)."""
+        conn = self.connection()
+        return conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def change_seq(self):
+        """Nomor urut perubahan terakhir di change feed (0 kalau belum ada)."""
+        return _last_change_seq(self.connection())
+
+    def changes(self, since_seq=0, until_seq=None, limit=None):
+        """
+        Event dengan seq > since_seq (dan <= until_seq), urut naik.
+        Kalau sebagian sudah terhapus (CHANGES_RETENTION), event pertama
+        adalah 'reset': pembaca harus membangun ulang state-nya.
+        """
+        conn = self.connection()
+        sql, params = "SELECT * FROM changes WHERE seq > ?", [since_seq]
+        if until_seq is not None:
+            sql += " AND seq <= ?"
+            params.append(until_seq)
+        sql += " ORDER BY seq LIMIT ?"
+        params.append(limit if limit is not None else -1)
+        events = [_row_to_change(row, self.closet_id) for row in conn.execute(sql, params)]
+        if not events or events[0]["seq"] != since_seq + 1:
+            oldest = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            last = _last_change_seq(conn)
+            if since_seq < last and (oldest is None or oldest > since_seq + 1):
+                # Event sesudah since_seq sudah dibuang: pembaca tidak bisa menyusul satu per satu
+                events.insert(0, {"seq": (oldest or last + 1) - 1, "op": "reset", "item_id": None, "item": None,
+                                  "item_seq": None, "closet": self.closet_id, "created_at": None})
+        return events
+
+    def load_items(self):
+        """Semua item, dari cache; perubahan sejak cache dibuat diterapkan dari change feed."""
+        conn = self.connection()
+        seq = _last_change_seq(conn)
+        with self._cache_lock:
+            if self._cache_items is not None and self._cache_seq == seq:
+                self.cache_hits += 1
+            elif self._cache_items is not None and self._apply_to_items(self.changes(self._cache_seq, until_seq=seq)):
+                self.cache_incremental += 1
+                self._cache_seq = seq
+            else:
+                self.cache_misses += 1
+                with span("load_wardrobe.parse"):
+                    conn.execute("BEGIN")
+                    try:
+                        seq = _last_change_seq(conn)
+                        rows = conn.execute("SELECT data FROM items ORDER BY seq").fetchall()
+                    finally:
+                        conn.execute("COMMIT")
+                    items = [_row_to_item(row) for row in rows]
+                self._cache_items = items
+                self._cache_positions = {item.get("id"): i for i, item in enumerate(items)}
+                self._cache_seq = seq
+            items = self._cache_items
+        # Salinan dangkal supaya pemanggil tidak bisa merusak isi cache (None = item terhapus)
+        return [dict(item) for item in items if item is not None]
+
+    def _apply_to_items(self, events):
+        """Menerapkan event ke cache list item. False kalau harus dimuat ulang penuh."""
+        if any(event["op"] == "reset" for event in events):
+            return False
+        if any(event["op"] != "delete" and event["item_id"] is None for event in events):
+            return False  # item lama tanpa ID tidak bisa dicari posisinya
+        items, positions = self._cache_items, self._cache_positions
+        for event in events:
+            position = positions.get(event["item_id"])
+            if event["op"] == "delete":
+                if position is not None:
+                    items[position] = None
+                    del positions[event["item_id"]]
+            elif position is not None:
+                items[position] = event["item"]
+            else:
+                positions[event["item_id"]] = len(items)
+                items.append(event["item"])
+        # Padatkan kalau terlalu banyak item terhapus
+        if len(items) > 2 * len(positions) + 64:
+            self._cache_items = [item for item in items if item is not None]
+            self._cache_positions = {item.get("id"): i for i, item in enumerate(self._cache_items)}
+        return True
+
+    def load_columns(self):
+        """
+        Seluruh lemari dalam bentuk kolom (WardrobeColumns), di-cache.
+        Perubahan sejak cache (atau snapshot di disk, dibuka lewat mmap)
+        diterapkan dari change feed; dibangun ulang dari kolom terindeks
+        (tanpa parse JSON) hanya kalau feed tidak cukup (mis. event 'reset').
+        Snapshot ditulis ulang setiap COLUMNS_SNAPSHOT_EVERY perubahan.
+        """
+        from wardrobe_columns import WardrobeColumns
+
+        conn = self.connection()
+        db_id = conn.execute("SELECT value FROM meta WHERE key = 'db_id'").fetchone()[0]
+        seq = _last_change_seq(conn)
+        with self._cache_lock:
+            columns = self._cache_columns
+            if columns is not None and columns.source == {"db_id": db_id, "change_seq": seq}:
+                return columns
+            with span("load_wardrobe_columns.build"):
+                if columns is None:
+                    columns = WardrobeColumns.load(self.columns_path)
+                    if columns is not None and isinstance(columns.source, dict):
+                        self._snapshot_seq = columns.source.get("change_seq")
+                if columns is not None and isinstance(columns.source, dict) and columns.source.get("db_id") == db_id:
+                    events = self.changes(columns.source["change_seq"], until_seq=seq)
+                    columns = columns.apply_changes(events, {"db_id": db_id, "change_seq": seq})
+                else:
+                    columns = None
+                if columns is None:
+                    # Baca seq dan isi tabel dalam satu transaksi baca supaya cocok satu sama lain
+                    conn.execute("BEGIN")
+                    try:
+                        seq = _last_change_seq(conn)
+                        rows = conn.execute("SELECT seq, id, type, color_name, style FROM items ORDER BY seq").fetchall()
+                    finally:
+                        conn.execute("COMMIT")
+                    columns = WardrobeColumns.from_rows([tuple(row) for row in rows], {"db_id": db_id, "change_seq": seq})
+                    self._snapshot_seq = None
+                if self._snapshot_seq is None or seq - self._snapshot_seq >= COLUMNS_SNAPSHOT_EVERY:
+                    try:
+                        columns.save(self.columns_path)
+                        self._snapshot_seq = seq
+                    except OSError as e:
+                        print(f"Gagal menyimpan snapshot kolom {self.columns_path}: {e}")
+            self._cache_columns = columns
+            return columns
+
+    def cache_stats(self):
+        with self._cache_lock:
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "incremental": self.cache_incremental,
+                "change_seq": self._cache_seq,
+                "cached_items": len(self._cache_positions) if self._cache_positions is not None else 0,
+            }
+
+    def migrate_from_json(self, json_path):
+        """
+        Memindahkan isi file JSON lama ke database (sekali jalan).
+        File JSON di-rename menjadi '<nama>.migrated' setelah berhasil.
+        File JSON lama bisa berisi ID ganda (append tanpa cek); item kedua dan
+        seterusnya dengan ID yang sama diberi ID baru, bukan saling menimpa.
+        Mengembalikan jumlah item yang benar-benar ditulis ke database.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r") as f:
+                content = f.read()
+            legacy_items = json.loads(content) if content else []
+        except json.JSONDecodeError:
+            print(f"Warning: File {json_path} rusak, migrasi dilewati.")
+            return 0
+
+        with self.transaction() as conn:
+            # Cek ulang di dalam transaksi supaya dua proses tidak migrasi bersamaan
+            already = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            written = 0
+            if already == 0:
+                seen, duplicates = set(), []
+                for item in legacy_items:
+                    if item.get("id") in seen:
+                        duplicates.append(item)
+                        continue
+                    seen.add(item.get("id"))
+                    _upsert_item(conn, item)
+                # ID baru dipesan setelah semua ID lama tercatat, jadi tidak bentrok
+                for item, new_id in zip(duplicates, _reserve_item_ids(conn, len(duplicates))):
+                    print(f"Warning: ID {item['id']} dipakai lebih dari satu item di {json_path}; "
+                          f"item ini disimpan sebagai {new_id}.")
+                    item["id"] = new_id
+                    _upsert_item(conn, item)
+                written = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        os.replace(json_path, json_path + ".migrated")
+        print(f"Berhasil migrasi {written} item dari {json_path} ke {self.db_path}.")
+        return written
+
+
+def _last_change_seq(conn):
+    """Seq event terakhir yang pernah dicatat (tetap naik walau event lama sudah dibuang)."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+    return row[0] if row else 0
+
+
+def _record_change(conn, op, item_id=None, item_json=None, item_seq=None):
+    """Mencatat satu event di change feed (harus di dalam transaksi penulisnya)."""
+    conn.execute(
+        "INSERT INTO changes (op, item_id, item, item_seq, created_at) VALUES (?, ?, ?, ?, ?)",
+        (op, item_id, item_json, item_seq, time.time()),
+    )
+
+
+def _row_to_change(row, closet_id):
+    return {
+        "seq": row["seq"],
+        "op": row["op"],
+        "item_id": row["item_id"],
+        "item": json.loads(row["item"]) if row["item"] else None,
+        "item_seq": row["item_seq"],
+        "closet": closet_id,
+        "created_at": row["created_at"],
+    }
+
+
+def _migrate_schema(conn):
+    """Menambahkan kolom baru ke database lama (dibuat sebelum kolom itu ada)."""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(items)")}
+    if "color_name" not in columns:
+        from color_palette import canonical_color_from_text
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Cek ulang di dalam transaksi, mungkin proses lain sudah menambahkannya
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(items)")}
+            if "color_name" not in columns:
+                conn.execute("ALTER TABLE items ADD COLUMN color_name TEXT")
+                rows = conn.execute("SELECT seq, color FROM items").fetchall()
+                for row in rows:
+                    color_name = canonical_color_from_text(row["color"])
+                    conn.execute(
+                        "UPDATE items SET color_name = ?, data = json_set(data, '$.color_name', ?) WHERE seq = ?",
+                        (color_name, color_name, row["seq"]),
+                    )
+                _record_change(conn, "reset")
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_color_name ON items(color_name)")
+    if "version" not in columns:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(items)")}
+            if "version" not in columns:
+                # Nomor versi per item untuk update_item() (optimistic concurrency)
+                conn.execute("ALTER TABLE items ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+                conn.execute("UPDATE items SET data = json_set(data, '$.version', 1)")
+                _record_change(conn, "reset")
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    if _last_change_seq(conn) == 0 and conn.execute("SELECT 1 FROM items LIMIT 1").fetchone():
+        # Database dari sebelum ada change feed: pembaca yang mulai dari seq 0
+        # diberi tahu lewat 'reset' bahwa isi lemari harus dibaca utuh dulu
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if _last_change_seq(conn) == 0:
+                _record_change(conn, "reset")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def _row_to_item(row):
+    return json.loads(row["data"])
+
+
+def _upsert_item(conn, item_data):
+    """
+    Insert item baru, atau timpa item dengan ID yang sama (tanpa mengubah urutan).
+    Nomor 'version' item dinaikkan (juga di item_data). Dicatat di change feed
+    sebagai 'add' atau 'update'.
+    """
+    item_id = item_data.get("id")
+    current = None
+    if item_id is not None:
+        current = conn.execute("SELECT version FROM items WHERE id = ?", (item_id,)).fetchone()
+    exists = current is not None
+    item_data["version"] = (current[0] if exists else item_data.get("version") or 0) + 1
+    values = [item_data.get(field) for field in _INDEXED_FIELDS]
+    data = json.dumps(item_data)
+    columns = ", ".join(_INDEXED_FIELDS + ("data",))
+    placeholders = ", ".join("?" for _ in range(len(_INDEXED_FIELDS) + 1))
+    sql = f"INSERT INTO items ({columns}) VALUES ({placeholders})"
+    if item_id is not None:
+        updates = ", ".join(f"{field}=excluded.{field}" for field in _INDEXED_FIELDS[1:] + ("data",))
+        sql += f" ON CONFLICT(id) DO UPDATE SET {updates}"
+    cursor = conn.execute(sql, values + [data])
+    if exists:
+        item_seq = conn.execute("SELECT seq FROM items WHERE id = ?", (item_id,)).fetchone()[0]
+    else:
+        item_seq = cursor.lastrowid
+    _record_change(conn, "update" if exists else "add", item_id, data, item_seq)
+    # Gambar item sekarang tercatat (dalam transaksi yang sama), jadi bukan 'pending' lagi
+    if item_data.get("image_path"):
+        conn.execute("DELETE FROM pending_images WHERE path = ?", (item_data["image_path"],))
+
+
+_current_closet = contextvars.ContextVar("current_closet", default=DEFAULT_CLOSET)
+
+def validate_closet_id(closet_id):
+    """Nama lemari: huruf kecil, angka, '-' dan '_' (dipakai sebagai nama folder)."""
+    if closet_id == DEFAULT_CLOSET or _CLOSET_ID_RE.match(closet_id or ""):
+        return closet_id
+    raise ValueError(f"Nama lemari tidak valid: {closet_id!r}")
+
+def current_closet():
+    """Lemari yang sedang aktif di thread/konteks ini."""
+    return _current_closet.get()
+
+def set_current_closet(closet_id):
+    """Mengganti lemari aktif untuk thread/konteks ini (mis. di awal setiap rerun Streamlit)."""
+    _current_closet.set(validate_closet_id(closet_id))
+
+@contextmanager
+def use_closet(closet_id):
+    """Menjalankan blok kode dengan lemari tertentu, lalu kembali ke lemari sebelumnya."""
+    token = _current_closet.set(validate_closet_id(closet_id))
     try:
-        with open(WARDROBE_FILE, "r") as f:
-            # Tambahkan pengecekan jika file kosong
-            content = f.read()
-            if not content:
-                return []
-            return json.loads(content)
-    except json.JSONDecodeError:
+        yield
+    finally:
+        _current_closet.reset(token)
+
+def get_closet_dir(closet_id=None):
+    """Folder shard milik lemari (None untuk lemari default yang memakai file lama)."""
+    closet_id = closet_id or current_closet()
+    return None if closet_id == DEFAULT_CLOSET else os.path.join(CLOSETS_DIR, closet_id)
+
+def get_image_dir(closet_id=None):
+    """Folder gambar lemari aktif (atau closet_id)."""
+    closet_dir = get_closet_dir(closet_id)
+    return IMAGE_DIR if closet_dir is None else os.path.join(closet_dir, "images")
+
+def list_closets():
+    """Semua lemari yang sudah ada, 'default' selalu pertama."""
+    closets = [DEFAULT_CLOSET]
+    if os.path.isdir(CLOSETS_DIR):
+        closets += sorted(
+            name for name in os.listdir(CLOSETS_DIR)
+            if _CLOSET_ID_RE.match(name) and os.path.isdir(os.path.join(CLOSETS_DIR, name))
+        )
+    return closets
+
+# Store per lemari, dipakai bersama semua sesi. Yang paling lama tidak dipakai
+# dilepas kalau jumlahnya melebihi STORE_POOL_SIZE (koneksinya tertutup sendiri).
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+# --- Subscriber change feed (dalam proses) ---
+_subscribers = []
+_subscribers_lock = threading.Lock()
+# Konsumen bawaan: modul yang membereskan data turunan saat item dihapus.
+# Diimpor baru saat ada event yang cocok, supaya start-up tetap ringan.
+_BUILTIN_CONSUMERS = (
+    ("embeddings", ("delete",)),   # hapus vektor dari indeks kemiripan
+    ("thumbnails", ("delete",)),   # hapus thumbnail kalau tidak dipakai item lain
+    ("logika_styling", ("delete",)),  # lupakan cache feedback OOTD
+)
+
+def subscribe(callback, ops=None):
+    """
+    Mendaftarkan callback(events) yang dipanggil setelah setiap transaksi
+    yang mengubah item (di proses ini), dengan daftar event baru (urut seq):
+    {'seq', 'op', 'item_id', 'item', 'item_seq', 'closet', 'created_at'}.
+    Untuk 'delete', 'item' berisi data item sebelum dihapus. `ops` membatasi
+    jenis event (mis. ('delete',)). Callback berjalan dengan lemari event
+    sebagai lemari aktif. Untuk perubahan dari proses lain, pakai tail_changes().
+    """
+    ops = tuple(ops) if ops else CHANGE_OPS
+    with _subscribers_lock:
+        _subscribers.append((callback, ops))
+    return callback
+
+def unsubscribe(callback):
+    with _subscribers_lock:
+        _subscribers[:] = [entry for entry in _subscribers if entry[0] is not callback]
+
+def _notify_subscribers(events):
+    if not events:
+        return
+    with _subscribers_lock:
+        consumers = _BUILTIN_CONSUMERS + tuple(_subscribers)
+    with use_closet(events[0]["closet"]):
+        for consumer, ops in consumers:
+            selected = [event for event in events if event["op"] in ops]
+            if not selected:
+                continue
+            try:
+                if isinstance(consumer, str):
+                    import importlib
+                    consumer = importlib.import_module(consumer).on_wardrobe_changes
+                consumer(selected)
+            except Exception as e:
+                print(f"Gagal memproses change feed di {getattr(consumer, '__module__', consumer)}: {e}")
+
+def _get_store():
+    """Mengambil store untuk lemari aktif (dibuat sekali per proses)."""
+    closet_dir = get_closet_dir()
+    if closet_dir is None:
+        key, db_path, json_path = WARDROBE_DB, WARDROBE_DB, WARDROBE_FILE
+    else:
+        db_path = os.path.join(closet_dir, "wardrobe.db")
+        key, json_path = db_path, None
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if closet_dir is not None:
+                os.makedirs(closet_dir, exist_ok=True)
+            store = _WardrobeStore(db_path, json_path=json_path, closet_id=current_closet())
+            _stores[key] = store
+            while len(_stores) > STORE_POOL_SIZE:
+                _stores.popitem(last=False)
+        else:
+            _stores.move_to_end(key)
+        return store
+
+def migrate_json_to_db(json_path=WARDROBE_FILE):
+    """Migrasi manual dari file JSON lama ke database SQLite."""
+    return _get_store().migrate_from_json(json_path)
+
+@timed()
+def load_wardrobe():
+    """
+    Memuat data lemari dari database (urut sesuai waktu disimpan).
+    Tidak mem-parse ulang kalau data belum berubah sejak pemanggilan terakhir.
+    """
+    return _get_store().load_items()
+
+@timed()
+def load_wardrobe_columns():
+    """
+    Seluruh lemari sebagai kolom NumPy (wardrobe_columns.WardrobeColumns):
+    jauh lebih hemat memori daripada list dict dari load_wardrobe(), dan
+    facet/filter/hitungan dihitung tervektorisasi.
+    """
+    return _get_store().load_columns()
+
+def get_wardrobe_facet_counts(types=None, colors=None, style_contains=None):
+    """
+    Jumlah item per 'type' dan per 'color' (warna kanonik) di antara item
+    yang cocok dengan filter, plus 'total' yang cocok. Filter sama artinya
+    dengan query_wardrobe().
+    """
+    columns = load_wardrobe_columns()
+    mask = columns.mask(types, colors, style_contains)
+    return {
+        "type": columns.facet_counts("type", mask),
+        "color": columns.facet_counts("color", mask),
+        "total": int(mask.sum()),
+    }
+
+def get_wardrobe_cache_stats():
+    """Statistik cache load_wardrobe(): jumlah hit/miss/incremental dan seq change feed terakhir."""
+    return _get_store().cache_stats()
+
+def get_change_seq():
+    """Seq event terakhir di change feed lemari aktif (0 kalau belum ada perubahan)."""
+    return _get_store().change_seq()
+
+def get_changes(since_seq=0, limit=None):
+    """
+    Event change feed lemari aktif dengan seq > since_seq (lihat subscribe()
+    untuk isi event). Kalau event yang diminta sudah dibuang (CHANGES_RETENTION),
+    event pertama adalah 'reset': baca ulang seluruh lemari, lalu lanjutkan.
+    """
+    return _get_store().changes(since_seq, limit=limit)
+
+def tail_changes(since_seq=None, poll_interval=1.0, stop=None, batch_size=1000):
+    """
+    Generator yang terus mengembalikan event baru dari database (juga yang
+    ditulis proses lain), mulai setelah since_seq (None = mulai dari sekarang).
+    Berhenti kalau stop (threading.Event) di-set.
+    """
+    store = _get_store()
+    seq = store.change_seq() if since_seq is None else since_seq
+    while stop is None or not stop.is_set():
+        events = store.changes(seq, limit=batch_size)
+        for event in events:
+            yield event
+        if events:
+            seq = max(seq, events[-1]["seq"])
+        elif stop is not None:
+            stop.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+
+def is_thumbnail_in_use(thumbnail_path):
+    """True kalau masih ada item yang memakai file thumbnail ini (lewat indeks)."""
+    conn = _get_store().connection()
+    return conn.execute(
+        "SELECT 1 FROM items WHERE json_extract(data, '$.thumbnail_path') = ? LIMIT 1", (thumbnail_path,)
+    ).fetchone() is not None
+
+def get_item(item_id):
+    """Mengambil satu item berdasarkan ID (lewat indeks), atau None."""
+    conn = _get_store().connection()
+    row = conn.execute("SELECT data FROM items WHERE id = ?", (item_id,)).fetchone()
+    return _row_to_item(row) if row else None
+
+def get_items(item_ids):
+    """Mengambil beberapa item sekaligus berdasarkan ID (urutan mengikuti item_ids)."""
+    item_ids = list(item_ids)
+    if not item_ids:
         return []
+    conn = _get_store().connection()
+    placeholders = ", ".join("?" for _ in item_ids)
+    rows = conn.execute(f"SELECT id, data FROM items WHERE id IN ({placeholders})", item_ids).fetchall()
+    by_id = {row["id"]: _row_to_item(row) for row in rows}
+    return [by_id[item_id] for item_id in item_ids if item_id in by_id]
+
+# Kolom yang boleh dipakai untuk mengurutkan hasil query_wardrobe()
+_SORT_COLUMNS = {"added": "seq", "id": "id", "type": "type", "color": "color_name", "style": "style"}
+
+@timed()
+def query_wardrobe(types=None, colors=None, style_contains=None, sort_by="added",
+                   descending=False, offset=0, limit=None):
+    """
+    Mencari item dengan filter, urutan, dan paging langsung di database.
+    Filter type/color memakai indeks; `colors` berisi nama warna kanonik (lihat color_analysis.PALETTE). Mengembalikan (items_di_halaman_ini, total_yang_cocok).
+    """
+    where, params = _filter_clause(types, colors, style_contains)
+    column = _SORT_COLUMNS[sort_by]
+    direction = "DESC" if descending else "ASC"
+    conn = _get_store().connection()
+    total = conn.execute(f"SELECT COUNT(*) FROM items {where}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT data FROM items {where} ORDER BY {column} {direction}, seq {direction} LIMIT ? OFFSET ?",
+        params + [limit if limit is not None else -1, offset],
+    ).fetchall()
+    return [_row_to_item(row) for row in rows], total
+
+def _filter_clause(types=None, colors=None, style_contains=None):
+    """Klausa WHERE (dan parameternya) untuk filter query_wardrobe()."""
+    conditions = []
+    params = []
+    if types:
+        conditions.append(f"type IN ({', '.join('?' for _ in types)})")
+        params.extend(types)
+    if colors:
+        # Filter warna memakai warna kanonik (palet tetap), bukan teks bebas dari AI
+        conditions.append(f"color_name IN ({', '.join('?' for _ in colors)})")
+        params.extend(colors)
+    if style_contains:
+        # LIKE di SQLite tidak peka huruf besar/kecil, sama seperti filter lama
+        escaped = style_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("style LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def get_wardrobe_facets():
+    """
+    Nilai unik 'type' dan 'color' beserta jumlah itemnya ({nilai: jumlah}, urut
+    per nilai), diambil dari indeks tanpa NumPy; bentuknya sama dengan
+    get_wardrobe_facet_counts() tanpa filter. 'color' berisi warna kanonik,
+    jadi 'Light Blue' dan 'sky blue' tidak terpecah.
+    """
+    conn = _get_store().connection()
+    return {
+        facet: dict(conn.execute(
+            f"SELECT {column}, COUNT(*) FROM items WHERE {column} IS NOT NULL GROUP BY {column} ORDER BY {column}"
+        ).fetchall())
+        for facet, column in (("type", "type"), ("color", "color_name"))
+    }
+
+def count_wardrobe_items(types=None, colors=None, style_contains=None):
+    """
+    Jumlah item di lemari, atau yang cocok dengan filter (sama artinya dengan
+    query_wardrobe()). Dihitung di SQLite, jadi tidak perlu NumPy.
+    """
+    where, params = _filter_clause(types, colors, style_contains)
+    conn = _get_store().connection()
+    return conn.execute(f"SELECT COUNT(*) FROM items {where}", params).fetchone()[0]
 
 def save_wardrobe_to_file(wardrobe_data):
-    """Fungsi internal untuk menyimpan data ke file."""
-    with open(WARDROBE_FILE, "w") as f:
-        json.dump(wardrobe_data, f, indent=4)
+    """Fungsi internal untuk mengganti seluruh isi lemari dalam satu transaksi."""
+    with _get_store().transaction() as conn:
+        conn.execute("DELETE FROM items")
+        _record_change(conn, "reset")
+        for item in wardrobe_data:
+            _upsert_item(conn, item)
 
+def _attach_colors(item_data):
+    """
+    Mengisi warna kanonik (palet tetap) untuk item:
+    dari gambar tanpa background (k-means, juga menyimpan nilai LAB),
+    atau dari teks 'color' kalau gambarnya tidak ada.
+    """
+    if item_data.get('color_lab'):
+        return
+    try:
+        from color_analysis import analyze_item_colors, canonical_color_from_text
+        image_path = item_data.get('image_path')
+        if image_path and os.path.exists(image_path):
+            item_data.update(analyze_item_colors(image_path))
+        elif not item_data.get('color_name'):
+            item_data['color_name'] = canonical_color_from_text(item_data.get('color'))
+    except Exception as e:
+        print(f"Gagal menganalisis warna item {item_data.get('id', '??')}: {e}")
+
+def _attach_thumbnail(item_data):
+    """Membuat thumbnail untuk grid saat item disimpan (kalau belum ada)."""
+    image_path = item_data.get('image_path')
+    if item_data.get('thumbnail_path') or not image_path or not os.path.exists(image_path):
+        return
+    try:
+        from thumbnails import create_thumbnail
+        item_data['thumbnail_path'] = create_thumbnail(image_path)
+    except Exception as e:
+        print(f"Gagal membuat thumbnail untuk {image_path}: {e}")
+
+def _index_embedding(item_data, check_duplicates=False):
+    """
+    Menyimpan vektor gambar item ke indeks kemiripan.
+    Kalau check_duplicates=True, mengembalikan ID item lain yang gambarnya hampir sama.
+    """
+    image_path = item_data.get('image_path')
+    if not item_data.get('id') or not image_path or not os.path.exists(image_path):
+        return []
+    try:
+        from embeddings import find_near_duplicates, index_item
+        if not check_duplicates:
+            # Penyimpanan ulang (mis. backfill warna) tidak perlu menghitung ulang vektornya
+            from embeddings import get_embedding_index
+            if item_data['id'] not in get_embedding_index():
+                index_item(item_data)
+            return []
+        duplicates = find_near_duplicates(image_path, exclude=[item_data['id']])
+        index_item(item_data)
+        return duplicates
+    except Exception as e:
+        print(f"Gagal membuat embedding untuk {image_path}: {e}")
+        return []
+
+@timed()
 def save_item_to_wardrobe(item_data):
-    """Menyimpan item BARU ke file JSON."""
-    wardrobe = load_wardrobe()
-    wardrobe.append(item_data)
-    save_wardrobe_to_file(wardrobe)
+    """
+    Menyimpan item BARU ke database (ID dibuatkan kalau belum ada).
+    Mengembalikan daftar ID item yang gambarnya hampir sama (kemungkinan duplikat).
+    """
+    if not item_data.get('id'):
+        item_data['id'] = get_next_item_ids(1)[0]
+    _attach_thumbnail(item_data)
+    _attach_colors(item_data)
+    with _get_store().transaction() as conn:
+        _upsert_item(conn, item_data)
     print(f"Item {item_data.get('id', '??')} berhasil disimpan!")
+    duplicates = _index_embedding(item_data, check_duplicates=True)
+    if duplicates:
+        print(f"Warning: Item {item_data.get('id')} mirip sekali dengan {', '.join(duplicates)}.")
+    return duplicates
+
+def save_items_to_wardrobe(items):
+    """Menyimpan banyak item sekaligus dalam SATU transaksi (untuk impor massal)."""
+    for item_data in items:
+        _attach_thumbnail(item_data)
+        _attach_colors(item_data)
+    with _get_store().transaction() as conn:
+        for item_data in items:
+            _upsert_item(conn, item_data)
+    print(f"{len(items)} item berhasil disimpan!")
+    for item_data in items:
+        _index_embedding(item_data)
+
+class ItemVersionConflict(Exception):
+    """update_item(): item sudah diubah sesi/proses lain sejak versinya dibaca."""
+
+    def __init__(self, item_id, expected_version, current_version):
+        super().__init__(
+            f"Item {item_id} sudah diubah di tempat lain (versi {current_version}, bukan {expected_version})."
+        )
+        self.item_id = item_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+_FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Field yang tidak boleh diubah lewat update_item()/relabel_items()
+_READ_ONLY_FIELDS = ("id", "version")
+# Field yang bisa diganti massal oleh relabel_items() (semuanya punya indeks)
+RELABEL_FIELDS = ("type", "color", "color_name")
+
+@timed()
+def update_item(item_id, expected_version=None, **fields):
+    """
+    Mengubah sebagian field satu item langsung di database: hanya baris item
+    itu dan kolom indeks yang ikut berubah yang ditulis (json_set), tanpa
+    hapus-simpan ulang, jadi gambar, thumbnail dan embedding tetap.
+    expected_version: item['version'] saat item dibaca; kalau item sudah
+    diubah sesi lain sejak itu, ItemVersionConflict dilempar dan tidak ada
+    yang ditulis. Kalau 'color' diubah tanpa 'color_name', warna kanoniknya
+    ikut dihitung ulang dari teks itu. Mengembalikan item setelah diubah,
+    atau None kalau tidak ada.
+    """
+    for field in fields:
+        if field in _READ_ONLY_FIELDS or not _FIELD_NAME_RE.match(field):
+            raise ValueError(f"Field tidak bisa diubah: {field!r}")
+    if "color" in fields and "color_name" not in fields:
+        from color_palette import canonical_color_from_text
+        fields["color_name"] = canonical_color_from_text(fields["color"])
+    with _get_store().transaction() as conn:
+        row = conn.execute("SELECT version FROM items WHERE id = ?", (item_id,)).fetchone()
+        if row is None:
+            print(f"Error: Item dengan ID {item_id} tidak ditemukan.")
+            return None
+        if expected_version is not None and row["version"] != expected_version:
+            raise ItemVersionConflict(item_id, expected_version, row["version"])
+        if fields:
+            paths = ", ".join(f"'$.{field}', json(?)" for field in fields)
+            indexed = [field for field in fields if field in _INDEXED_FIELDS]
+            columns = "".join(f", {field} = ?" for field in indexed)
+            conn.execute(
+                f"UPDATE items SET data = json_set(data, {paths}, '$.version', version + 1), "
+                f"version = version + 1{columns} WHERE id = ?",
+                [json.dumps(value) for value in fields.values()] + [fields[field] for field in indexed] + [item_id],
+            )
+            conn.execute(
+                "INSERT INTO changes (op, item_id, item, item_seq, created_at) "
+                "SELECT 'update', id, data, seq, ? FROM items WHERE id = ?",
+                (time.time(), item_id),
+            )
+    return get_item(item_id)
+
+@timed()
+def relabel_items(field, old_value, new_value):
+    """
+    Mengganti nilai `field` (lihat RELABEL_FIELDS) dari old_value menjadi
+    new_value di SEMUA item sekaligus, mis. relabel_items('color_name', 'Navy', 'Blue').
+    Berjalan sebagai satu UPDATE lewat indeks; setiap item yang berubah dapat
+    versi baru dan event 'update' di change feed. Relabel 'color' juga
+    mengganti color_name dengan warna kanonik dari new_value (seperti
+    update_item). Mengembalikan jumlah item.
+    """
+    if field not in RELABEL_FIELDS:
+        raise ValueError(f"Field tidak bisa di-relabel: {field!r} (pilih dari {', '.join(RELABEL_FIELDS)})")
+    if old_value == new_value:
+        return 0
+    new_values = {field: new_value}
+    if field == "color":
+        from color_palette import canonical_color_from_text
+        new_values["color_name"] = canonical_color_from_text(new_value)
+    paths = "".join(f"'$.{name}', ?, " for name in new_values)
+    new_data = f"json_set(data, {paths}'$.version', version + 1)"
+    columns = "".join(f"{name} = ?, " for name in new_values)
+    with _get_store().transaction() as conn:
+        # Event dicatat dulu (dengan data barunya), lalu baris yang sama diubah
+        conn.execute(
+            f"INSERT INTO changes (op, item_id, item, item_seq, created_at) "
+            f"SELECT 'update', id, {new_data}, seq, ? FROM items WHERE {field} = ? ORDER BY seq",
+            (*new_values.values(), time.time(), old_value),
+        )
+        cursor = conn.execute(
+            f"UPDATE items SET {columns}data = {new_data}, version = version + 1 WHERE {field} = ?",
+            (*new_values.values(), *new_values.values(), old_value),
+        )
+    print(f"{cursor.rowcount} item diubah: {field} {old_value!r} -> {new_value!r}.")
+    return cursor.rowcount
+
+def record_pending_image(path):
+    """
+    Mencatat gambar yang sedang dipindah ke folder gambar tapi itemnya belum
+    disimpan (dipakai image_store.store_image). Catatan ini dihapus saat
+    item dengan image_path tersebut disimpan, dalam transaksi yang sama.
+    """
+    conn = _get_store().connection()
+    conn.execute("INSERT OR REPLACE INTO pending_images (path, created_at) VALUES (?, ?)", (path, time.time()))
+
+def clear_pending_images(paths):
+    """Menghapus catatan gambar pending (dipakai image_store.fsck untuk catatan basi)."""
+    conn = _get_store().connection()
+    conn.executemany("DELETE FROM pending_images WHERE path = ?", [(path,) for path in paths])
+
+def get_image_references():
+    """
+    Semua file gambar yang dirujuk lemari aktif, untuk image_store.fsck:
+    {'images': {path: item_id}, 'thumbnails': {path: [item_id, ...]}, 'pending': {path: created_at}}.
+    """
+    conn = _get_store().connection()
+    references = {"images": {}, "thumbnails": {}, "pending": {}}
+    for row in conn.execute("SELECT id, image_path, json_extract(data, '$.thumbnail_path') FROM items"):
+        item_id, image_path, thumbnail_path = row
+        if image_path:
+            references["images"][image_path] = item_id
+        if thumbnail_path:
+            references["thumbnails"].setdefault(thumbnail_path, []).append(item_id)
+    references["pending"] = dict(conn.execute("SELECT path, created_at FROM pending_images").fetchall())
+    return references
+
+def get_next_item_ids(count=1):
+    """
+    Memesan `count` ID baru (format CLO001) dari sequence di database.
+    Nomor yang sudah dipesan tidak pernah dipakai ulang (juga setelah item
+    dihapus), dan aman dipanggil bersamaan dari banyak sesi/proses.
+    """
+    conn = _get_store().connection()
+    # Tanpa menaikkan 'generation': isi lemari tidak berubah, cache tetap berlaku
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        item_ids = _reserve_item_ids(conn, count)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return item_ids
+
+def _reserve_item_ids(conn, count):
+    """Isi get_next_item_ids(), untuk dipanggil di dalam transaksi yang sudah berjalan."""
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (_SEQUENCE_KEY,)).fetchone()
+    if row is None:
+        # Pertama kali: mulai setelah nomor ID terbesar yang sudah ada
+        rows = conn.execute("SELECT id FROM items WHERE id LIKE 'CLO%'").fetchall()
+        numbers = [int(r["id"][3:]) for r in rows if r["id"][3:].isdigit()]
+        start = max(numbers, default=0) + 1
+    else:
+        start = row["value"]
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (_SEQUENCE_KEY, start + count),
+    )
+    return [f"CLO{n:03d}" for n in range(start, start + count)]
 
 # --- FUNGSI BARU UNTUK DELETE ---
+@timed()
 def delete_item_from_wardrobe(item_id):
     """Menghapus item dari database DAN file gambarnya."""
-    
-    wardrobe = load_wardrobe()
-    
-    # 1. Cari item yang akan dihapus
-    item_to_delete = None
-    for item in wardrobe:
-        if item.get('id') == item_id:
-            item_to_delete = item
-            break
-            
+
+    # 1. Cari item yang akan dihapus (lewat indeks id)
+    item_to_delete = get_item(item_id)
+
     if not item_to_delete:
         print(f"Error: Item dengan ID {item_id} tidak ditemukan.")
         return # Keluar jika item tidak ada
 
-    # 2. Hapus file gambar terkait
+    # 2. Hapus baris item dari database DULU: kalau proses mati setelah ini,
+    #    yang tersisa hanya file yatim (dibersihkan image_store.fsck), bukan item tanpa gambar.
+    #    Event 'delete' di change feed membawa data item lama ke konsumennya
+    #    (indeks kemiripan, thumbnail, cache feedback OOTD; lihat _BUILTIN_CONSUMERS).
+    with _get_store().transaction() as conn:
+        conn.execute(
+            "INSERT INTO changes (op, item_id, item, item_seq, created_at) "
+            "SELECT 'delete', id, data, seq, ? FROM items WHERE id = ?",
+            (time.time(), item_id),
+        )
+        conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
+
+    # 3. Hapus file gambar terkait
     image_path = item_to_delete.get('image_path')
     if image_path and os.path.exists(image_path):
         try:
@@ -59,10 +996,30 @@ def delete_item_from_wardrobe(item_id):
             print(f"Gagal menghapus file gambar {image_path}: {e}")
     elif image_path:
         print(f"Warning: Path gambar {image_path} dicatat tapi file tidak ditemukan.")
-        
-    # 3. Buat daftar baru tanpa item yang dihapus
-    new_wardrobe = [item for item in wardrobe if item.get('id') != item_id]
-    
-    # 4. Simpan daftar baru ke file
-    save_wardrobe_to_file(new_wardrobe)
-    print(f"Berhasil menghapus item {item_id} dari database.")
\ No newline at end of file
+    print(f"Berhasil menghapus item {item_id} dari database.")
+
+
+if __name__ == "__main__":
+    # Jalankan: python data_management.py  -> migrasi wardrobe_data.json ke wardrobe.db
+    # (migrasi juga otomatis terjadi saat database pertama kali dibuka)
+    #           python data_management.py --changes [--since N] [--follow]  -> tampilkan change feed
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrasi database lemari atau tampilkan change feed-nya.")
+    parser.add_argument("--closet", default=DEFAULT_CLOSET, help="Lemari yang dipakai")
+    parser.add_argument("--changes", action="store_true", help="Tampilkan event change feed (JSON per baris)")
+    parser.add_argument("--since", type=int, default=0, help="Mulai setelah seq ini")
+    parser.add_argument("--follow", action="store_true", help="Terus tunggu event baru (Ctrl+C untuk berhenti)")
+    args = parser.parse_args()
+
+    with use_closet(args.closet):
+        if args.changes:
+            events = tail_changes(args.since) if args.follow else get_changes(args.since)
+            try:
+                for event in events:
+                    print(json.dumps(event), flush=True)
+            except KeyboardInterrupt:
+                pass
+        else:
+            migrate_json_to_db()
+            print(f"Selesai. Total sekarang {len(load_wardrobe())} item di {_get_store().db_path}.")
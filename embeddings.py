@@ -0,0 +1,340 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+# Vectors live in a memory-mapped .npy matrix next to the wardrobe database;
+# which item is in which row is kept in a small SQLite database.
+# Other closets keep the same two files inside their own closet folder.
+EMBEDDINGS_FILE = "wardrobe_embeddings.npy"
+EMBEDDINGS_DB_FILE = "wardrobe_embeddings.db"
+# Row list (JSON) of older versions, imported into the database once
+EMBEDDINGS_IDS_FILE = "wardrobe_embeddings_ids.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_rows (
+    row INTEGER PRIMARY KEY,
+    item_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('next_row', 0);
+"""
+
+# Image descriptor: HSV color histogram of the garment pixels + coarse silhouette
+HUE_BINS, SAT_BINS, VAL_BINS = 12, 3, 3
+SHAPE_GRID = 8
+EMBEDDING_DIM = HUE_BINS * SAT_BINS * VAL_BINS + SHAPE_GRID * SHAPE_GRID
+DESCRIPTOR_SIZE = 96  # images are reduced to this size before describing them
+
+# Cosine similarity above which a new upload is reported as a likely duplicate
+DUPLICATE_THRESHOLD = float(os.environ.get("DUPLICATE_THRESHOLD", "0.97"))
+
+_INITIAL_CAPACITY = 1024
+
+
+def compute_embedding(image):
+    """
+    Compact, L2-normalized descriptor of a clothing image (path or PIL image).
+    Transparent pixels (removed background) are ignored for the color part.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        with Image.open(image) as opened:
+            return compute_embedding(opened)
+    img = image.convert("RGBA")
+    img.thumbnail((DESCRIPTOR_SIZE, DESCRIPTOR_SIZE))
+
+    alpha = np.asarray(img.getchannel("A"), dtype=np.float32) / 255.0
+    hsv = np.asarray(img.convert("RGB").convert("HSV"), dtype=np.uint16)
+    mask = alpha > 0.5
+    if not mask.any():
+        mask = np.ones_like(mask)
+
+    h = (hsv[..., 0][mask] * HUE_BINS) >> 8
+    s = (hsv[..., 1][mask] * SAT_BINS) >> 8
+    v = (hsv[..., 2][mask] * VAL_BINS) >> 8
+    bins = (h * SAT_BINS + s) * VAL_BINS + v
+    color = np.bincount(bins, minlength=HUE_BINS * SAT_BINS * VAL_BINS).astype(np.float32)
+    color /= np.linalg.norm(color) or 1.0
+
+    # Silhouette: alpha averaged over a fixed grid, centered on a square canvas
+    side = max(alpha.shape)
+    canvas = np.zeros((side, side), dtype=np.float32)
+    top, left = (side - alpha.shape[0]) // 2, (side - alpha.shape[1]) // 2
+    canvas[top:top + alpha.shape[0], left:left + alpha.shape[1]] = alpha
+    shape = np.asarray(
+        Image.fromarray((canvas * 255).astype(np.uint8)).resize((SHAPE_GRID, SHAPE_GRID), Image.BILINEAR),
+        dtype=np.float32,
+    ).ravel()
+    shape /= np.linalg.norm(shape) or 1.0
+
+    vector = np.concatenate([color, 0.5 * shape])
+    return vector / np.linalg.norm(vector)
+
+
+class EmbeddingIndex:
+    """
+    Brute-force cosine-similarity index over a memory-mapped float32 matrix.
+    One matrix-vector product scores every item, which stays in the
+    milliseconds even for tens of thousands of items.
+
+    Several processes (the app, bulk_import.py, ingest_queue.py) can use the
+    same index: the item ID -> matrix row mapping lives in SQLite, and every
+    write runs inside one write transaction (BEGIN IMMEDIATE), which also
+    serializes the writes to the matrix file. Each process keeps a copy of
+    the mapping and reloads it when another process changed the index.
+    """
+
+    def __init__(self, matrix_path=EMBEDDINGS_FILE, db_path=EMBEDDINGS_DB_FILE, legacy_ids_path=EMBEDDINGS_IDS_FILE):
+        self.matrix_path = matrix_path
+        self.db_path = db_path
+        self.legacy_ids_path = legacy_ids_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = []  # row -> item ID (None for deleted rows)
+        self._rows = {}
+        self._version = None
+        self._matrix = None
+        self._matrix_stamp = None
+        self._alive = np.zeros(0, dtype=bool)
+        with self._lock, self._write(create=True) as conn:
+            self._migrate_legacy_ids(conn)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self, create=False):
+        """Write transaction, synced with what other processes wrote. Call with self._lock held."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if create and not os.path.exists(self.matrix_path):
+                np.lib.format.open_memmap(
+                    self.matrix_path, mode="w+", dtype=np.float32, shape=(_INITIAL_CAPACITY, EMBEDDING_DIM)
+                ).flush()
+            self._sync(conn)
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            self._version = self._matrix_stamp = None  # reload on next use
+            raise
+        conn.execute("COMMIT")
+
+    def _refresh(self):
+        """Picks up changes made by other processes (one cheap query when there are none)."""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            self._sync(conn)
+        finally:
+            conn.execute("COMMIT")
+
+    def _sync(self, conn):
+        version, next_row = conn.execute(
+            "SELECT (SELECT value FROM meta WHERE key = 'version'), (SELECT value FROM meta WHERE key = 'next_row')"
+        ).fetchone()
+        changed = version != self._version
+        if changed:
+            ids = [None] * next_row
+            for row, item_id in conn.execute("SELECT row, item_id FROM embedding_rows"):
+                ids[row] = item_id
+            self._ids = ids
+            self._rows = {item_id: row for row, item_id in enumerate(ids) if item_id is not None}
+            self._version = version
+        stat = os.stat(self.matrix_path)
+        if (stat.st_ino, stat.st_size) != self._matrix_stamp:
+            # First use, or another process grew (replaced) the file
+            self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+            self._matrix_stamp = (stat.st_ino, stat.st_size)
+            changed = True
+        if changed:
+            self._alive = np.zeros(self._matrix.shape[0], dtype=bool)
+            self._alive[list(self._rows.values())] = True
+
+    def _bump_version(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        self._version += 1
+
+    def _migrate_legacy_ids(self, conn):
+        """Imports the JSON ID list written by older versions (rows stay where they are)."""
+        if not os.path.exists(self.legacy_ids_path) or self._ids:
+            return
+        with open(self.legacy_ids_path, "r") as f:
+            legacy_ids = json.load(f)
+        conn.executemany(
+            "INSERT OR IGNORE INTO embedding_rows (row, item_id) VALUES (?, ?)",
+            [(row, item_id) for row, item_id in enumerate(legacy_ids) if item_id is not None],
+        )
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'next_row'", (len(legacy_ids),))
+        self._bump_version(conn)
+        self._version = None
+        self._sync(conn)
+        os.replace(self.legacy_ids_path, self.legacy_ids_path + ".migrated")
+
+    def _grow(self, capacity):
+        old = self._matrix
+        new_path = self.matrix_path + ".grow"
+        grown = np.lib.format.open_memmap(
+            new_path, mode="w+", dtype=np.float32, shape=(max(capacity, old.shape[0] * 2), EMBEDDING_DIM)
+        )
+        grown[:old.shape[0]] = old
+        grown.flush()
+        del grown, old
+        self._matrix = None
+        os.replace(new_path, self.matrix_path)
+        self._matrix_stamp = None
+
+    def add(self, item_id, vector):
+        with self._lock, self._write() as conn:
+            row = self._rows.get(item_id)
+            if row is None:
+                row = len(self._ids)
+                conn.execute("INSERT INTO embedding_rows (row, item_id) VALUES (?, ?)", (row, item_id))
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'next_row'")
+                self._ids.append(item_id)
+                self._rows[item_id] = row
+                if row >= self._matrix.shape[0]:
+                    self._grow(row + 1)
+                    self._sync(conn)
+            self._bump_version(conn)
+            self._matrix[row] = vector
+            self._alive[row] = True
+            self._matrix.flush()
+
+    def remove(self, item_id):
+        with self._lock, self._write() as conn:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return
+            conn.execute("DELETE FROM embedding_rows WHERE row = ?", (row,))
+            self._bump_version(conn)
+            self._ids[row] = None
+            self._alive[row] = False
+            self._matrix[row] = 0.0
+
+    def get_vector(self, item_id):
+        """A copy of the stored vector of item_id, or None."""
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(item_id)
+            return None if row is None else np.array(self._matrix[row])
+
+    def __contains__(self, item_id):
+        with self._lock:
+            self._refresh()
+            return item_id in self._rows
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def search(self, vector, k=5, exclude=()):
+        """Returns up to k (item_id, similarity) pairs, most similar first."""
+        with self._lock:
+            self._refresh()
+            count = len(self._ids)
+            if not count:
+                return []
+            scores = self._matrix[:count] @ np.asarray(vector, dtype=np.float32)
+            scores[~self._alive[:count]] = -np.inf
+            for item_id in exclude:
+                row = self._rows.get(item_id)
+                if row is not None:
+                    scores[row] = -np.inf
+            ids = list(self._ids)
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[row], float(scores[row])) for row in top if np.isfinite(scores[row])]
+
+
+_indexes = {}
+_index_lock = threading.Lock()
+
+def get_embedding_index():
+    """The index of the current closet (see data_management.use_closet)."""
+    from data_management import current_closet, get_closet_dir
+
+    closet_id = current_closet()
+    with _index_lock:
+        index = _indexes.get(closet_id)
+        if index is None:
+            closet_dir = get_closet_dir(closet_id)
+            if closet_dir is None:
+                index = EmbeddingIndex()
+            else:
+                os.makedirs(closet_dir, exist_ok=True)
+                index = EmbeddingIndex(os.path.join(closet_dir, EMBEDDINGS_FILE),
+                                       os.path.join(closet_dir, EMBEDDINGS_DB_FILE),
+                                       os.path.join(closet_dir, EMBEDDINGS_IDS_FILE))
+            _indexes[closet_id] = index
+        return index
+
+
+def index_item(item):
+    """Computes and stores the embedding of an item's image. Returns the vector or None."""
+    image_path = item.get("image_path")
+    if not item.get("id") or not image_path or not os.path.exists(image_path):
+        return None
+    vector = compute_embedding(image_path)
+    get_embedding_index().add(item["id"], vector)
+    return vector
+
+
+def find_near_duplicates(image, threshold=DUPLICATE_THRESHOLD, exclude=()):
+    """IDs of closet items whose image is nearly identical to `image` (path or PIL image)."""
+    vector = compute_embedding(image)
+    return [item_id for item_id, score in get_embedding_index().search(vector, k=5, exclude=exclude)
+            if score >= threshold]
+
+
+def find_similar_items(item_id, k=5):
+    """'More like this': the k items most similar to item_id, as (item_id, similarity)."""
+    index = get_embedding_index()
+    vector = index.get_vector(item_id)
+    if vector is None:
+        from data_management import get_item
+
+        item = get_item(item_id)
+        vector = index_item(item) if item else None
+        if vector is None:
+            return []
+    return index.search(vector, k=k, exclude=[item_id])
+
+
+def on_wardrobe_changes(events):
+    """Change feed consumer (see data_management.subscribe): removes deleted items from the index."""
+    index = get_embedding_index()
+    for event in events:
+        index.remove(event["item_id"])
+
+
+def backfill_embeddings(wardrobe):
+    """Indexes every item that is not in the index yet. Returns the count."""
+    index = get_embedding_index()
+    added = 0
+    for item in wardrobe:
+        if item.get("id") not in index and index_item(item) is not None:
+            added += 1
+    return added
+
+
+if __name__ == "__main__":
+    from data_management import load_wardrobe
+
+    print(f"Indexed {backfill_embeddings(load_wardrobe())} items.")
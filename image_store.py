@@ -0,0 +1,268 @@
+import io
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from metrics import increment, span
+
+# Crash-safe storage of item images plus a garbage collector / consistency
+# check (fsck) that reconciles the image folders with the database.
+#
+# Saving an item's image: the path is recorded as pending in the closet's
+# database, the file is written to a temporary name in the same folder,
+# flushed and atomically renamed. Saving the item clears the pending
+# record in the same transaction that stores its image_path. So after a
+# crash, every file in the folder is either referenced by an item, pending
+# (a save in progress) or an orphan that fsck may delete.
+
+# Unreferenced files (and pending records) younger than this are left alone:
+# they may belong to a save that is still running.
+IMAGE_GC_GRACE_SECONDS = float(os.environ.get("IMAGE_GC_GRACE_SECONDS", "3600"))
+# How often the background collector checks every closet (0 = never)
+IMAGE_GC_INTERVAL = float(os.environ.get("IMAGE_GC_INTERVAL", str(6 * 3600)))
+# Whether the background collector deletes what it finds (1) or only reports it (0)
+IMAGE_GC_REPAIR = os.environ.get("IMAGE_GC_REPAIR", "0") == "1"
+# Threads used to stat the scanned files
+IMAGE_GC_WORKERS = int(os.environ.get("IMAGE_GC_WORKERS", "8"))
+_STAT_BATCH_SIZE = 512
+_TEMP_SUFFIX = ".tmp"
+# Only files the app writes itself are ever deleted as orphans
+_MANAGED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", _TEMP_SUFFIX)
+
+
+def _fsync_dir(directory):
+    """Makes a rename in `directory` durable (not supported on Windows, where it is skipped)."""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def store_image(source, item_id, image_dir=None):
+    """
+    Writes an item's image to <image_dir>/<item_id>.png without ever leaving
+    a partial file under that name. `source` is the path of a PNG (copied,
+    the caller removes it) or a PIL image. image_dir defaults to the current
+    closet's folder. Returns the final path; save the item with it as
+    image_path to complete the save.
+    """
+    from data_management import get_image_dir, record_pending_image
+
+    image_dir = image_dir or get_image_dir()
+    os.makedirs(image_dir, exist_ok=True)
+    final_path = os.path.join(image_dir, f"{item_id}.png")
+    record_pending_image(final_path)
+
+    tmp_path = os.path.join(image_dir, f".{item_id}.{uuid.uuid4().hex[:8]}{_TEMP_SUFFIX}")
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            shutil.copyfile(source, tmp_path)
+        else:
+            source.save(tmp_path, "PNG")
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(image_dir)
+    return final_path
+
+
+@lru_cache(maxsize=4)
+def missing_image_placeholder(size=200):
+    """PNG bytes of a plain grey tile, shown for items whose image file is missing."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (size, size), (238, 238, 238))
+    draw = ImageDraw.Draw(image)
+    draw.line((size * 0.3, size * 0.3, size * 0.7, size * 0.7), fill=(170, 170, 170), width=max(1, size // 40))
+    draw.line((size * 0.7, size * 0.3, size * 0.3, size * 0.7), fill=(170, 170, 170), width=max(1, size // 40))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _stat_batch(entries):
+    stats = []
+    for entry in entries:
+        try:
+            stats.append((os.path.abspath(entry.path), entry.stat().st_mtime))
+        except FileNotFoundError:
+            pass  # removed while scanning
+    return stats
+
+
+def scan_files(directories, workers=IMAGE_GC_WORKERS):
+    """
+    {absolute path: mtime} of the regular files directly inside
+    `directories`. Listing uses os.scandir (no stat per name); the stat
+    calls run in batches on a thread pool, since they wait on the disk.
+    """
+    entries = []
+    for directory in dict.fromkeys(os.path.abspath(d) for d in directories):
+        try:
+            with os.scandir(directory) as iterator:
+                entries.extend(entry for entry in iterator if entry.is_file(follow_symlinks=False))
+        except FileNotFoundError:
+            continue
+    batches = [entries[i:i + _STAT_BATCH_SIZE] for i in range(0, len(entries), _STAT_BATCH_SIZE)]
+    files = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for stats in pool.map(_stat_batch, batches):
+            files.update(stats)
+    return files
+
+
+def fsck(repair=False, grace_seconds=IMAGE_GC_GRACE_SECONDS, workers=IMAGE_GC_WORKERS):
+    """
+    Checks the current closet's image and thumbnail folders against its items.
+    Reports:
+      'orphans'             files no item or pending save refers to (older than grace_seconds)
+      'missing_images'      IDs of items whose image file does not exist
+      'missing_thumbnails'  IDs of items whose recorded thumbnail does not exist
+      'stale_pending'       pending records older than grace_seconds (their save never finished)
+    With repair=True orphans are deleted, stale pending records dropped and
+    missing thumbnails recreated from the item's image.
+    Items with a missing image are only reported.
+    """
+    from data_management import (
+        clear_pending_images, get_image_dir, get_image_references, get_items,
+    )
+    from thumbnails import get_thumbnail_dir, get_thumbnail_path, set_item_thumbnail
+
+    started = time.perf_counter()
+    with span("image_store.fsck"):
+        directories = [get_image_dir(), get_thumbnail_dir()]
+        references = get_image_references()
+        files = scan_files(directories, workers)
+        scanned_dirs = {os.path.abspath(directory) for directory in directories}
+
+        def exists(path):
+            absolute = os.path.abspath(path)
+            if os.path.dirname(absolute) in scanned_dirs:
+                return absolute in files
+            return os.path.exists(absolute)  # stored outside the closet folders (older data)
+
+        now = time.time()
+        cutoff = now - grace_seconds
+        referenced = {os.path.abspath(path) for path in references["images"]}
+        referenced.update(os.path.abspath(path) for path in references["thumbnails"])
+        stale_pending = [path for path, created_at in references["pending"].items() if created_at < cutoff]
+        in_flight = {os.path.abspath(path) for path in references["pending"]} - {
+            os.path.abspath(path) for path in stale_pending
+        }
+
+        orphans = sorted(
+            path for path, mtime in files.items()
+            if path not in referenced and path not in in_flight and mtime < cutoff
+            and path.lower().endswith(_MANAGED_EXTENSIONS)
+        )
+        missing_images = sorted(item_id for path, item_id in references["images"].items() if not exists(path))
+        missing_thumbnails = sorted({
+            item_id for path, item_ids in references["thumbnails"].items() if not exists(path) for item_id in item_ids
+        })
+
+        removed = 0
+        if repair:
+            for path in orphans:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    print(f"Failed to remove orphaned image {path}: {e}")
+            clear_pending_images(stale_pending)
+            for item in get_items(missing_thumbnails):
+                # Version-checked write of just the thumbnail field (cleared if the image is gone too)
+                if get_thumbnail_path(item) is None:
+                    set_item_thumbnail(item, None)
+            if removed:
+                increment("image_gc_orphans_removed", removed)
+
+    return {
+        "scanned_files": len(files),
+        "referenced_files": len(referenced),
+        "orphans": orphans,
+        "missing_images": missing_images,
+        "missing_thumbnails": missing_thumbnails,
+        "stale_pending": sorted(stale_pending),
+        "removed_files": removed,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def fsck_all_closets(repair=False, **kwargs):
+    """fsck() for every closet; returns {closet_id: report}."""
+    from data_management import list_closets, use_closet
+
+    reports = {}
+    for closet_id in list_closets():
+        with use_closet(closet_id):
+            reports[closet_id] = fsck(repair=repair, **kwargs)
+    return reports
+
+
+_gc_thread = None
+_gc_lock = threading.Lock()
+
+def _gc_loop(interval, repair):
+    while True:
+        try:
+            reports = fsck_all_closets(repair=repair)
+            if repair:
+                removed = sum(report["removed_files"] for report in reports.values())
+                if removed:
+                    print(f"Image GC removed {removed} orphaned file(s).")
+            else:
+                orphans = sum(len(report["orphans"]) for report in reports.values())
+                if orphans:
+                    print(f"Image GC found {orphans} orphaned file(s) (remove them with: python image_store.py --repair).")
+        except Exception as e:
+            print(f"Image GC failed: {e}")
+        time.sleep(interval)
+
+
+def start_background_gc(interval=IMAGE_GC_INTERVAL, repair=IMAGE_GC_REPAIR):
+    """
+    Runs fsck() on every closet every `interval` seconds on a daemon thread,
+    once per process. Safe to call on every Streamlit rerun. Only reports
+    what it finds unless repair is True (IMAGE_GC_REPAIR=1).
+    Does nothing when interval is 0. Returns the thread or None.
+    """
+    global _gc_thread
+    if not interval:
+        return None
+    with _gc_lock:
+        if _gc_thread is None:
+            _gc_thread = threading.Thread(target=_gc_loop, args=(interval, repair), name="image-gc", daemon=True)
+            _gc_thread.start()
+        return _gc_thread
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from data_management import use_closet
+
+    parser = argparse.ArgumentParser(description="Check (and repair) the image folders of the closets.")
+    parser.add_argument("--closet", help="Only this closet (default: all closets)")
+    parser.add_argument("--repair", action="store_true", help="Delete orphans and fix stale records")
+    parser.add_argument("--grace", type=float, default=IMAGE_GC_GRACE_SECONDS,
+                        help="Leave files younger than this many seconds alone")
+    args = parser.parse_args()
+
+    if args.closet:
+        with use_closet(args.closet):
+            result = {args.closet: fsck(repair=args.repair, grace_seconds=args.grace)}
+    else:
+        result = fsck_all_closets(repair=args.repair, grace_seconds=args.grace)
+    print(json.dumps(result, indent=2))
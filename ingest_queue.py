@@ -0,0 +1,496 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from metrics import increment, span
+
+# Persistent queue for adding items: each upload becomes a job that is
+# analyzed (background removal + classification) and then saved by
+# worker threads, so the app never waits on them. Jobs live in SQLite
+# and survive restarts; a job left 'running' by a crashed process is
+# picked up again once its lease expires.
+INGEST_QUEUE_DB = os.environ.get("INGEST_QUEUE_DB", "ingest_jobs.db")
+# Uploaded originals and their background-free versions wait here until saved
+INGEST_DIR = os.environ.get("INGEST_DIR", "ingest_uploads")
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.environ.get("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_LEASE_SECONDS = float(os.environ.get("INGEST_LEASE_SECONDS", "300"))
+INGEST_POLL_INTERVAL = 0.5  # seconds an idle worker waits before checking again
+# Uploads over this many bytes or pixels are rejected before they are queued
+INGEST_MAX_UPLOAD_BYTES = int(os.environ.get("INGEST_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+INGEST_MAX_PIXELS = int(os.environ.get("INGEST_MAX_PIXELS", "40000000"))
+# Finished jobs and files in INGEST_DIR that no job refers to (interrupted
+# uploads, crashed workers) are removed once older than INGEST_UPLOAD_TTL
+# seconds; idle workers check every INGEST_SWEEP_INTERVAL seconds.
+INGEST_UPLOAD_TTL = float(os.environ.get("INGEST_UPLOAD_TTL", str(24 * 3600)))
+INGEST_SWEEP_INTERVAL = float(os.environ.get("INGEST_SWEEP_INTERVAL", "3600"))
+# Where the app kept uploads before they went through the queue; files left
+# there by older versions are swept with the same TTL
+LEGACY_UPLOAD_DIR = "temp_uploads"
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Job life cycle:
+#   queued (stage analyze) -> running -> ready       (waiting for the user to confirm)
+#   queued (stage save)    -> running -> done
+#   any failure -> queued again (after a backoff) until INGEST_MAX_ATTEMPTS, then failed
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    closet_id TEXT NOT NULL DEFAULT 'default',
+    content_hash TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    auto_save INTEGER NOT NULL DEFAULT 0,
+    source_path TEXT NOT NULL,
+    original_name TEXT,
+    nobg_path TEXT,
+    result TEXT,
+    item_id TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs(content_hash);
+"""
+
+_JSON_FIELDS = ("result",)
+
+
+class UploadRejected(ValueError):
+    """An upload that is too large or not a readable image; nothing is queued."""
+
+
+class IngestQueue:
+    """
+    SQLite-backed job queue (WAL mode, one connection per thread).
+    Jobs are claimed atomically, so several worker threads, or several
+    app processes sharing the same database file, never run the same
+    job twice at once.
+    """
+
+    def __init__(self, db_path=INGEST_QUEUE_DB, upload_dir=INGEST_DIR):
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self._local = threading.local()
+        self._workers = []
+        self._stop = threading.Event()
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "closet_id" not in columns:  # queue created before closets existed
+                conn.execute("ALTER TABLE jobs ADD COLUMN closet_id TEXT NOT NULL DEFAULT 'default'")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id, only_if_status=None, **fields):
+        """
+        Updates a job's fields. With only_if_status (a tuple), the update
+        only happens while the job still has one of those statuses.
+        Returns True if the job was updated.
+        """
+        fields["updated_at"] = time.time()
+        for field in _JSON_FIELDS:
+            if field in fields and fields[field] is not None:
+                fields[field] = json.dumps(fields[field])
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        sql, params = f"UPDATE jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id]
+        if only_if_status:
+            sql += f" AND status IN ({', '.join('?' for _ in only_if_status)})"
+            params.extend(only_if_status)
+        return self.connection().execute(sql, params).rowcount > 0
+
+    # --- Submitting and polling ------------------------------------------
+
+    def enqueue(self, source, original_name=None, auto_save=False):
+        """
+        Stores an uploaded image and queues it for analysis into the
+        current closet (data_management.current_closet). Returns the job ID.
+        `source` is bytes or a binary file-like object (e.g. a Streamlit
+        UploadedFile); it is streamed to disk in chunks, never copied whole.
+        Raises UploadRejected for files over INGEST_MAX_UPLOAD_BYTES or
+        INGEST_MAX_PIXELS, or that are not images.
+        Uploading the same image again while its job is still queued,
+        running or waiting for confirmation returns that job's ID instead
+        of creating a second one.
+        """
+        from data_management import current_closet
+
+        closet_id = current_closet()
+        tmp_path, content_hash = self._spool_upload(source)
+        conn = self.connection()
+        existing = conn.execute(
+            "SELECT id FROM jobs WHERE closet_id = ? AND content_hash = ? "
+            "AND status IN ('queued', 'running', 'ready') ORDER BY created_at LIMIT 1",
+            (closet_id, content_hash),
+        ).fetchone()
+        if existing:
+            _remove_files(tmp_path)
+            return existing["id"]
+
+        job_id = uuid.uuid4().hex
+        extension = os.path.splitext(original_name or "")[1].lower() or ".img"
+        source_path = os.path.join(self.upload_dir, f"{job_id}{extension}")
+        os.replace(tmp_path, source_path)
+
+        now = time.time()
+        conn.execute(
+            "INSERT INTO jobs (id, closet_id, content_hash, stage, status, auto_save, source_path, original_name, "
+            "available_at, created_at, updated_at) VALUES (?, ?, ?, 'analyze', 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, closet_id, content_hash, int(auto_save), source_path, original_name, now, now, now),
+        )
+        increment("ingest_jobs_enqueued")
+        return job_id
+
+    def _spool_upload(self, source):
+        """
+        Streams `source` into a uniquely named file in upload_dir, hashing
+        and size-checking it on the way, then checks the image header.
+        Returns (path, sha256 hex digest); the file is removed on rejection.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        os.makedirs(self.upload_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix="upload_", suffix=".tmp", dir=self.upload_dir)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = source.read(_UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > INGEST_MAX_UPLOAD_BYTES:
+                        raise UploadRejected(
+                            f"File is larger than {INGEST_MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+                        )
+                    digest.update(chunk)
+                    f.write(chunk)
+            _check_image(tmp_path)
+        except BaseException:
+            _remove_files(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest()
+
+    def get_job(self, job_id):
+        """The job as a dict, or None."""
+        row = self.connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list_jobs(self, statuses=None, limit=50):
+        """The current closet's jobs, most recent first, optionally only those with one of `statuses`."""
+        from data_management import current_closet
+
+        sql, params = "SELECT * FROM jobs WHERE closet_id = ?", [current_closet()]
+        if statuses:
+            sql += f" AND status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return [_row_to_job(row) for row in self.connection().execute(sql, params)]
+
+    def counts(self, all_closets=False):
+        """Number of jobs per status (of the current closet unless all_closets)."""
+        from data_management import current_closet
+
+        sql, params = "SELECT status, COUNT(*) AS n FROM jobs", []
+        if not all_closets:
+            sql += " WHERE closet_id = ?"
+            params.append(current_closet())
+        rows = self.connection().execute(sql + " GROUP BY status", params)
+        return {row["status"]: row["n"] for row in rows}
+
+    # --- User actions ------------------------------------------------------
+
+    def confirm(self, job_id, item_data=None):
+        """
+        Queues a 'ready' job for saving, optionally with corrected
+        classification fields. Confirming twice is harmless.
+        """
+        job = self.get_job(job_id)
+        if job is None or job["status"] != "ready":
+            return False
+        result = dict(job["result"] or {})
+        result.update(item_data or {})
+        return self._update(job_id, only_if_status=("ready",), stage="save", status="queued",
+                            result=result, attempts=0, error=None, available_at=time.time())
+
+    def retry(self, job_id):
+        """Re-queues a failed job at the stage where it stopped."""
+        return self._update(job_id, only_if_status=("failed",), status="queued", attempts=0,
+                            error=None, available_at=time.time())
+
+    def cancel(self, job_id):
+        """Discards a job that is not running and removes its files."""
+        job = self.get_job(job_id)
+        if job is None or not self._update(job_id, only_if_status=("queued", "ready", "failed"), status="cancelled"):
+            return False
+        _remove_files(job["source_path"], job["nobg_path"])
+        return True
+
+    def clear_finished(self, older_than=0):
+        """Forgets done/failed/cancelled jobs last updated more than `older_than` seconds ago."""
+        cutoff = time.time() - older_than
+        rows = self.connection().execute(
+            f"SELECT * FROM jobs WHERE status IN ({', '.join('?' for _ in FINISHED_STATUSES)}) AND updated_at <= ?",
+            list(FINISHED_STATUSES) + [cutoff],
+        ).fetchall()
+        for row in rows:
+            if row["status"] != "done":
+                _remove_files(row["source_path"], row["nobg_path"])
+        self.connection().executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        return len(rows)
+
+    def sweep_uploads(self, ttl=INGEST_UPLOAD_TTL):
+        """
+        Janitor: forgets finished jobs older than `ttl` seconds and deletes
+        files in upload_dir (and LEGACY_UPLOAD_DIR) that no job refers to and
+        that have not been touched for `ttl` seconds. Returns the number of
+        files deleted.
+        """
+        self.clear_finished(older_than=ttl)
+        referenced = set()
+        for row in self.connection().execute("SELECT source_path, nobg_path FROM jobs"):
+            referenced.update(os.path.abspath(path) for path in row if path)
+
+        cutoff = time.time() - ttl
+        removed = sum(_sweep_dir(directory, referenced, cutoff) for directory in (self.upload_dir, LEGACY_UPLOAD_DIR))
+        if removed:
+            increment("ingest_files_swept", removed)
+        return removed
+
+    def _maybe_sweep(self):
+        """Runs sweep_uploads at most once per INGEST_SWEEP_INTERVAL across this queue's workers."""
+        with self._sweep_lock:
+            now = time.time()
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + INGEST_SWEEP_INTERVAL
+        try:
+            self.sweep_uploads()
+        except Exception as e:
+            print(f"Ingest upload sweep failed: {e}")
+
+    # --- Workers -----------------------------------------------------------
+
+    def claim(self):
+        """
+        Atomically takes the oldest runnable job: queued and due, or
+        running with an expired lease (its worker died). Returns it or None.
+        """
+        now = time.time()
+        row = self.connection().execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ? "
+            "WHERE id = (SELECT id FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+            "OR (status = 'running' AND lease_until < ?) ORDER BY available_at LIMIT 1) "
+            "RETURNING *",
+            (now + INGEST_LEASE_SECONDS, now, now, now),
+        ).fetchone()
+        return _row_to_job(row) if row else None
+
+    def run_job(self, job):
+        """Runs one claimed job and records the outcome (with retry/backoff on errors)."""
+        from data_management import use_closet
+
+        try:
+            with use_closet(job["closet_id"]), span(f"ingest.{job['stage']}"):
+                if job["stage"] == "analyze":
+                    self._analyze(job)
+                else:
+                    self._save(job)
+            increment("ingest_jobs_completed", stage=job["stage"])
+        except Exception as e:
+            increment("ingest_jobs_errors", stage=job["stage"])
+            print(f"Ingest job {job['id']} ({job['stage']}) failed on attempt {job['attempts']}: {e}")
+            if job["attempts"] >= INGEST_MAX_ATTEMPTS:
+                self._update(job["id"], status="failed", error=str(e), lease_until=None)
+            else:
+                backoff = 2 ** job["attempts"]
+                self._update(job["id"], status="queued", error=str(e), lease_until=None,
+                             available_at=time.time() + backoff)
+
+    def _analyze(self, job):
+        from ai_processing import (
+            classify_item, prepare_image, submit_background_removal, wait_for_background_removal,
+        )
+
+        # Every step is skipped when already done, so a retried job does not repeat work
+        prepared = prepare_image(job["source_path"])
+        nobg_path = job["nobg_path"] or os.path.splitext(job["source_path"])[0] + "_nobg.png"
+        bg_job_id = None
+        if not os.path.exists(nobg_path):
+            # Runs on the rembg process pool while this thread waits for Gemini
+            tmp_path = nobg_path + ".tmp.png"
+            bg_job_id = submit_background_removal(job["source_path"], tmp_path)
+
+        result = job["result"] or classify_item(prepared)
+
+        if bg_job_id is not None:
+            os.replace(wait_for_background_removal(bg_job_id), nobg_path)
+        self._update(job["id"], nobg_path=nobg_path)
+        if not result:
+            raise RuntimeError("classification failed")
+
+        if job["auto_save"]:
+            job.update(nobg_path=nobg_path, result=result)
+            self._update(job["id"], result=result, stage="save")
+            self._save(job)
+        else:
+            self._update(job["id"], result=result, status="ready", error=None, lease_until=None)
+
+    def _save(self, job):
+        from data_management import get_image_dir, get_item, get_next_item_ids, save_item_to_wardrobe
+        from image_store import store_image
+
+        item_id = job["item_id"]
+        if not item_id:
+            item_id = get_next_item_ids(1)[0]
+            self._update(job["id"], item_id=item_id)
+
+        permanent_path = os.path.join(get_image_dir(), f"{item_id}.png")
+        if not os.path.exists(permanent_path):
+            permanent_path = store_image(job["nobg_path"], item_id)
+
+        item_data = dict(job["result"])
+        item_data["id"] = item_id
+        item_data["image_path"] = permanent_path
+        existing = get_item(item_id)
+        duplicates = [] if existing else save_item_to_wardrobe(item_data)
+
+        result = dict(job["result"], duplicates=duplicates)
+        self._update(job["id"], status="done", result=result, error=None, lease_until=None)
+        _remove_files(job["source_path"], job["nobg_path"])
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            job = self.claim()
+            if job is None:
+                self._maybe_sweep()
+                self._stop.wait(INGEST_POLL_INTERVAL)
+                continue
+            self.run_job(job)
+
+    def start_workers(self, count=INGEST_WORKERS):
+        """Starts the worker threads (once per queue; later calls do nothing)."""
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        for i in range(len(self._workers), count):
+            worker = threading.Thread(target=self._worker_loop, name=f"ingest-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop_workers(self, timeout=None):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+        self._stop.clear()
+
+
+def _row_to_job(row):
+    job = dict(row)
+    for field in _JSON_FIELDS:
+        if job[field] is not None:
+            job[field] = json.loads(job[field])
+    job["auto_save"] = bool(job["auto_save"])
+    return job
+
+
+def _check_image(path):
+    """Reads only the image header: rejects non-images and images over INGEST_MAX_PIXELS."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except Exception as e:  # includes PIL's DecompressionBombError
+        raise UploadRejected(f"Not a readable image: {e}") from e
+    if width * height > INGEST_MAX_PIXELS:
+        raise UploadRejected(
+            f"Image is {width}x{height} pixels; the limit is {INGEST_MAX_PIXELS // 1_000_000} megapixels."
+        )
+
+
+def _sweep_dir(directory, referenced, cutoff):
+    """Deletes the files in `directory` not in `referenced` and last modified before `cutoff`."""
+    removed = 0
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return 0
+    with entries:
+        for entry in entries:
+            try:
+                if (not entry.is_file() or os.path.abspath(entry.path) in referenced
+                        or entry.stat().st_mtime > cutoff):
+                    continue
+                os.remove(entry.path)
+            except OSError:
+                continue  # removed concurrently, or still being written
+            removed += 1
+    return removed
+
+
+def _remove_files(*paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Failed to remove {path}: {e}")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_ingest_queue(start_workers=True):
+    """The process-wide queue; its worker threads are started on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestQueue()
+        if start_workers:
+            _queue.start_workers()
+        return _queue
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run ingest workers without the Streamlit app.")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--sweep", action="store_true",
+                        help="Only remove expired uploads and finished jobs, then exit")
+    args = parser.parse_args()
+
+    queue = get_ingest_queue(start_workers=False)
+    if args.sweep:
+        print(f"Removed {queue.sweep_uploads()} stale upload file(s).")
+        raise SystemExit(0)
+    queue.start_workers(args.workers)
+    print(f"Ingest workers running ({args.workers}); jobs: {queue.counts(all_closets=True)}. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        queue.stop_workers()
@@ -1,21 +1,49 @@
 import os
-import google.generativeai as genai
 import json
+import hashlib
 import requests
-from dotenv import load_dotenv
+import threading
+import time
+from collections import OrderedDict
 
+from ai_client import DEFAULT_MODEL_NAME, get_ai_client, load_environment
+from metrics import increment, span, timed
+from outfit_scoring import score_outfit, weather_bucket
+from persistent_cache import PersistentCache
 
-load_dotenv()
 
+# Below this local-score confidence, get_quick_ootd_feedback asks Gemini instead
+LOCAL_FEEDBACK_MIN_CONFIDENCE = float(os.environ.get("LOCAL_FEEDBACK_MIN_CONFIDENCE", "0.6"))
+# None = read from the environment (.env included) on the first weather request
+OPENWEATHER_API_KEY = None
+OPENWEATHER_BASE_URL = os.environ.get("OPENWEATHER_BASE_URL", "http://api.openweathermap.org/data/2.5/weather")
 
-GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY")
+# Weather barely changes within minutes, so lookups are cached per city.
+WEATHER_CACHE_TTL = float(os.environ.get("WEATHER_CACHE_TTL", "600"))  # seconds
+WEATHER_CACHE_MAX_SIZE = int(os.environ.get("WEATHER_CACHE_MAX_SIZE", "256"))
+WEATHER_TIMEOUT = (3.05, 5)  # (connect, read) seconds
 
+DEFAULT_WEATHER = "Unknown, default to pleasant weather (25°C, Clear)"
 
-try:
-    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
-except Exception as e:
-    print(f"Error configuring Google API: {e}. Make sure GOOGLE_API_KEY is set.")
+# One keep-alive session for all weather requests
+_http_session = requests.Session()
+
+_weather_cache = OrderedDict()  # normalized city -> (fetched_at, weather_string)
+_weather_cache_lock = threading.Lock()
+_weather_cache_stats = {"hits": 0, "misses": 0, "stale_served": 0}
+
+# Gemini's OOTD feedback is reused for the same outfit (same item
+# attributes, in any order) of the same closet on a day in the same weather
+# bucket (temperature band + condition class, see outfit_scoring.weather_bucket).
+OOTD_FEEDBACK_CACHE_TTL = float(os.environ.get("OOTD_FEEDBACK_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+# Item attributes sent to Gemini and used in the cache key (not id/image_path)
+OOTD_ITEM_FIELDS = ("type", "color", "style")
+
+_feedback_cache = PersistentCache(
+    "ootd_feedback",
+    max_entries=int(os.environ.get("OOTD_FEEDBACK_CACHE_MAX_ENTRIES", "2000")),
+    ttl_seconds=OOTD_FEEDBACK_CACHE_TTL,
+)
 
 
 def clean_json_response(response_text):
@@ -32,14 +60,50 @@ def clean_json_response(response_text):
         return response_text  
 
 
+def _normalize_city(city_name):
+    return " ".join(city_name.split()).casefold()
+
+
+def get_weather_cache_stats():
+    """Hit/miss counters of the weather cache."""
+    with _weather_cache_lock:
+        return {**_weather_cache_stats, "entries": len(_weather_cache)}
+
+
+def clear_weather_cache():
+    with _weather_cache_lock:
+        _weather_cache.clear()
+        for key in _weather_cache_stats:
+            _weather_cache_stats[key] = 0
+
+
+@timed()
 def get_weather_data(city_name):
-    """Fetches temperature and weather conditions from OpenWeatherMap."""
+    """
+    Fetches temperature and weather conditions from OpenWeatherMap.
+    Results are cached per city for WEATHER_CACHE_TTL seconds. If the
+    provider fails, the last known (stale) value is served when available.
+    """
    
+    global OPENWEATHER_API_KEY
+    if OPENWEATHER_API_KEY is None:
+        load_environment()
+        OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", "")
     if not OPENWEATHER_API_KEY:
         print("OPENWEATHER_API_KEY not found. Using default weather.")
-        return "Unknown, default to pleasant weather (25°C, Clear)"
+        return DEFAULT_WEATHER
+
+    cache_key = _normalize_city(city_name)
+    with _weather_cache_lock:
+        cached = _weather_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < WEATHER_CACHE_TTL:
+            _weather_cache.move_to_end(cache_key)
+            _weather_cache_stats["hits"] += 1
+            increment("weather_cache_hits")
+            return cached[1]
+        _weather_cache_stats["misses"] += 1
+    increment("weather_cache_misses")
        
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
     params = {
         'q': city_name,
         'appid': OPENWEATHER_API_KEY,
@@ -49,7 +113,7 @@ def get_weather_data(city_name):
 
 
     try:
-        response = requests.get(base_url, params=params)
+        response = _http_session.get(OPENWEATHER_BASE_URL, params=params, timeout=WEATHER_TIMEOUT)
         response.raise_for_status()
         data = response.json()
        
@@ -62,27 +126,70 @@ def get_weather_data(city_name):
             weather_string += " It's very hot and sunny."
         elif temperature < 15:
             weather_string += " It's cold. Layering is needed."
+
+        with _weather_cache_lock:
+            _weather_cache[cache_key] = (time.monotonic(), weather_string)
+            _weather_cache.move_to_end(cache_key)
+            while len(_weather_cache) > WEATHER_CACHE_MAX_SIZE:
+                _weather_cache.popitem(last=False)
            
         return weather_string
        
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, KeyError, IndexError, ValueError) as e:
 
 
         print(f"Error fetching weather data for city '{city_name}': {e}")
-        return "Unknown, default to pleasant weather (25°C, Clear)"
+        if cached:
+            with _weather_cache_lock:
+                _weather_cache_stats["stale_served"] += 1
+            print(f"Serving cached weather for '{city_name}' instead.")
+            return cached[1]
+        return DEFAULT_WEATHER
 
 
-def get_ootd_feedback(item_list, current_weather):
+def canonical_outfit(item_list):
     """
-    Sends a list of items (as dict/json) to Google Gemini
-    to get fashion feedback.
+    The outfit as Gemini sees it: only OOTD_ITEM_FIELDS, whitespace
+    normalized, in a fixed order, so the same clothes give the same list.
     """
-   
-    items_json_string = json.dumps(item_list, indent=2)
-   
-    model = genai.GenerativeModel('gemini-2.5-flash')
-   
-    prompt = (
+    items = [
+        {field: " ".join(str(item[field]).split()) for field in OOTD_ITEM_FIELDS if item.get(field)}
+        for item in item_list
+    ]
+    return sorted(items, key=lambda item: [item.get(field, "").casefold() for field in OOTD_ITEM_FIELDS])
+
+
+def _feedback_tag(item_id, closet_id):
+    return f"item:{closet_id}:{item_id}"
+
+
+def get_feedback_cache_stats():
+    """Hit/miss counters and size of the OOTD feedback cache."""
+    return _feedback_cache.stats()
+
+
+def clear_feedback_cache():
+    """Drops every cached OOTD feedback."""
+    _feedback_cache.clear()
+
+
+def invalidate_ootd_feedback(item_id, closet_id=None):
+    """Forgets cached feedback for every outfit containing the item (called when it is deleted)."""
+    from data_management import current_closet
+
+    return _feedback_cache.invalidate_tag(_feedback_tag(item_id, closet_id or current_closet()))
+
+
+def on_wardrobe_changes(events):
+    """Change feed consumer (see data_management.subscribe): forgets feedback for deleted items."""
+    for event in events:
+        invalidate_ootd_feedback(event["item_id"], event["closet"])
+
+
+def _ootd_prompt(items, current_weather):
+    items_json_string = json.dumps(items, indent=2)
+
+    return (
         "You are the 'OOTD Oracle', a friendly and supportive AI fashion stylist.\n"
         "Your task is to evaluate the compatibility of the following clothing combination, provided in JSON format:\n"
         f"{items_json_string}\n\n"
@@ -101,20 +208,54 @@ def get_ootd_feedback(item_list, current_weather):
     )
 
 
-   
+# Changing the prompt or the model produces a new version (old entries are never hit again)
+OOTD_FEEDBACK_CACHE_VERSION = hashlib.sha256(
+    f"{DEFAULT_MODEL_NAME}\n{_ootd_prompt([], '')}".encode("utf-8")
+).hexdigest()[:16]
+
+
+@timed()
+def get_ootd_feedback(item_list, current_weather):
+    """
+    Sends a list of items (as dict/json) to Google Gemini
+    to get fashion feedback.
+    Answers are cached per closet, outfit and weather bucket (OOTD_FEEDBACK_CACHE_TTL);
+    changing or deleting one of the items drops the cached answers that include it.
+    """
+    from data_management import current_closet
+
+    closet_id = current_closet()
+    items = canonical_outfit(item_list)
+    key_source = json.dumps(
+        [closet_id,
+         [{field: value.casefold() for field, value in item.items()} for item in items],
+         weather_bucket(current_weather)],
+        sort_keys=True,
+    )
+    cache_key = f"{OOTD_FEEDBACK_CACHE_VERSION}:{hashlib.sha256(key_source.encode('utf-8')).hexdigest()}"
+    cached = _feedback_cache.get(cache_key)
+    if cached is not None:
+        increment("ootd_feedback_cache_hits")
+        return cached
+    increment("ootd_feedback_cache_misses")
+
+    prompt = _ootd_prompt(items, current_weather)
+
     try:
-        response = model.generate_content(prompt)
+        response_text = get_ai_client().generate(prompt, model_name=DEFAULT_MODEL_NAME, name="get_ootd_feedback")
        
-        ai_output = clean_json_response(response.text)
-       
-        parsed_json = json.loads(ai_output)
+        with span("get_ootd_feedback.parse"):
+            ai_output = clean_json_response(response_text)
+            parsed_json = json.loads(ai_output)
        
         required_keys = {"rating", "feedback", "saran"}
         if not required_keys.issubset(parsed_json.keys()):
 
 
             raise ValueError("AI response is missing the expected JSON format.")
-       
+
+        tags = [_feedback_tag(item["id"], closet_id) for item in item_list if item.get("id")]
+        _feedback_cache.set(cache_key, parsed_json, tags=tags)
         return parsed_json
 
 
@@ -122,8 +263,7 @@ def get_ootd_feedback(item_list, current_weather):
 
 
         print(f"Error parsing JSON from AI: {e}")
-        ai_output = response.text
-        print(f"Raw output from AI: {ai_output}")
+        print(f"Raw output from AI: {response_text}")
         return {
             "rating": 0,
             "feedback": "Error: AI response was not valid JSON.",
@@ -133,7 +273,7 @@ def get_ootd_feedback(item_list, current_weather):
 
 
         print(f"Error getting OOTD feedback (Gemini): {e}")
-        ai_output = getattr(response, 'text', 'No response') if 'response' in locals() else 'No response'
+        ai_output = response_text if 'response_text' in locals() else 'No response'
         print(f"Raw output from AI: {ai_output}")
         return {
             "rating": 0,
@@ -142,6 +282,28 @@ def get_ootd_feedback(item_list, current_weather):
         }
 
 
+def get_quick_ootd_feedback(item_list, current_weather, use_ai=False):
+    """
+    Rates an outfit with the local rule-based scorer (instant, no network).
+    Falls back to Gemini (get_ootd_feedback) when use_ai is True or the
+    local score's confidence is below LOCAL_FEEDBACK_MIN_CONFIDENCE. If that
+    fallback fails (no key, offline, rate limited), the local result is
+    returned anyway, with 'low_confidence': True.
+    """
+    if use_ai:
+        return get_ootd_feedback(item_list, current_weather)
+    with span("score_outfit"):
+        local_result = score_outfit(item_list, current_weather)
+    if local_result["confidence"] >= LOCAL_FEEDBACK_MIN_CONFIDENCE:
+        return local_result
+    print(f"Local score confidence {local_result['confidence']} is low, asking Gemini.")
+    ai_result = get_ootd_feedback(item_list, current_weather)
+    if ai_result.get("rating", 0) > 0:
+        return ai_result
+    print("Gemini feedback failed, using the low-confidence local score.")
+    return {**local_result, "low_confidence": True}
+
+
 if __name__ == "__main__":
     print("--- Starting Styling Logic Test (with Weather) ---")
    
@@ -163,6 +325,10 @@ if __name__ == "__main__":
         print(f" - {item['style']} ({item['color']})")
 
 
+    hasil_lokal = score_outfit(selected_outfit_items, current_weather)
+    print("\nLocal score (no AI):")
+    print(json.dumps(hasil_lokal, indent=2))
+
     hasil_feedback = get_ootd_feedback(selected_outfit_items, current_weather)
    
     if hasil_feedback and hasil_feedback.get('rating', 0) > 0:
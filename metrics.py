@@ -0,0 +1,291 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# In-process metrics: counters, latency histograms and per-rerun traces.
+# Export with to_prometheus()/snapshot(), or serve both over HTTP by
+# setting METRICS_PORT (see start_metrics_server).
+METRICS_PREFIX = "wardrobe"
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """Latency histogram with fixed bucket bounds in seconds (per-bucket counts, not cumulative)."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def snapshot(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "count": self.count,
+            "avg_seconds": round(self.total / self.count, 4) if self.count else None,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class Trace:
+    """
+    The spans recorded while one piece of work ran (e.g. one Streamlit
+    rerun), in start order, with their nesting depth.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+
+    def _add(self, name, depth, started, seconds, error):
+        self.spans.append({
+            "name": name,
+            "depth": depth,
+            "start_ms": round((started - self._started) * 1000, 2),
+            "duration_ms": round(seconds * 1000, 2),
+            "error": error,
+        })
+
+    def breakdown(self):
+        """Total time and call count per span name, slowest first."""
+        totals = {}
+        for span_record in self.spans:
+            entry = totals.setdefault(span_record["name"], {"name": span_record["name"], "calls": 0, "total_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + span_record["duration_ms"], 2)
+        return sorted(totals.values(), key=lambda entry: -entry["total_ms"])
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "started_at": self.started_at,
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 2),
+            "spans": list(self.spans),
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, keyed by metric name and labels."""
+
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """JSON-friendly view: {'counters': [...], 'histograms': [...]}."""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), **histogram.snapshot(),
+                     "sum_seconds": round(histogram.total, 6)}
+                    for (name, labels), histogram in sorted(self._histograms.items())
+                ],
+            }
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (h.bounds, list(h.counts), h.total, h.count)) for key, h in self._histograms.items()
+            )
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), (bounds, counts, total, count) in histograms:
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+def get_registry():
+    """The process-wide registry every module records into."""
+    return _registry
+
+
+def increment(name, value=1, **labels):
+    _registry.increment(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    _registry.observe(name, seconds, **labels)
+
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_span_depth = contextvars.ContextVar("span_depth", default=0)
+
+
+def start_trace(label):
+    """Starts collecting spans for the current thread/context and returns the Trace."""
+    trace = Trace(label)
+    _current_trace.set(trace)
+    _span_depth.set(0)
+    return trace
+
+
+def finish_trace(trace):
+    """Stops collecting spans into `trace` and records its total duration."""
+    trace.duration = time.perf_counter() - trace._started
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+    observe("trace_seconds", trace.duration, trace=trace.label)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def span(name):
+    """
+    Times a block: the duration goes to the 'span_seconds' histogram
+    (label span=name), failures to the 'span_errors' counter, and the
+    span is added to the current trace if one is running.
+    """
+    depth = _span_depth.get()
+    token = _span_depth.set(depth + 1)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        # Control-flow exceptions (e.g. Streamlit's rerun) are not counted as errors
+        error = type(e).__name__
+        increment("span_errors", span=name)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        _span_depth.reset(token)
+        observe("span_seconds", seconds, span=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace._add(name, depth, started, seconds, error)
+
+
+def timed(name=None):
+    """Decorator form of span(); the span name defaults to the function name."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = _registry.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(_registry.snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=None, host=METRICS_HOST):
+    """
+    Serves /metrics (Prometheus text) and /metrics.json from a daemon
+    thread. Does nothing when no port is given and METRICS_PORT is unset;
+    safe to call on every Streamlit rerun. Returns the server or None.
+    """
+    global _server
+    port = port or METRICS_PORT
+    with _server_lock:
+        if _server is None and port:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Could not start metrics server on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            print(f"Metrics available at http://{host}:{port}/metrics")
+        return _server
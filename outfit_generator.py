@@ -0,0 +1,216 @@
+import heapq
+
+import numpy as np
+
+from outfit_scoring import (
+    COLOR_FAMILIES,
+    _color_pair_score,
+    color_family,
+    item_warmth,
+    parse_weather,
+    score_outfit,
+    temperature_band,
+)
+
+# Index of each color family in the pair-score matrix; the last row/column is "unknown"
+_FAMILIES = sorted({family for _, family in COLOR_FAMILIES})
+_FAMILY_INDEX = {family: i for i, family in enumerate(_FAMILIES)}
+_UNKNOWN = len(_FAMILIES)
+
+# Pair scores as a matrix. Pairs with an unknown color are ignored by score_outfit,
+# so they get a value above 1 that never wins the min() and is replaced afterwards.
+_IGNORED = 2.0
+_PAIR_MATRIX = np.full((_UNKNOWN + 1, _UNKNOWN + 1), _IGNORED)
+for _a, _fa in enumerate(_FAMILIES):
+    for _b, _fb in enumerate(_FAMILIES):
+        _PAIR_MATRIX[_a, _b] = _color_pair_score(_fa, _fb)
+
+
+def _features(items):
+    """Color-family indices and warmth values for a list of items, as arrays."""
+    families = np.array(
+        [_FAMILY_INDEX.get(color_family(item.get("color_name") or item.get("color")), _UNKNOWN) for item in items],
+        dtype=np.intp,
+    )
+    warmth = np.array([item_warmth(item.get("type"), item.get("style")) for item in items], dtype=np.float64)
+    return families, warmth
+
+
+def _weather_scores(total_warmth, has_outerwear, band, is_rainy):
+    """Vectorized version of outfit_scoring._weather_score (same thresholds)."""
+    total_warmth = np.asarray(total_warmth, dtype=np.float64)
+    has_outerwear = np.broadcast_to(has_outerwear, total_warmth.shape)
+    if band == "hot":
+        return np.where(has_outerwear | (total_warmth > 0.5), 0.3, np.where(total_warmth < 0, 1.0, 0.75))
+    if band == "warm":
+        return np.where(total_warmth > 1.0, 0.5, 0.9)
+    if band == "cold":
+        return np.where(~has_outerwear & (total_warmth < 0.5), 0.3, 1.0)
+    if is_rainy:
+        return np.where(has_outerwear, 0.9, 0.7)
+    return np.full(total_warmth.shape, 0.9)
+
+
+def _color_scores(min_pair):
+    """Turns the minimum pair score into the color component (0.6 when no pair was recognized)."""
+    return np.where(min_pair > 1.0, 0.6, min_pair)
+
+
+def _combined(color, weather):
+    # Same weights as score_outfit for a combination with valid type slots
+    return 0.4 + 0.35 * color + 0.25 * weather
+
+
+def _color_upper_bound(min_pair):
+    """
+    Highest color component outfits built on these bases can still reach.
+    Adding items only lowers a recognized pair score, but a base without any
+    recognized pair (a single dress, unknown colors) scores a flat 0.6 that
+    the first recognized pair can raise to anything up to 1.0.
+    """
+    return np.where(min_pair > 1.0, 1.0, min_pair)
+
+
+def _weather_upper_bound(warmth, extra_without_outer, extra_with_outer, band, is_rainy):
+    """
+    Best weather component any outerwear/shoes choice can give bases of this
+    warmth: the maximum over every warmth the finished outfit can have,
+    without outerwear (base + shoes) and with it (base + outerwear + shoes).
+    """
+    bound = _weather_scores(warmth[:, None] + extra_without_outer[None, :], False, band, is_rainy).max(axis=1)
+    if extra_with_outer.size:
+        with_outer = _weather_scores(warmth[:, None] + extra_with_outer[None, :], True, band, is_rainy).max(axis=1)
+        bound = np.maximum(bound, with_outer)
+    return bound
+
+
+def suggest_outfits(wardrobe, current_weather=None, top_k=5):
+    """
+    Builds and ranks outfits from the whole closet.
+
+    Items are grouped by type; every Top x Bottom pair (and every Dress) gets
+    an upper bound on the score it can reach, computed at once with NumPy.
+    Bases are then extended with the best Outerwear (if it helps) and Shoes
+    in order of that bound, stopping as soon as no remaining base can beat
+    the current top_k, so the result is the same for any top_k.
+
+    Returns up to top_k dicts: {'items': [...], 'score': float, **score_outfit(...)}.
+    """
+    temperature, is_rainy = parse_weather(current_weather)
+    band = temperature_band(temperature)
+
+    by_type = {}
+    for item in wardrobe:
+        by_type.setdefault(item.get("type"), []).append(item)
+    tops, bottoms = by_type.get("Top", []), by_type.get("Bottom", [])
+    dresses = by_type.get("Dress", [])
+    outerwear, shoes = by_type.get("Outerwear", []), by_type.get("Shoes", [])
+
+    outer_fam, outer_warm = _features(outerwear) if outerwear else (np.empty(0, np.intp), np.empty(0))
+    shoe_fam, shoe_warm = _features(shoes) if shoes else (np.empty(0, np.intp), np.empty(0))
+    # Warmth the finished outfit can add to a base (shoes are always added when there are any)
+    extra_without_outer = np.unique(shoe_warm) if shoes else np.zeros(1)
+    extra_with_outer = np.unique((outer_warm[:, None] + extra_without_outer[None, :]).ravel())
+
+    # --- Pass 1: bound every base combination at once ---
+    pair_parts, warmth_parts = [], []
+    color_parts = []  # best color component reachable once shoes are added
+    shoe_families = np.unique(shoe_fam)
+    if tops and bottoms:
+        top_fam, top_warm = _features(tops)
+        bottom_fam, bottom_warm = _features(bottoms)
+        pair = _PAIR_MATRIX[top_fam[:, None], bottom_fam[None, :]]
+        pair_parts.append(pair.ravel())
+        warmth_parts.append((top_warm[:, None] + bottom_warm[None, :]).ravel())
+        if shoes:
+            # Every outfit gets shoes: the pair score after the best-matching shoe color
+            with_shoe = np.minimum(
+                pair[:, :, None],
+                np.minimum(_PAIR_MATRIX[top_fam][:, None, shoe_families], _PAIR_MATRIX[bottom_fam][None, :, shoe_families]),
+            )
+            color_parts.append(_color_upper_bound(with_shoe).max(axis=2).ravel())
+        else:
+            color_parts.append(_color_upper_bound(pair).ravel())
+    if dresses:
+        dress_fam, dress_warm = _features(dresses)
+        pair_parts.append(np.full(len(dresses), _IGNORED))
+        warmth_parts.append(dress_warm)
+        if shoes:
+            color_parts.append(_color_upper_bound(_PAIR_MATRIX[dress_fam][:, shoe_families]).max(axis=1))
+        else:
+            color_parts.append(np.ones(len(dresses)))
+    if not pair_parts:
+        return []
+    base_pair, base_warmth = np.concatenate(pair_parts), np.concatenate(warmth_parts)
+    bounds = _combined(np.concatenate(color_parts), _weather_upper_bound(
+        base_warmth, extra_without_outer, extra_with_outer, band, is_rainy))
+    pair_count = len(tops) * len(bottoms) if tops and bottoms else 0
+
+    def base_at(index):
+        """(items, color_family_indices) of base number `index`."""
+        if index < pair_count:
+            t, b = divmod(index, len(bottoms))
+            return [tops[t], bottoms[b]], [top_fam[t], bottom_fam[b]]
+        d = index - pair_count
+        return [dresses[d]], [dress_fam[d]]
+
+    # --- Pass 2: extend the best bases with outerwear and shoes ---
+    results = []  # min-heap of (score, counter, items)
+    counter = 0
+    # Highest bound first (stable, so equal bounds keep the closet order)
+    for index in np.argsort(-bounds, kind="stable"):
+        # Bases are sorted by their upper bound, so no later base can do better
+        if len(results) == top_k and bounds[index] <= results[0][0]:
+            break
+
+        items, families = base_at(int(index))
+        min_pair, warmth = base_pair[index], base_warmth[index]
+        families = np.array(families, dtype=np.intp)
+        chosen = list(items)
+        current_min = min_pair
+
+        if outerwear:
+            outer_pair = np.minimum(current_min, _PAIR_MATRIX[outer_fam[:, None], families[None, :]].min(axis=1))
+            outer_scores = _combined(_color_scores(outer_pair), _weather_scores(warmth + outer_warm, True, band, is_rainy))
+            without = float(_combined(_color_scores(np.float64(current_min)), _weather_scores(warmth, False, band, is_rainy)))
+            best_outer = int(np.argmax(outer_scores))
+            if outer_scores[best_outer] > without:
+                chosen.append(outerwear[best_outer])
+                families = np.append(families, outer_fam[best_outer])
+                current_min = outer_pair[best_outer]
+                warmth = warmth + outer_warm[best_outer]
+        has_outer = len(chosen) > len(items)
+        weather = float(_weather_scores(warmth, has_outer, band, is_rainy))
+
+        if shoes:
+            shoe_pair = np.minimum(current_min, _PAIR_MATRIX[shoe_fam[:, None], families[None, :]].min(axis=1))
+            shoe_scores = _combined(_color_scores(shoe_pair), _weather_scores(warmth + shoe_warm, has_outer, band, is_rainy))
+            # Shoes complete an outfit, so the best-matching pair is always added
+            best_shoe = int(np.argmax(shoe_scores))
+            chosen.append(shoes[best_shoe])
+            current_min = shoe_pair[best_shoe]
+            warmth = warmth + shoe_warm[best_shoe]
+            weather = float(_weather_scores(warmth, has_outer, band, is_rainy))
+
+        score = float(_combined(_color_scores(np.float64(current_min)), weather))
+        counter += 1
+        entry = (score, counter, chosen)
+        if len(results) < top_k:
+            heapq.heappush(results, entry)
+        elif score > results[0][0]:
+            heapq.heapreplace(results, entry)
+
+    ranked = sorted(results, key=lambda entry: (-entry[0], entry[1]))
+    return [
+        {"items": items, "score": round(score, 4), **score_outfit(items, current_weather)}
+        for score, _, items in ranked
+    ]
+
+
+def explain_outfits(suggestions, current_weather, top_n=3):
+    """Asks the AI Stylist (Gemini) to explain the first top_n suggestions."""
+    from logika_styling import get_ootd_feedback
+
+    for suggestion in suggestions[:top_n]:
+        suggestion["ai_feedback"] = get_ootd_feedback(suggestion["items"], current_weather)
+    return suggestions
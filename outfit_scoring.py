@@ -0,0 +1,242 @@
+import re
+from functools import lru_cache
+
+# --- Color harmony -------------------------------------------------------
+
+# Keywords -> color family. Checked in order, so more specific words go first.
+COLOR_FAMILIES = (
+    ("navy", "neutral"), ("denim", "neutral"), ("khaki", "neutral"), ("beige", "neutral"),
+    ("cream", "neutral"), ("ivory", "neutral"), ("white", "neutral"), ("black", "neutral"),
+    ("grey", "neutral"), ("gray", "neutral"), ("charcoal", "neutral"), ("tan", "neutral"),
+    ("camel", "neutral"), ("brown", "neutral"), ("olive", "green"),
+    ("maroon", "red"), ("burgundy", "red"), ("red", "red"),
+    ("coral", "orange"), ("orange", "orange"), ("mustard", "yellow"), ("yellow", "yellow"),
+    ("gold", "yellow"), ("green", "green"), ("mint", "green"), ("teal", "blue"),
+    ("turquoise", "blue"), ("blue", "blue"), ("purple", "purple"), ("lavender", "purple"),
+    ("violet", "purple"), ("lilac", "purple"), ("pink", "pink"), ("magenta", "pink"),
+)
+
+# Pair scores between two non-neutral families (0 = clash, 1 = great).
+# Same family (monochrome) and anything with a neutral are handled in _color_pair_score.
+_FAMILY_PAIR_SCORES = {
+    frozenset(("blue", "green")): 0.7,
+    frozenset(("blue", "purple")): 0.7,
+    frozenset(("blue", "orange")): 0.75,   # complementary
+    frozenset(("blue", "yellow")): 0.6,
+    frozenset(("blue", "pink")): 0.65,
+    frozenset(("blue", "red")): 0.5,
+    frozenset(("red", "pink")): 0.35,
+    frozenset(("red", "orange")): 0.4,
+    frozenset(("red", "green")): 0.3,
+    frozenset(("red", "purple")): 0.35,
+    frozenset(("red", "yellow")): 0.4,
+    frozenset(("orange", "yellow")): 0.6,
+    frozenset(("orange", "pink")): 0.35,
+    frozenset(("orange", "purple")): 0.4,
+    frozenset(("orange", "green")): 0.45,
+    frozenset(("yellow", "green")): 0.6,
+    frozenset(("yellow", "purple")): 0.55,  # complementary
+    frozenset(("yellow", "pink")): 0.5,
+    frozenset(("green", "pink")): 0.45,
+    frozenset(("green", "purple")): 0.4,
+    frozenset(("purple", "pink")): 0.6,
+}
+
+# --- Type slots ----------------------------------------------------------
+
+SLOT_TYPES = ("Top", "Bottom", "Dress", "Outerwear", "Shoes", "Accessory")
+
+# --- Weather -------------------------------------------------------------
+
+# Style keywords -> warmth (-1 = made for heat, +1 = warm/heavy)
+_WARM_WORDS = ("wool", "knit", "sweater", "hoodie", "fleece", "thermal", "turtleneck",
+               "coat", "puffer", "parka", "leather", "long sleeve", "cardigan", "boots", "corduroy")
+_LIGHT_WORDS = ("linen", "short", "tank", "sleeveless", "tee", "t-shirt", "chiffon",
+                "sandal", "crop", "mesh", "slip")
+
+_TEMPERATURE_RE = re.compile(r"(-?\d+(?:\.\d+)?)\s*°?\s*C")
+_RAIN_WORDS = ("rain", "drizzle", "thunderstorm", "shower")
+# Weather description keyword -> condition class, checked in order
+_CONDITION_CLASSES = (
+    ("thunderstorm", "storm"), ("storm", "storm"), ("snow", "snow"), ("sleet", "snow"),
+    ("rain", "rain"), ("drizzle", "rain"), ("shower", "rain"), ("mist", "fog"), ("fog", "fog"),
+    ("haze", "fog"), ("cloud", "cloudy"), ("overcast", "cloudy"), ("clear", "clear"), ("sun", "clear"),
+)
+
+
+@lru_cache(maxsize=4096)
+def color_family(color):
+    """Maps free-text color ('Light Blue', 'sky blue') to a coarse family, or None."""
+    text = (color or "").lower()
+    for keyword, family in COLOR_FAMILIES:
+        if keyword in text:
+            return family
+    return None
+
+
+@lru_cache(maxsize=4096)
+def item_warmth(item_type, style):
+    """-1.0 (hot-weather piece) .. +1.0 (cold-weather piece)."""
+    text = (style or "").lower()
+    warmth = 0.0
+    if item_type == "Outerwear":
+        warmth += 0.6
+    if any(word in text for word in _WARM_WORDS):
+        warmth += 0.6
+    if any(word in text for word in _LIGHT_WORDS):
+        warmth -= 0.6
+    return max(-1.0, min(1.0, warmth))
+
+
+def parse_weather(weather):
+    """
+    Extracts (temperature_celsius, is_rainy) from a get_weather_data() string.
+    Temperature is None when it cannot be parsed.
+    """
+    text = weather or ""
+    match = _TEMPERATURE_RE.search(text)
+    temperature = float(match.group(1)) if match else None
+    is_rainy = any(word in text.lower() for word in _RAIN_WORDS)
+    return temperature, is_rainy
+
+
+def temperature_band(temperature):
+    if temperature is None:
+        return "mild"
+    if temperature >= 30:
+        return "hot"
+    if temperature >= 24:
+        return "warm"
+    if temperature >= 15:
+        return "mild"
+    return "cold"
+
+
+def weather_condition(weather):
+    """Coarse condition class of a weather string: storm, snow, rain, fog, cloudy, clear or other."""
+    text = (weather or "").lower()
+    for keyword, condition in _CONDITION_CLASSES:
+        if keyword in text:
+            return condition
+    return "other"
+
+
+def weather_bucket(weather):
+    """Quantized weather, e.g. 'warm/rain': the temperature band plus the condition class."""
+    temperature, _ = parse_weather(weather)
+    return f"{temperature_band(temperature)}/{weather_condition(weather)}"
+
+
+def _color_pair_score(family_a, family_b):
+    if family_a is None or family_b is None:
+        return None
+    if family_a == "neutral" or family_b == "neutral":
+        return 0.9 if family_a != family_b else 0.8
+    if family_a == family_b:
+        return 0.85
+    return _FAMILY_PAIR_SCORES.get(frozenset((family_a, family_b)), 0.5)
+
+
+def _slot_score(types):
+    """Returns (score 0..1, problem message or None) for the combination of types."""
+    counts = {slot: types.count(slot) for slot in SLOT_TYPES}
+    if counts["Dress"] and (counts["Top"] or counts["Bottom"]):
+        return 0.2, "A dress is usually worn without a separate top or bottom."
+    for slot in ("Top", "Bottom", "Dress", "Outerwear", "Shoes"):
+        if counts[slot] > 1:
+            return 0.2, f"You picked more than one {slot.lower()}."
+    if not counts["Dress"] and not (counts["Top"] and counts["Bottom"]):
+        missing = "bottom" if counts["Top"] else "top"
+        return 0.5, f"This outfit is missing a {missing}."
+    return 1.0, None
+
+
+def _weather_score(items, band, is_rainy):
+    """Returns (score 0..1, advice or None) for how well the items suit the weather."""
+    warmth = [item_warmth(item.get("type"), item.get("style")) for item in items]
+    has_outerwear = any(item.get("type") == "Outerwear" for item in items)
+    total = sum(warmth)
+    if band == "hot":
+        if has_outerwear or total > 0.5:
+            return 0.3, "This might be too warm for the current heat; try lighter pieces."
+        if total < 0:
+            return 1.0, "Light, breathable pieces are perfect for the hot weather!"
+        return 0.75, None
+    if band == "warm":
+        if total > 1.0:
+            return 0.5, "Consider dropping a layer, it's quite warm today."
+        return 0.9, None
+    if band == "cold":
+        if not has_outerwear and total < 0.5:
+            return 0.3, "It's cold outside; add a jacket or a warmer layer."
+        return 1.0, "Nice layering for the cold weather!"
+    if is_rainy and not has_outerwear:
+        return 0.7, "It might rain; a light jacket would help."
+    return 0.9, None
+
+
+def score_outfit(item_list, current_weather=None):
+    """
+    Rates an outfit locally with deterministic rules, without any AI call.
+
+    Returns the same shape as get_ootd_feedback ('rating', 'feedback',
+    'saran') plus 'confidence' (0..1, low when colors are unrecognized
+    or the result is borderline) and 'source': 'local'.
+    """
+    types = [item.get("type") for item in item_list]
+    slot, slot_problem = _slot_score(types)
+
+    families = [color_family(item.get("color_name") or item.get("color"))
+                for item in item_list if item.get("type") != "Accessory"]
+    pair_scores = []
+    unknown_colors = sum(1 for family in families if family is None)
+    for i in range(len(families)):
+        for j in range(i + 1, len(families)):
+            pair = _color_pair_score(families[i], families[j])
+            if pair is not None:
+                pair_scores.append(pair)
+    color = min(pair_scores) if pair_scores else 0.6
+
+    temperature, is_rainy = parse_weather(current_weather)
+    band = temperature_band(temperature)
+    weather, weather_advice = _weather_score(item_list, band, is_rainy)
+
+    combined = 0.4 * slot + 0.35 * color + 0.25 * weather
+    if slot < 0.5:
+        combined = min(combined, slot + 0.2)
+    rating = max(1, min(10, round(combined * 10)))
+
+    if slot_problem:
+        feedback = f"Hmm, {slot_problem[0].lower()}{slot_problem[1:]}"
+    elif color >= 0.8:
+        feedback = "This combination works well!"
+    elif color >= 0.6:
+        feedback = "These colors go together nicely."
+    elif color >= 0.45:
+        feedback = "The colors are a bit of a bold mix."
+    else:
+        feedback = "Hmm, these colors don't quite match."
+
+    if weather_advice:
+        saran = weather_advice
+    elif color < 0.6:
+        saran = "Try pairing one of these with a neutral piece (white, black, beige or denim)."
+    else:
+        saran = "Great choice for today's weather!"
+
+    confidence = 0.9
+    if unknown_colors:
+        confidence -= 0.25 * unknown_colors
+    if temperature is None:
+        confidence -= 0.15
+    if 5 <= rating <= 6:
+        confidence -= 0.2
+    confidence = round(max(0.0, min(1.0, confidence)), 2)
+
+    return {
+        "rating": rating,
+        "feedback": feedback,
+        "saran": saran,
+        "confidence": confidence,
+        "source": "local",
+    }
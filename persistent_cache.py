@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# One SQLite file holds every AI-related cache, separated by namespace.
+AI_CACHE_DB = os.environ.get("AI_CACHE_DB", "ai_cache.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries(namespace, last_used);
+CREATE TABLE IF NOT EXISTS cache_tags (
+    namespace TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (namespace, tag, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags(namespace, key);
+"""
+
+
+class PersistentCache:
+    """
+    Small on-disk key/value cache (SQLite) with LRU eviction
+    and an optional time-to-live. Values must be JSON-serializable.
+    Entries can carry tags, so that everything derived from one source
+    (e.g. one wardrobe item) can be dropped with invalidate_tag().
+    """
+
+    def __init__(self, namespace, max_entries=1000, ttl_seconds=None, db_path=None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or AI_CACHE_DB
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or an expired entry."""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        now = time.time()
+        if row is None or (self.ttl_seconds is not None and now - row[1] > self.ttl_seconds):
+            self._count(hit=False)
+            return None
+        conn.execute(
+            "UPDATE cache_entries SET last_used = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, key),
+        )
+        self._count(hit=True)
+        return json.loads(row[0])
+
+    def set(self, key, value, tags=()):
+        """
+        Stores a value (replacing the key's old value and tags) and evicts
+        the least recently used entries above max_entries.
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now, now),
+            )
+            conn.execute("DELETE FROM cache_tags WHERE namespace = ? AND key = ?", (self.namespace, key))
+            conn.executemany(
+                "INSERT OR IGNORE INTO cache_tags (namespace, tag, key) VALUES (?, ?, ?)",
+                [(self.namespace, tag, key) for tag in tags],
+            )
+            evicted = [row[0] for row in conn.execute(
+                "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                (self.namespace, self.max_entries),
+            )]
+            self._delete_keys(conn, evicted)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _delete_keys(self, conn, keys):
+        conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                         [(self.namespace, key) for key in keys])
+        conn.executemany("DELETE FROM cache_tags WHERE namespace = ? AND key = ?",
+                         [(self.namespace, key) for key in keys])
+
+    def invalidate_tag(self, tag):
+        """Removes every entry stored with `tag`. Returns the number of entries removed."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            keys = [row[0] for row in conn.execute(
+                "SELECT key FROM cache_tags WHERE namespace = ? AND tag = ?", (self.namespace, tag)
+            )]
+            self._delete_keys(conn, keys)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return len(keys)
+
+    def clear(self):
+        """Removes every entry in this namespace."""
+        conn = self._connection()
+        conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+        conn.execute("DELETE FROM cache_tags WHERE namespace = ?", (self.namespace,))
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        conn = self._connection()
+        entries = conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        with self._stats_lock:
+            return {
+                "namespace": self.namespace,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,61 @@
+import importlib
+import os
+import threading
+import time
+
+from metrics import observe
+
+# Heavy modules the app only needs after the first interaction (background
+# removal, Gemini, similarity search, outfit suggestions). They are imported
+# lazily where they are used; warm-up pulls them in on a background thread
+# once the first page is on screen, so the first click does not pay for them.
+WARMUP_MODULES = (
+    "numpy",
+    "embeddings",
+    "color_analysis",
+    "outfit_generator",
+    "google.generativeai",
+    "rembg",
+)
+# WARMUP=0 disables the warm-up thread (e.g. for cold-start benchmarks)
+WARMUP_ENABLED = os.environ.get("WARMUP", "1") != "0"
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+# Modules the warm-up has finished importing
+_loaded = set()
+
+
+def _warm_up(modules):
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Warm-up import of {name} failed: {e}")
+            continue
+        observe("warmup_import_seconds", time.perf_counter() - started, module=name)
+        _loaded.add(name)
+
+
+def start_warmup(modules=WARMUP_MODULES):
+    """
+    Imports `modules` on a daemon thread, once per process. Safe to call
+    on every Streamlit rerun. Returns the thread, or None when disabled.
+    """
+    global _warmup_thread
+    if not WARMUP_ENABLED:
+        return None
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm_up, args=(tuple(modules),), name="warmup", daemon=True)
+            _warmup_thread.start()
+        return _warmup_thread
+
+
+def is_loaded(name):
+    """
+    True once the warm-up has finished importing module `name`, so using
+    it will not block the current rerun on the import.
+    """
+    return name in _loaded
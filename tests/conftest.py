@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The modules live in the repository root (there is no package to install)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def wardrobe(tmp_path, monkeypatch):
+    """An empty default closet (database, images, embedding index) in tmp_path."""
+    import data_management
+    import embeddings
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_management, "WARDROBE_DB", str(tmp_path / "wardrobe.db"))
+    monkeypatch.setattr(data_management, "WARDROBE_FILE", str(tmp_path / "wardrobe_data.json"))
+    monkeypatch.setattr(embeddings, "_indexes", {})
+    with data_management.use_closet(data_management.DEFAULT_CLOSET):
+        yield tmp_path
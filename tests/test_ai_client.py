@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ai_client import AIClient, AIClientError, _TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class ApiError(Exception):
+    """Like google.api_core errors: the HTTP status is in .code."""
+
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeModel:
+    """generate_content answers 'echo: <prompt>' after raising the queued errors, one per call."""
+
+    def __init__(self, errors=(), release=None):
+        self.calls = []
+        self.errors = list(errors)
+        self.release = release
+        self.lock = threading.Lock()
+
+    def generate_content(self, contents, request_options=None):
+        with self.lock:
+            self.calls.append((time.monotonic(), contents))
+            error = self.errors.pop(0) if self.errors else None
+        if self.release is not None:
+            self.release.wait(5)
+        if error is not None:
+            raise error
+        return FakeResponse(f"echo: {contents}")
+
+
+def make_client(model, **kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("backoff_max", 0.05)
+    return AIClient(model_factory=lambda model_name: model, **kwargs)
+
+
+def test_token_bucket_limits_the_request_rate():
+    model = FakeModel()
+    # 600/minute = one request every 0.1 s; with one request at a time the burst is 1
+    client = make_client(model, max_concurrency=1, requests_per_minute=600)
+    started = time.monotonic()
+    for i in range(4):
+        client.generate(f"prompt {i}")
+    assert time.monotonic() - started >= 0.25
+    gaps = [later[0] - earlier[0] for earlier, later in zip(model.calls, model.calls[1:])]
+    assert min(gaps) >= 0.08
+
+
+def test_rate_zero_means_unlimited():
+    client = make_client(FakeModel(), requests_per_minute=0)
+    started = time.monotonic()
+    for i in range(20):
+        client.generate(f"prompt {i}")
+    assert time.monotonic() - started < 1.0
+    with pytest.raises(ValueError):
+        _TokenBucket(-1, 1)
+    with pytest.raises(ValueError):
+        AIClient(model_factory=lambda model_name: FakeModel(), requests_per_minute=-5)
+
+
+def test_token_bucket_allows_a_burst_up_to_capacity():
+    bucket = _TokenBucket(rate_per_second=1.0, capacity=3)
+
+    async def take(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(take(3))
+    assert time.monotonic() - started < 0.1
+
+
+def test_identical_in_flight_requests_are_coalesced():
+    release = threading.Event()
+    model = FakeModel(release=release)
+    client = make_client(model, requests_per_minute=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.generate("same prompt"))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while client.stats()["coalesced"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["echo: same prompt"] * 3
+    assert len(model.calls) == 1
+    stats = client.stats()
+    assert (stats["requests"], stats["coalesced"], stats["in_flight"]) == (3, 2, 0)
+
+    # Once finished, the same request is sent again (coalescing is not a cache)
+    client.generate("same prompt")
+    assert len(model.calls) == 2
+
+
+def test_retryable_errors_are_retried():
+    model = FakeModel(errors=[ApiError(503), ApiError(429)])
+    client = make_client(model, requests_per_minute=0)
+    assert client.generate("prompt") == "echo: prompt"
+    assert len(model.calls) == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_gives_up_after_max_retries_and_on_other_errors():
+    model = FakeModel(errors=[ApiError(500)] * 5)
+    client = make_client(model, requests_per_minute=0, max_retries=2)
+    with pytest.raises(AIClientError):
+        client.generate("prompt")
+    assert len(model.calls) == 3
+
+    model = FakeModel(errors=[ApiError(400)])
+    client = make_client(model, requests_per_minute=0)
+    with pytest.raises(AIClientError):
+        client.generate("prompt")
+    assert len(model.calls) == 1
+    assert client.stats()["failures"] == 1
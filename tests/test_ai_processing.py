@@ -0,0 +1,128 @@
+import json
+
+import pytest
+from PIL import Image
+
+import ai_client
+import ai_processing
+from persistent_cache import PersistentCache
+
+CLASSIFICATION = {"type": "Top", "color": "Light Blue", "style": "Plain Shirt"}
+
+
+class FakeGenerativeModel:
+    """Stands in for genai.GenerativeModel; records every request."""
+
+    calls = []
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def generate_content(self, contents, request_options=None):
+        FakeGenerativeModel.calls.append((self.model_name, contents[0]))
+
+        class Response:
+            text = "```json\n" + json.dumps(CLASSIFICATION) + "\n```"
+
+        return Response()
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch, tmp_path):
+    import google.generativeai as genai
+
+    FakeGenerativeModel.calls = []
+    monkeypatch.setattr(genai, "GenerativeModel", FakeGenerativeModel)
+    monkeypatch.setattr(genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(ai_processing, "_classification_cache",
+                        PersistentCache("classify", db_path=str(tmp_path / "ai_cache.db")))
+    previous = ai_client.get_ai_client() if ai_client._client is not None else None
+    ai_client.set_ai_client(ai_client.AIClient(backoff_base=0.01))
+    yield FakeGenerativeModel.calls
+    ai_client.set_ai_client(previous)
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "shirt.png"
+    Image.new("RGB", (320, 480), (120, 160, 210)).save(path)
+    return str(path)
+
+
+def test_classify_item_caches_by_image_content(fake_gemini, image_path, tmp_path):
+    assert ai_processing.classify_item(image_path) == CLASSIFICATION
+    assert ai_processing.classify_item(image_path) == CLASSIFICATION
+    assert len(fake_gemini) == 1
+    assert ai_processing.get_classification_cache_stats()["hits"] == 1
+
+    # The same photo under another name is the same content
+    copy_path = tmp_path / "copy.png"
+    Image.open(image_path).save(copy_path)
+    assert ai_processing.classify_item(str(copy_path)) == CLASSIFICATION
+    assert len(fake_gemini) == 1
+
+
+def test_changed_prompt_misses_cache(fake_gemini, image_path, monkeypatch):
+    ai_processing.classify_item(image_path)
+    monkeypatch.setattr(ai_processing, "CLASSIFY_PROMPT", ai_processing.CLASSIFY_PROMPT + " Be brief.")
+    ai_processing.classify_item(image_path)
+    assert len(fake_gemini) == 2
+    assert fake_gemini[1][1].endswith("Be brief.")
+
+
+def test_changed_model_misses_cache(fake_gemini, image_path, monkeypatch):
+    ai_processing.classify_item(image_path)
+    monkeypatch.setattr(ai_processing, "CLASSIFY_MODEL_NAME", "gemini-test-model")
+    ai_processing.classify_item(image_path)
+    assert [model_name for model_name, _ in fake_gemini] == [ai_processing.DEFAULT_MODEL_NAME, "gemini-test-model"]
+
+
+def test_background_removal_sends_paths_or_encoded_bytes_to_workers(image_path, tmp_path, monkeypatch):
+    import io
+    import pickle
+
+    import rembg
+
+    prepared = ai_processing.prepare_image(image_path)
+    assert ai_processing._pool_source(prepared) == image_path
+    assert ai_processing._pool_source(image_path) == image_path
+
+    uploaded = ai_processing.prepare_image(open(image_path, "rb").read())
+    payload = ai_processing._pool_source(uploaded)
+    assert isinstance(payload, bytes)
+    assert len(pickle.dumps(payload)) < len(pickle.dumps(uploaded.image)) / 10
+
+    # The worker job decodes the payload itself
+    monkeypatch.setattr(rembg, "remove", lambda image, session=None: image.convert("RGBA"))
+    monkeypatch.setattr(ai_processing, "get_rembg_session", lambda: None)
+    output_path = str(tmp_path / "nobg.png")
+    assert ai_processing._background_worker_job(payload, output_path) == output_path
+    with Image.open(output_path) as result:
+        assert (result.size, result.mode) == ((320, 480), "RGBA")
+    with Image.open(io.BytesIO(payload)) as decoded:
+        assert decoded.size == (320, 480)
+
+
+def test_finished_background_jobs_are_forgotten(monkeypatch):
+    from concurrent.futures import Future
+
+    class InlinePool:
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_result(args[-1])
+            return future
+
+    monkeypatch.setattr(ai_processing, "_get_background_pool", lambda: InlinePool())
+    monkeypatch.setattr(ai_processing, "_background_jobs", {})
+    monkeypatch.setattr(ai_processing, "_background_finished_at", {})
+
+    polled = ai_processing.submit_background_removal("in.png", "polled.png")
+    assert ai_processing.get_background_removal_status(polled) == {"status": "done", "output_path": "polled.png"}
+    assert ai_processing.get_background_removal_status(polled) == {"status": "unknown"}
+
+    abandoned = ai_processing.submit_background_removal("in.png", "abandoned.png")
+    monkeypatch.setattr(ai_processing, "BACKGROUND_JOB_TTL", -1)
+    collected = ai_processing.submit_background_removal("in.png", "collected.png")
+    assert abandoned not in ai_processing._background_jobs
+    assert ai_processing.wait_for_background_removal(collected) == "collected.png"
+    assert ai_processing._background_jobs == {} and ai_processing._background_finished_at == {}
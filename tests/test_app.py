@@ -0,0 +1,39 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+import data_management
+import startup
+
+streamlit_testing = pytest.importorskip("streamlit.testing.v1")
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def app(wardrobe, monkeypatch):
+    """The Streamlit app, run against the empty closet of the `wardrobe` fixture."""
+    # No background imports of rembg/Gemini: they would outlive the test
+    monkeypatch.setattr(startup, "WARMUP_ENABLED", False)
+    # AppTest leaves app.py registered as __main__, which later spawned processes would re-run
+    monkeypatch.setitem(sys.modules, "__main__", sys.modules["__main__"])
+    shutil.copy(os.path.join(APP_DIR, "style.css"), wardrobe / "style.css")
+    return streamlit_testing.AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=60)
+
+
+def test_editing_style_keeps_a_color_group_outside_the_palette(app):
+    item = {"type": "Top", "color": "seafoam", "color_name": "Seafoam", "style": "Casual"}
+    data_management.save_item_to_wardrobe(item)
+    app.session_state["editing_item"] = {"id": item["id"], "version": item["version"]}
+    app.run()
+    form_key = f"{item['id']}_{item['version']}"
+    assert app.selectbox(key=f"edit_color_name_{form_key}").value == "Seafoam"
+
+    app.text_input(key=f"edit_style_{form_key}").set_value("Formal")
+    next(button for button in app.button if button.label == "Save Changes").click().run()
+    assert not app.exception
+
+    stored = data_management.get_item(item["id"])
+    assert (stored["style"], stored["color"], stored["color_name"]) == ("Formal", "seafoam", "Seafoam")
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+import bulk_import
+import data_management
+
+CLASSIFICATION = {"type": "Top", "color": "Black", "style": "Plain Shirt"}
+
+
+def _copy_as_png(source_path, output_path):
+    # Stands in for rembg
+    with Image.open(source_path) as image:
+        image.convert("RGBA").save(output_path, "PNG")
+    return output_path
+
+
+@pytest.fixture
+def fake_stages(monkeypatch):
+    # Forking the test process (with the threads earlier tests left running) can deadlock
+    monkeypatch.setattr(bulk_import, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(bulk_import, "_background_worker_init", lambda: None)
+    monkeypatch.setattr(bulk_import, "_background_worker_job", _copy_as_png)
+    monkeypatch.setattr(bulk_import, "classify_item", lambda path: dict(CLASSIFICATION))
+
+
+def test_crash_during_commit_resumes_under_the_same_ids(wardrobe, fake_stages, monkeypatch):
+    source = wardrobe / "photos"
+    source.mkdir()
+    for n, color in enumerate(((200, 0, 0), (0, 200, 0))):
+        Image.new("RGB", (32, 32), color).save(source / f"photo{n}.jpg")
+
+    def crash(items):
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr(bulk_import, "save_items_to_wardrobe", crash)
+    with pytest.raises(RuntimeError):
+        bulk_import.import_closet(str(source), workers=1)
+    assert data_management.load_wardrobe() == []
+
+    monkeypatch.setattr(bulk_import, "save_items_to_wardrobe", data_management.save_items_to_wardrobe)
+    summary = bulk_import.import_closet(str(source), workers=1)
+    assert summary["imported"] == 2
+    items = data_management.load_wardrobe()
+    assert sorted(item["id"] for item in items) == ["CLO001", "CLO002"]
+    assert all(item["image_path"].endswith(f"{item['id']}.png") for item in items)
+
+    assert bulk_import.import_closet(str(source), workers=1)["skipped_already_imported"] == 2
+    assert len(data_management.load_wardrobe()) == 2
@@ -0,0 +1,71 @@
+import json
+
+import data_management
+
+
+def _save(**fields):
+    item = {"type": "Top", "color": "Black", "style": "Casual", **fields}
+    data_management.save_item_to_wardrobe(item)
+    return item
+
+
+def test_update_color_recomputes_color_name(wardrobe):
+    item = _save()
+    assert item["color_name"] == "Black"
+
+    updated = data_management.update_item(item["id"], expected_version=item["version"], color="navy blue")
+    assert (updated["color"], updated["color_name"]) == ("navy blue", "Navy")
+    items, total = data_management.query_wardrobe(colors=["Navy"])
+    assert ([found["id"] for found in items], total) == ([item["id"]], 1)
+    assert data_management.query_wardrobe(colors=["Black"])[1] == 0
+
+
+def test_color_name_only_takes_palette_colors(wardrobe):
+    item = _save()
+    for color, color_name in (("shredded denim", "Denim Blue"), ("tangerine", None), ("seafoam", None)):
+        item = data_management.update_item(item["id"], color=color)
+        assert item["color_name"] == color_name
+    assert data_management.get_wardrobe_facets()["color"] == {}
+
+
+def test_relabel_color_recomputes_color_name(wardrobe):
+    first, second = _save(), _save(type="Bottom")
+    assert data_management.relabel_items("color", "Black", "light blue") == 2
+    for item_id in (first["id"], second["id"]):
+        item = data_management.get_item(item_id)
+        assert (item["color"], item["color_name"]) == ("light blue", "Light Blue")
+    assert data_management.query_wardrobe(colors=["Light Blue"])[1] == 2
+
+
+def test_sql_facets_match_the_column_facets(wardrobe):
+    for item_type, color in (("Top", "Black"), ("Bottom", "navy blue"), ("Top", "White"), ("Top", "black")):
+        _save(type=item_type, color=color)
+
+    column_facets = data_management.get_wardrobe_facet_counts()
+    facets = data_management.get_wardrobe_facets()
+    assert facets == {"type": column_facets["type"], "color": column_facets["color"]}
+    assert facets["color"] == {"Black": 2, "Navy": 1, "White": 1}
+
+    assert data_management.count_wardrobe_items() == 4
+    assert data_management.count_wardrobe_items(types=["Top"], colors=["Black"]) == 2
+    assert data_management.count_wardrobe_items(style_contains="casual") == 4
+
+
+def test_migration_keeps_items_with_duplicate_ids(wardrobe, capsys):
+    legacy = [
+        {"id": "CLO001", "type": "Top", "color": "Black", "style": "Casual"},
+        {"id": "CLO002", "type": "Bottom", "color": "Navy", "style": "Jeans"},
+        {"id": "CLO001", "type": "Shoes", "color": "White", "style": "Sneakers"},
+    ]
+    (wardrobe / "wardrobe_data.json").write_text(json.dumps(legacy))
+
+    items = data_management.load_wardrobe()
+    assert sorted((item["id"], item["type"]) for item in items) == [
+        ("CLO001", "Top"), ("CLO002", "Bottom"), ("CLO003", "Shoes"),
+    ]
+    output = capsys.readouterr().out
+    assert "Berhasil migrasi 3 item" in output
+    assert "CLO001" in output and "CLO003" in output
+    assert (wardrobe / "wardrobe_data.json.migrated").exists()
+    # The ID sequence continues after the re-assigned ID
+    assert data_management.get_next_item_ids(1) == ["CLO004"]
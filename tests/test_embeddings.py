@@ -0,0 +1,84 @@
+import json
+import multiprocessing
+
+import numpy as np
+
+import embeddings
+
+
+def _unit_vector(seed):
+    vector = np.random.default_rng(seed).random(embeddings.EMBEDDING_DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _add_items(directory, item_ids, start):
+    index = embeddings.EmbeddingIndex(
+        str(directory / embeddings.EMBEDDINGS_FILE), str(directory / embeddings.EMBEDDINGS_DB_FILE)
+    )
+    start.wait()
+    for item_id in item_ids:
+        index.add(item_id, _unit_vector(int(item_id[3:])))
+
+
+def _open_index(directory):
+    return embeddings.EmbeddingIndex(
+        str(directory / embeddings.EMBEDDINGS_FILE),
+        str(directory / embeddings.EMBEDDINGS_DB_FILE),
+        str(directory / embeddings.EMBEDDINGS_IDS_FILE),
+    )
+
+
+def test_concurrent_processes_keep_every_vector(tmp_path):
+    # Enough items per process to grow the matrix past its initial capacity
+    count = embeddings._INITIAL_CAPACITY // 2 + 50
+    ids_a = [f"CLO{n:04d}" for n in range(1, count + 1)]
+    ids_b = [f"CLO{n:04d}" for n in range(count + 1, 2 * count + 1)]
+    ctx = multiprocessing.get_context("spawn")
+    start = ctx.Event()
+    workers = [ctx.Process(target=_add_items, args=(tmp_path, ids, start)) for ids in (ids_a, ids_b)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join(timeout=120)
+        assert worker.exitcode == 0
+
+    index = _open_index(tmp_path)
+    assert len(index) == 2 * count
+    for item_id in (ids_a[0], ids_b[0], ids_a[-1], ids_b[-1]):
+        vector = _unit_vector(int(item_id[3:]))
+        np.testing.assert_allclose(index.get_vector(item_id), vector, rtol=1e-6)
+        best_id, score = index.search(vector, k=1)[0]
+        assert best_id == item_id
+        assert score > 0.999
+
+
+def test_sees_changes_from_another_instance(tmp_path):
+    writer, reader = _open_index(tmp_path), _open_index(tmp_path)
+    writer.add("CLO001", _unit_vector(1))
+    assert "CLO001" in reader
+    assert reader.search(_unit_vector(1), k=1)[0][0] == "CLO001"
+
+    writer.remove("CLO001")
+    assert "CLO001" not in reader
+    assert reader.search(_unit_vector(1), k=1) == []
+
+
+def test_migrates_legacy_id_sidecar(tmp_path):
+    matrix = np.lib.format.open_memmap(
+        str(tmp_path / embeddings.EMBEDDINGS_FILE), mode="w+", dtype=np.float32,
+        shape=(embeddings._INITIAL_CAPACITY, embeddings.EMBEDDING_DIM),
+    )
+    matrix[0], matrix[2] = _unit_vector(1), _unit_vector(3)
+    matrix.flush()
+    del matrix
+    (tmp_path / embeddings.EMBEDDINGS_IDS_FILE).write_text(json.dumps(["CLO001", None, "CLO003"]))
+
+    index = _open_index(tmp_path)
+    assert len(index) == 2
+    assert index.search(_unit_vector(3), k=1)[0][0] == "CLO003"
+    assert not (tmp_path / embeddings.EMBEDDINGS_IDS_FILE).exists()
+
+    index.add("CLO004", _unit_vector(4))
+    assert index.search(_unit_vector(4), k=1)[0][0] == "CLO004"
+    assert index.search(_unit_vector(1), k=1)[0][0] == "CLO001"
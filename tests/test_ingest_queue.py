@@ -0,0 +1,24 @@
+import os
+import time
+
+from ingest_queue import LEGACY_UPLOAD_DIR, IngestQueue
+
+
+def _touch(path, age):
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b"upload")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_sweep_cleans_the_legacy_upload_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = IngestQueue(db_path=str(tmp_path / "ingest_jobs.db"), upload_dir=str(tmp_path / "ingest_uploads"))
+    stale, fresh = tmp_path / "ingest_uploads" / "upload_a.tmp", tmp_path / "ingest_uploads" / "upload_b.tmp"
+    legacy_stale, legacy_fresh = tmp_path / LEGACY_UPLOAD_DIR / "shirt.jpg", tmp_path / LEGACY_UPLOAD_DIR / "pants.jpg"
+    for path, age in ((stale, 7200), (fresh, 0), (legacy_stale, 7200), (legacy_fresh, 0)):
+        _touch(path, age)
+
+    assert queue.sweep_uploads(ttl=3600) == 2
+    assert not stale.exists() and not legacy_stale.exists()
+    assert fresh.exists() and legacy_fresh.exists()
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+import ai_client
+import logika_styling
+from data_management import use_closet
+from persistent_cache import PersistentCache
+
+WEATHER = "Temperature: 24°C, Condition: Scattered clouds."
+
+
+class FakeClient:
+    """Stands in for the shared AIClient: counts generate() calls and answers valid feedback JSON."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, model_name=None, name=None):
+        self.prompts.append(prompt)
+        return json.dumps({"rating": 8, "feedback": "Works well.", "saran": "Nice."})
+
+
+@pytest.fixture
+def feedback_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(logika_styling, "_feedback_cache",
+                        PersistentCache("ootd_feedback", db_path=str(tmp_path / "ai_cache.db")))
+    client = FakeClient()
+    previous = ai_client._client
+    ai_client.set_ai_client(client)
+    yield client
+    ai_client.set_ai_client(previous)
+
+
+def _outfit(prefix):
+    return [
+        {"id": f"{prefix}1", "type": "Top", "color": "Black", "style": "Casual"},
+        {"id": f"{prefix}2", "type": "Bottom", "color": "White", "style": "Casual"},
+    ]
+
+
+def test_feedback_is_cached_per_closet(feedback_client):
+    with use_closet("alpha"):
+        logika_styling.get_ootd_feedback(_outfit("A"), WEATHER)
+        logika_styling.get_ootd_feedback(list(reversed(_outfit("A"))), WEATHER)
+    assert len(feedback_client.prompts) == 1
+
+    # Same attributes in another closet: its own entry, tagged with its own items
+    with use_closet("beta"):
+        logika_styling.get_ootd_feedback(_outfit("B"), WEATHER)
+    assert len(feedback_client.prompts) == 2
+
+    logika_styling.on_wardrobe_changes([{"op": "update", "item_id": "B1", "closet": "beta"}])
+    with use_closet("beta"):
+        logika_styling.get_ootd_feedback(_outfit("B"), WEATHER)
+    assert len(feedback_client.prompts) == 3
+    with use_closet("alpha"):
+        logika_styling.get_ootd_feedback(_outfit("A"), WEATHER)
+    assert len(feedback_client.prompts) == 3
+
+
+class FailingClient:
+    """Stands in for the shared AIClient when Gemini is unreachable."""
+
+    def generate(self, prompt, model_name=None, name=None):
+        raise RuntimeError("429 Resource exhausted")
+
+
+def test_quick_feedback_falls_back_to_the_local_score_when_gemini_fails(feedback_client):
+    unrecognized = [
+        {"id": "X1", "type": "Top", "color": "Zorblax", "style": "Casual"},
+        {"id": "X2", "type": "Bottom", "color": "Quibble", "style": "Casual"},
+    ]
+    # Low local confidence: Gemini is asked and its answer is used
+    assert logika_styling.get_quick_ootd_feedback(unrecognized, WEATHER)["feedback"] == "Works well."
+
+    ai_client.set_ai_client(FailingClient())
+    logika_styling.clear_feedback_cache()
+    result = logika_styling.get_quick_ootd_feedback(unrecognized, WEATHER)
+    assert result["source"] == "local"
+    assert result["low_confidence"] is True
+    assert result["rating"] > 0
+    assert result["confidence"] < logika_styling.LOCAL_FEEDBACK_MIN_CONFIDENCE
@@ -0,0 +1,58 @@
+import random
+
+from outfit_generator import suggest_outfits
+
+WARM_DAY = "Temperature: 24°C, Condition: Scattered clouds."
+
+
+def item(item_id, item_type, color, style="Plain"):
+    return {"id": item_id, "type": item_type, "color": color, "style": style}
+
+
+def test_dress_base_is_not_pruned_by_the_color_bound():
+    # Top+Bottom+Shoes: blue/green pair -> 0.87. Black dress alone has no
+    # color pair (0.6), but with white shoes it reaches 0.905 and must win.
+    wardrobe = [
+        item("T1", "Top", "Blue"),
+        item("B1", "Bottom", "Olive"),
+        item("D1", "Dress", "Black", "Midi Dress"),
+        item("S1", "Shoes", "White", "Sneakers"),
+    ]
+    best = suggest_outfits(wardrobe, WARM_DAY, top_k=1)
+    assert [piece["id"] for piece in best[0]["items"]] == ["D1", "S1"]
+    assert best[0]["score"] == 0.905
+
+    ranked = suggest_outfits(wardrobe, WARM_DAY, top_k=2)
+    assert [suggestion["score"] for suggestion in ranked] == [0.905, 0.87]
+
+
+def test_early_stop_matches_the_full_ranking():
+    rng = random.Random(7)
+    colors = ["Black", "White", "Navy", "Red", "Blue", "Olive", "Pink", "Mustard", "Silver", "Unknown"]
+    wardrobe = [
+        item(f"{item_type[0]}{i}", item_type, rng.choice(colors))
+        for item_type in ("Top", "Bottom", "Dress", "Outerwear", "Shoes") for i in range(4)
+    ]
+    for weather in (WARM_DAY, "Temperature: 8°C, Condition: Light rain.", None):
+        everything = [suggestion["score"] for suggestion in suggest_outfits(wardrobe, weather, top_k=100)]
+        for top_k in (1, 3, 5):
+            scores = [suggestion["score"] for suggestion in suggest_outfits(wardrobe, weather, top_k=top_k)]
+            assert scores == everything[:top_k]
+
+
+def test_outerwear_on_a_cold_day_is_not_lost_to_pruning():
+    # Far more bases than any top_k: light tops only reach their best score with a coat
+    cold_day = "Temperature: 5°C, Condition: Overcast clouds."
+    rng = random.Random(11)
+    colors = ["Black", "White", "Navy", "Red", "Blue", "Olive", "Pink", "Mustard", "Beige", "Unknown"]
+    styles = ["Plain", "Linen Shirt", "Wool Sweater", "Tank Top", "Knit"]
+    wardrobe = [
+        item(f"{item_type[0]}{i}", item_type, rng.choice(colors), rng.choice(styles))
+        for item_type, count in (("Top", 30), ("Bottom", 20), ("Dress", 5), ("Outerwear", 3), ("Shoes", 4))
+        for i in range(count)
+    ]
+    everything = suggest_outfits(wardrobe, cold_day, top_k=10_000)
+    for top_k in (1, 5, 20):
+        ranked = suggest_outfits(wardrobe, cold_day, top_k=top_k)
+        assert [suggestion["score"] for suggestion in ranked] == [s["score"] for s in everything[:top_k]]
+    assert any(piece["type"] == "Outerwear" for piece in everything[0]["items"])
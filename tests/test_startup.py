@@ -0,0 +1,10 @@
+import startup
+
+
+def test_is_loaded_once_the_warm_up_imported_the_module(monkeypatch):
+    monkeypatch.setattr(startup, "_loaded", set())
+    assert not startup.is_loaded("json")  # imported, but not by the warm-up
+
+    startup._warm_up(("json", "no_such_module_for_warmup"))
+    assert startup.is_loaded("json")
+    assert not startup.is_loaded("no_such_module_for_warmup")
@@ -0,0 +1,53 @@
+import os
+
+from PIL import Image
+
+import data_management
+import image_store
+from thumbnails import get_thumbnail_path
+
+
+def _save_item_with_image(directory):
+    image_path = str(directory / "shirt.png")
+    Image.new("RGB", (64, 64), (20, 40, 200)).save(image_path)
+    item = {"type": "Top", "color": "Blue", "style": "Casual", "image_path": image_path}
+    data_management.save_item_to_wardrobe(item)
+    assert os.path.exists(item["thumbnail_path"])
+    return item
+
+
+def test_lazy_thumbnail_does_not_undo_a_concurrent_edit(wardrobe):
+    stale = _save_item_with_image(wardrobe)
+    os.remove(stale["thumbnail_path"])
+    data_management.update_item(stale["id"], style="Formal")
+
+    # The grid still holds the dict from before the edit: the thumbnail is shown but not recorded
+    assert os.path.exists(get_thumbnail_path(stale))
+    stored = data_management.get_item(stale["id"])
+    assert stored["style"] == "Formal"
+
+
+
+def test_lazy_thumbnail_is_recorded_on_a_current_item(wardrobe):
+    item = _save_item_with_image(wardrobe)
+    thumb_path = item["thumbnail_path"]
+    # Like an item saved before thumbnails existed
+    legacy = data_management.update_item(item["id"], thumbnail_path=None)
+
+    assert get_thumbnail_path(legacy) == thumb_path
+    stored = data_management.get_item(item["id"])
+    assert stored["thumbnail_path"] == thumb_path
+    assert stored["version"] == legacy["version"]  # legacy was refreshed with the written item
+    assert stored["style"] == "Casual"
+
+
+def test_fsck_repair_only_writes_the_thumbnail(wardrobe):
+    item = _save_item_with_image(wardrobe)
+    os.remove(item["thumbnail_path"])
+    data_management.update_item(item["id"], style="Formal")
+
+    report = image_store.fsck(repair=True)
+    assert report["missing_thumbnails"] == [item["id"]]
+    stored = data_management.get_item(item["id"])
+    assert os.path.exists(stored["thumbnail_path"])
+    assert stored["style"] == "Formal"
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import logika_styling
+
+
+class FakeOpenWeatherMap(BaseHTTPRequestHandler):
+    """Answers like OpenWeatherMap's /weather endpoint, or with a 500 while `failing` is set."""
+
+    requests = []
+    failing = False
+
+    def do_GET(self):
+        FakeOpenWeatherMap.requests.append(self.path)
+        if FakeOpenWeatherMap.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({"main": {"temp": 24.0}, "weather": [{"description": "scattered clouds"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def weather_server(monkeypatch):
+    FakeOpenWeatherMap.requests = []
+    FakeOpenWeatherMap.failing = False
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenWeatherMap)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(logika_styling, "OPENWEATHER_BASE_URL", f"http://127.0.0.1:{server.server_port}/weather")
+    monkeypatch.setattr(logika_styling, "OPENWEATHER_API_KEY", "test-key")
+    logika_styling.clear_weather_cache()
+    yield FakeOpenWeatherMap
+    server.shutdown()
+    server.server_close()
+    logika_styling.clear_weather_cache()
+
+
+def test_weather_is_cached_per_city(weather_server):
+    first = logika_styling.get_weather_data("Jakarta")
+    assert first == "Temperature: 24.0°C, Condition: Scattered clouds."
+    # Same city, different spelling: served from the cache
+    assert logika_styling.get_weather_data("  jakarta ") == first
+    assert len(weather_server.requests) == 1
+    assert "q=Jakarta" in weather_server.requests[0]
+
+    logika_styling.get_weather_data("Bandung")
+    assert len(weather_server.requests) == 2
+    stats = logika_styling.get_weather_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+
+def test_weather_cache_expires_after_ttl(weather_server, monkeypatch):
+    monkeypatch.setattr(logika_styling, "WEATHER_CACHE_TTL", 0.2)
+    logika_styling.get_weather_data("Jakarta")
+    logika_styling.get_weather_data("Jakarta")
+    assert len(weather_server.requests) == 1
+    time.sleep(0.3)
+    logika_styling.get_weather_data("Jakarta")
+    assert len(weather_server.requests) == 2
+
+
+def test_stale_weather_is_served_when_the_provider_fails(weather_server, monkeypatch):
+    monkeypatch.setattr(logika_styling, "WEATHER_CACHE_TTL", 0.2)
+    first = logika_styling.get_weather_data("Jakarta")
+    time.sleep(0.3)
+    weather_server.failing = True
+    assert logika_styling.get_weather_data("Jakarta") == first
+    assert logika_styling.get_weather_cache_stats()["stale_served"] == 1
+    # A city that was never fetched falls back to the default
+    assert logika_styling.get_weather_data("Surabaya") == logika_styling.DEFAULT_WEATHER
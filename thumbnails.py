@@ -0,0 +1,133 @@
+import hashlib
+import os
+
+from PIL import Image
+
+from metrics import timed
+
+# Grid thumbnails: fixed max size, stored next to the originals
+# (THUMBNAIL_DIR for the default closet, <closet images>/thumbs for the others)
+THUMBNAIL_SIZE = 256
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_DIR = os.path.join("wardrobe_images", "thumbs")
+
+
+def get_thumbnail_dir():
+    from data_management import get_closet_dir, get_image_dir
+
+    return THUMBNAIL_DIR if get_closet_dir() is None else os.path.join(get_image_dir(), "thumbs")
+
+
+def _content_hash(image_path):
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+@timed()
+def create_thumbnail(image_path):
+    """
+    Creates (or reuses) the thumbnail of an image and returns its path.
+    Thumbnails are content-addressed, so identical images share one file
+    and an existing thumbnail is never re-encoded.
+    """
+    thumbnail_dir = get_thumbnail_dir()
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    extension = THUMBNAIL_FORMAT.lower()
+    thumb_path = os.path.join(thumbnail_dir, f"{_content_hash(image_path)}_{THUMBNAIL_SIZE}.{extension}")
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    with Image.open(image_path) as img:
+        img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, THUMBNAIL_FORMAT, quality=80, method=4)
+    os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+
+@timed()
+def get_thumbnail_path(item):
+    """
+    Returns the thumbnail to show for an item in the closet grid.
+    Missing thumbnails (items saved before thumbnails existed) are
+    created on first view and recorded on the item (see set_item_thumbnail).
+    Returns None if the item has no image file.
+    """
+    thumb_path = item.get("thumbnail_path")
+    if thumb_path and os.path.exists(thumb_path):
+        return thumb_path
+
+    image_path = item.get("image_path")
+    if not image_path or not os.path.exists(image_path):
+        return None
+
+    try:
+        thumb_path = create_thumbnail(image_path)
+    except Exception as e:
+        print(f"Error creating thumbnail for {image_path}: {e}")
+        return image_path
+    set_item_thumbnail(item, thumb_path)
+    return thumb_path
+
+
+def set_item_thumbnail(item, thumb_path):
+    """
+    Records thumb_path (None to clear it) on the stored item, only if the
+    item is still at the version it was read at: `item` may come from an
+    earlier render, and only the thumbnail field is written, so a concurrent
+    edit is never undone. Returns False if the item changed or is gone
+    (the thumbnail is recorded on a later view instead).
+    """
+    from data_management import ItemVersionConflict, update_item
+
+    if not item.get("id"):
+        return False
+    try:
+        updated = update_item(item["id"], expected_version=item.get("version"), thumbnail_path=thumb_path)
+    except ItemVersionConflict as e:
+        print(f"Thumbnail not recorded: {e}")
+        return False
+    if updated is None:
+        return False
+    item.update(updated)
+    return True
+
+
+def delete_thumbnail(item):
+    """Removes an item's thumbnail unless another item in the closet still uses the same file."""
+    from data_management import is_thumbnail_in_use
+
+    thumb_path = item.get("thumbnail_path")
+    if not thumb_path or not os.path.exists(thumb_path):
+        return
+    if is_thumbnail_in_use(thumb_path):
+        return
+    try:
+        os.remove(thumb_path)
+    except Exception as e:
+        print(f"Failed to delete thumbnail {thumb_path}: {e}")
+
+
+def on_wardrobe_changes(events):
+    """Change feed consumer (see data_management.subscribe): drops thumbnails of deleted items."""
+    for event in events:
+        delete_thumbnail(event["item"] or {})
+
+
+def backfill_thumbnails(wardrobe):
+    """Creates thumbnails for every item that does not have one yet. Returns the count."""
+    created = 0
+    for item in wardrobe:
+        if not item.get("thumbnail_path") or not os.path.exists(item["thumbnail_path"]):
+            if get_thumbnail_path(item):
+                created += 1
+    return created
+
+
+if __name__ == "__main__":
+    from data_management import load_wardrobe
+
+    print(f"Created {backfill_thumbnails(load_wardrobe())} thumbnails.")
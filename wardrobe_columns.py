@@ -0,0 +1,229 @@
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+# Tampilan ringkas (read-only) seluruh isi lemari untuk facet, hitungan dan
+# filter: satu array NumPy per kolom, bukan satu dict per item. 'type', 'color'
+# (color_name kanonik) dan 'style' di-dictionary-encode: setiap string unik
+# disimpan sekali dan kolomnya berisi kode integer kecil.
+CATEGORY_COLUMNS = ("type", "color", "style")
+
+# File snapshot: magic, panjang header (uint64), header JSON, lalu isi array
+# mentah, masing-masing mulai di offset kelipatan 8 byte. Saat dimuat, file
+# di-mmap dan array dibungkus langsung tanpa disalin.
+SNAPSHOT_MAGIC = b"WRDCOL1\n"
+_HEADER_LENGTH = struct.Struct("<Q")
+_ALIGNMENT = 8
+
+
+def _encode(values):
+    """Dictionary-encode deretan string (boleh None) -> (array kode, daftar nilai unik)."""
+    index = {}
+    codes = [index.setdefault(value, len(index)) for value in values]
+    dictionary = [sys.intern(value) if isinstance(value, str) else value for value in index]
+    return np.array(codes, dtype=np.min_scalar_type(max(len(dictionary) - 1, 0))), dictionary
+
+
+class WardrobeColumns:
+    """
+    Kolom-kolom satu lemari sesuai urutan simpan: 'seq' (int64), 'id' (bytes
+    lebar tetap) dan CATEGORY_COLUMNS yang di-dictionary-encode. `source`
+    menandai keadaan database asal kolom ini (lihat _WardrobeStore.load_columns).
+    """
+
+    def __init__(self, source, arrays, dictionaries, mapped=None):
+        self.source = source
+        self.arrays = arrays
+        self.dictionaries = dictionaries
+        self._mapped = mapped  # menjaga mmap snapshot tetap terbuka selama array memakainya
+        self._rows = None  # id -> baris, dibuat saat apply_changes() pertama
+
+    @classmethod
+    def from_rows(cls, rows, source):
+        """Membangun kolom dari baris (seq, id, type, color_name, style)."""
+        seqs, ids, types, colors, styles = zip(*rows) if rows else ((), (), (), (), ())
+        arrays = {
+            "seq": np.array(seqs, dtype=np.int64),
+            "id": np.array([(item_id or "").encode("utf-8") for item_id in ids], dtype=bytes),
+        }
+        dictionaries = {}
+        for column, values in zip(CATEGORY_COLUMNS, (types, colors, styles)):
+            arrays[column], dictionaries[column] = _encode(values)
+        return cls(source, arrays, dictionaries)
+
+    def __len__(self):
+        return len(self.arrays["seq"])
+
+    @property
+    def nbytes(self):
+        """Ukuran array (dictionary kecil dan tidak dihitung)."""
+        return sum(array.nbytes for array in self.arrays.values())
+
+    # --- Facet dan filter -------------------------------------------------
+
+    def facet_counts(self, column, mask=None):
+        """{nilai: jumlah item} untuk satu kolom kategori, urut per nilai; None tidak ikut."""
+        codes = self.arrays[column] if mask is None else self.arrays[column][mask]
+        counts = np.bincount(codes, minlength=len(self.dictionaries[column]))
+        return {
+            value: int(count)
+            for value, count in sorted(zip(self.dictionaries[column], counts), key=lambda pair: str(pair[0]))
+            if value is not None and count
+        }
+
+    def _codes_matching(self, column, predicate):
+        return np.array([code for code, value in enumerate(self.dictionaries[column])
+                         if value is not None and predicate(value)], dtype=np.int64)
+
+    def mask(self, types=None, colors=None, style_contains=None):
+        """
+        Array boolean item yang cocok dengan semua filter yang diberikan,
+        dengan arti yang sama seperti data_management.query_wardrobe: `colors`
+        berisi nama warna kanonik, `style_contains` tidak peka huruf besar/kecil.
+        Pencocokan string dijalankan sekali per nilai unik, bukan per item.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if types:
+            wanted = set(types)
+            mask &= np.isin(self.arrays["type"], self._codes_matching("type", wanted.__contains__))
+        if colors:
+            wanted = set(colors)
+            mask &= np.isin(self.arrays["color"], self._codes_matching("color", wanted.__contains__))
+        if style_contains:
+            needle = style_contains.casefold()
+            mask &= np.isin(self.arrays["style"],
+                            self._codes_matching("style", lambda value: needle in value.casefold()))
+        return mask
+
+    def count(self, types=None, colors=None, style_contains=None):
+        return int(np.count_nonzero(self.mask(types, colors, style_contains)))
+
+    def item_ids(self, mask=None):
+        """ID item (yang lolos mask), sesuai urutan simpan."""
+        ids = self.arrays["id"] if mask is None else self.arrays["id"][mask]
+        return [item_id.decode("utf-8") for item_id in ids.tolist()]
+
+    # --- Pembaruan bertahap -----------------------------------------------
+
+    def _row_index(self):
+        if self._rows is None:
+            self._rows = {item_id: row for row, item_id in enumerate(self.item_ids())}
+        return self._rows
+
+    def apply_changes(self, events, source):
+        """
+        Kolom baru setelah `events` dari change feed (lihat data_management.get_changes)
+        diterapkan: item yang diubah diganti di tempat, item baru ditambahkan di
+        akhir dan item yang dihapus dibuang. Biayanya satu salinan array, bukan
+        membangun ulang dari database. Mengembalikan None kalau ada event 'reset'
+        atau item tanpa ID (pemanggil harus membangun ulang). Objek ini tetap bisa dipakai.
+        """
+        if any(event["op"] == "reset" or event["item_id"] is None for event in events):
+            return None
+        if not events:
+            return WardrobeColumns(source, self.arrays, self.dictionaries, self._mapped)
+        rows = self._row_index()
+        arrays = {name: np.array(array) for name, array in self.arrays.items()}
+        dictionaries = {column: list(values) for column, values in self.dictionaries.items()}
+        codes = {column: {value: code for code, value in enumerate(values)} for column, values in dictionaries.items()}
+
+        def code_of(column, value):
+            code = codes[column].get(value)
+            if code is None:
+                code = codes[column][value] = len(dictionaries[column])
+                dictionaries[column].append(sys.intern(value) if isinstance(value, str) else value)
+            return code
+
+        deleted, appended = set(), {}
+        for event in events:
+            item_id = event["item_id"]
+            if event["op"] == "delete":
+                if appended.pop(item_id, None) is None and item_id in rows:
+                    deleted.add(rows[item_id])
+                continue
+            item = event["item"] or {}
+            values = [code_of(column, item.get(field)) for column, field
+                      in zip(CATEGORY_COLUMNS, ("type", "color_name", "style"))]
+            row = rows.get(item_id)
+            if row is None or row in deleted:
+                appended[item_id] = (event["item_seq"], values)
+                continue
+            for column, code in zip(CATEGORY_COLUMNS, values):
+                if code > np.iinfo(arrays[column].dtype).max:
+                    arrays[column] = arrays[column].astype(np.min_scalar_type(code))
+                arrays[column][row] = code
+
+        if deleted:
+            keep = np.ones(len(self), dtype=bool)
+            keep[list(deleted)] = False
+            arrays = {name: array[keep] for name, array in arrays.items()}
+        if appended:
+            new = {
+                "seq": np.array([seq for seq, _ in appended.values()], dtype=np.int64),
+                "id": np.array([(item_id or "").encode("utf-8") for item_id in appended], dtype=bytes),
+            }
+            for position, column in enumerate(CATEGORY_COLUMNS):
+                new[column] = np.array([values[position] for _, values in appended.values()],
+                                       dtype=np.min_scalar_type(len(dictionaries[column]) - 1))
+            arrays = {name: np.concatenate([array, new[name]]) for name, array in arrays.items()}
+
+        columns = WardrobeColumns(source, arrays, dictionaries)
+        if not deleted:
+            # Baris tidak bergeser: indeks diserahkan, tidak perlu dibangun ulang
+            self._rows = None
+            rows.update((item_id, len(self) + offset) for offset, item_id in enumerate(appended))
+            columns._rows = rows
+        return columns
+
+    # --- Snapshot biner ---------------------------------------------------
+
+    def save(self, path):
+        """Menulis snapshot secara atomik (file sementara + rename)."""
+        layout, offset = {}, 0
+        for name, array in self.arrays.items():
+            layout[name] = {"dtype": array.dtype.str, "length": len(array), "offset": offset}
+            offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+        header = json.dumps({"source": self.source, "arrays": layout, "dictionaries": self.dictionaries}).encode("utf-8")
+        header += b" " * (-(len(SNAPSHOT_MAGIC) + _HEADER_LENGTH.size + len(header)) % _ALIGNMENT)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+            for name, array in self.arrays.items():
+                data = np.ascontiguousarray(array).tobytes()
+                f.write(data + b"\0" * (-len(data) % _ALIGNMENT))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Me-mmap snapshot hasil save(); None kalau file tidak ada atau tidak terbaca."""
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # ValueError: file kosong
+            return None
+        try:
+            if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError("bukan snapshot lemari")
+            start = len(SNAPSHOT_MAGIC) + _HEADER_LENGTH.size
+            (header_length,) = _HEADER_LENGTH.unpack_from(mapped, len(SNAPSHOT_MAGIC))
+            header = json.loads(mapped[start:start + header_length])
+            data_start = start + header_length
+            arrays = {
+                name: np.frombuffer(mapped, dtype=np.dtype(spec["dtype"]), count=spec["length"],
+                                    offset=data_start + spec["offset"])
+                for name, spec in header["arrays"].items()
+            }
+        except (ValueError, KeyError, struct.error) as e:
+            print(f"Snapshot lemari {path} tidak terbaca, diabaikan: {e}")
+            mapped.close()
+            return None
+        dictionaries = {
+            column: [sys.intern(value) if isinstance(value, str) else value for value in values]
+            for column, values in header["dictionaries"].items()
+        }
+        return cls(header["source"], arrays, dictionaries, mapped=mapped)